@@ -1,57 +1,179 @@
 from __future__ import annotations
 import asyncio, logging, smtplib, time
-from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from email.message import EmailMessage
-from typing import Deque, Optional
-import aiohttp, config
+from typing import TYPE_CHECKING, Dict, List
+import config
+from monitoring import ERROR_COUNTER
+if TYPE_CHECKING:  # aiohttp нужен только для доставки в Telegram/webhook
+    import aiohttp
 
 logger = logging.getLogger(__name__)
 
+
+class ErrorWindow:
+    """Скользящее окно по секундным корзинам: add/count за O(1) амортизированно."""
+
+    __slots__ = ("size", "_buckets", "_sec", "total")
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._buckets = [0] * size
+        self._sec = 0
+        self.total = 0
+
+    def _advance(self, now: float) -> None:
+        sec = int(now)
+        gap = sec - self._sec
+        if gap <= 0:
+            return
+        if gap >= self.size:
+            self._buckets = [0] * self.size
+            self.total = 0
+        else:
+            b = self._buckets
+            for s in range(self._sec + 1, sec + 1):
+                i = s % self.size
+                self.total -= b[i]
+                b[i] = 0
+        self._sec = sec
+
+    def add(self, now: float, n: int = 1) -> None:
+        self._advance(now)
+        self._buckets[self._sec % self.size] += n
+        self.total += n
+
+    def count(self, now: float) -> int:
+        self._advance(now)
+        return self.total
+
+    def clear(self) -> None:
+        self._buckets = [0] * self.size
+        self.total = 0
+
+
+@dataclass
+class _Alert:
+    title: str
+    body: str
+    count: int = 1
+
+
 class AlertCenter:
     TIME_WINDOW_SEC = 60
     INACTIVITY_MIN  = 5
+    ERROR_BURST     = 5
+    DEDUP_SEC       = 60
+    QUEUE_MAX       = 256
+    WORKERS         = 2
 
     def __init__(self):
-        self._errors: Deque[float] = deque()
+        self._errors: Dict[str, ErrorWindow] = {}
         self._last_trade = time.time()
         self._email_on   = config.EMAIL_ENABLED
         self._tg_token   = config.TG_BOT_TOKEN
         self._tg_chat    = config.TG_CHAT_ID
+        self._webhook    = config.ALERT_WEBHOOK
+        # очередь доставки: ключи алертов, сами алерты — в _pending (склейка дублей)
+        self._queue: asyncio.Queue[str] | None = None
+        self._pending: Dict[str, _Alert] = {}
+        self._last_sent: Dict[str, float] = {}
+        self._suppressed: Dict[str, int] = {}
+        self._workers: List[asyncio.Task] = []
+        self._pool: ThreadPoolExecutor | None = None
+        self._session: aiohttp.ClientSession | None = None
+        self.dropped = 0
 
     def trade_executed(self):
         self._last_trade = time.time()
 
-    def error(self, msg: str):
+    def error(self, msg: str, kind: str = "generic"):
         logger.error(msg)
-        self._errors.append(time.time())
+        win = self._errors.get(kind)
+        if win is None:
+            win = self._errors[kind] = ErrorWindow(self.TIME_WINDOW_SEC)
+        win.add(time.time())
+        ERROR_COUNTER.labels(type=kind).inc()
 
     async def watch_errors(self):
-        last = 0.0
+        last: Dict[str, float] = {}
         while True:
             await asyncio.sleep(10)
             now = time.time()
-            self._errors = deque(t for t in self._errors if now - t < self.TIME_WINDOW_SEC)
-            if len(self._errors) >= 5 and now - last > 60:
-                await self._send_alert("❗ Частые ошибки", f"За минуту {len(self._errors)} ошибок.")
-                self._errors.clear()
-                last = now
+            for kind, win in self._errors.items():
+                n = win.count(now)
+                if n >= self.ERROR_BURST and now - last.get(kind, 0.0) > 60:
+                    self.alert("❗ Частые ошибки", f"За минуту {n} ошибок ({kind}).")
+                    win.clear()
+                    last[kind] = now
 
     async def watch_inactivity(self):
         while True:
             await asyncio.sleep(30)
             mins = (time.time() - self._last_trade) / 60
             if mins > self.INACTIVITY_MIN:
-                await self._send_alert("⚠️ Нет сделок", f"Бот бездействует {mins:.1f} мин.")
+                self.alert("⚠️ Нет сделок", f"Бот бездействует {mins:.1f} мин.")
                 self._last_trade = time.time()
 
-    # — отправка —
-    async def _send_alert(self, title: str, body: str):
+    # — постановка в очередь —
+    def alert(self, title: str, body: str) -> None:
+        """Неблокирующая постановка алерта; дубли склеиваются, переполнение — сброс."""
         logger.warning("ALERT: %s – %s", title, body)
+        key = title
+        pending = self._pending.get(key)
+        if pending is not None:
+            pending.count += 1
+            pending.body = body
+            return
+        now = time.time()
+        if now - self._last_sent.get(key, float("-inf")) < self.DEDUP_SEC:
+            self._suppressed[key] = self._suppressed.get(key, 0) + 1
+            return
+        self._ensure_workers()
+        try:
+            self._queue.put_nowait(key)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return
+        self._pending[key] = _Alert(title, body, 1 + self._suppressed.pop(key, 0))
+
+    async def _send_alert(self, title: str, body: str):
+        self.alert(title, body)
+
+    def _ensure_workers(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue(self.QUEUE_MAX)
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.WORKERS)]
+
+    async def _worker(self):
+        while True:
+            key = await self._queue.get()
+            a = self._pending.pop(key, None)
+            if a is None:
+                continue
+            self._last_sent[key] = time.time()
+            body = a.body if a.count == 1 else f"{a.body} (×{a.count})"
+            try:
+                await self._deliver(a.title, body)
+            except Exception as exc:
+                logger.warning("Alert delivery error: %s", exc)
+
+    async def _deliver(self, title: str, body: str):
+        jobs = []
         if self._email_on:
-            self._send_email(title, body)
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="smtp")
+            jobs.append(asyncio.get_running_loop().run_in_executor(self._pool, self._send_email, title, body))
         if self._tg_token and self._tg_chat:
-            await self._send_tg(body)
+            jobs.append(self._send_tg(body))
+        if self._webhook:
+            jobs.append(self._send_webhook(title, body))
+        if jobs:
+            await asyncio.gather(*jobs)
 
+    # — отправка —
     def _send_email(self, subj: str, body: str):
         try:
             msg = EmailMessage()
@@ -66,15 +188,59 @@ class AlertCenter:
         except Exception as exc:
             logger.warning("Email alert error: %s", exc)
 
+    def _http(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            import aiohttp
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=4, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=5),
+            )
+        return self._session
+
     async def _send_tg(self, text: str):
         try:
-            async with aiohttp.ClientSession() as sess:
-                await sess.post(
-                    f"https://api.telegram.org/bot{self._tg_token}/sendMessage",
-                    json={"chat_id": self._tg_chat, "text": text},
-                    timeout=5,
-                )
+            async with self._http().post(
+                f"https://api.telegram.org/bot{self._tg_token}/sendMessage",
+                json={"chat_id": self._tg_chat, "text": text},
+            ) as resp:
+                await resp.read()
         except Exception as exc:
             logger.warning("Telegram alert error: %s", exc)
 
-ALERTS = AlertCenter()
+    async def _send_webhook(self, title: str, text: str):
+        try:
+            async with self._http().post(self._webhook, json={"title": title, "text": text}) as resp:
+                await resp.read()
+        except Exception as exc:
+            logger.warning("Webhook alert error: %s", exc)
+
+    async def close(self):
+        for t in self._workers:
+            t.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+        self._pending.clear()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+_alerts: AlertCenter | None = None
+
+
+def alerts() -> AlertCenter:
+    """Общий AlertCenter, создаётся при первом обращении."""
+    global _alerts
+    if _alerts is None:
+        _alerts = AlertCenter()
+    return _alerts
+
+
+def __getattr__(name: str):
+    # alert_utils.ALERTS и from alert_utils import ALERTS — тот же ленивый экземпляр
+    if name == "ALERTS":
+        return alerts()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
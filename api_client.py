@@ -1,80 +1,223 @@
 from __future__ import annotations
 import asyncio, logging, time, uuid
-from dataclasses import dataclass
 from decimal import Decimal
-from typing import Dict, List, Tuple
+from typing import TYPE_CHECKING, Dict, Iterator, List, Sequence, Tuple
 import config
+from fixed_point import instrument
+from exec_stream import ExecutionStream
+from ledger import Ledger
+from order_journal import Order, OrderHistory
+from rate_limiter import RateLimiter
 from ws_manager import WSManager
+if TYPE_CHECKING:  # aiohttp грузится только при HTTP_ENABLED
+    from http_transport import HttpTransport
 
 logger = logging.getLogger(__name__)
 
 
-@dataclass
-class Order:
-    id: str
-    symbol: str
-    side: str
-    qty: Decimal
-    price: Decimal
-    ts: float
+class OrderCoalescer:
+    """Собирает заявки, пришедшие в одно микро-окно, в один create-batch.
+
+    Каждый вызывающий получает свой результат через собственный future.
+    """
+
+    def __init__(self, client: "APIClient", window: float = 0.002) -> None:
+        self.client = client
+        self.window = window
+        self._pending: List[Tuple[str, str, Decimal, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._inflight: set[asyncio.Task] = set()
+        self.batches = 0
+
+    async def submit(self, sym: str, side: str, qty: Decimal) -> dict:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((sym, side, qty, fut))
+        if len(self._pending) >= self.client.BATCH_MAX:
+            self._flush_now()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush_now)
+        return await fut
+
+    def _flush_now(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._send(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _send(self, batch: List[Tuple[str, str, Decimal, asyncio.Future]]) -> None:
+        self.batches += 1
+        try:
+            if len(batch) == 1:
+                sym, side, qty, _ = batch[0]
+                results = [await self.client.place_order(sym, side, qty)]
+            else:
+                results = await self.client.place_orders_batch([b[:3] for b in batch])
+        except Exception as exc:
+            for *_, fut in batch:
+                if not fut.done():
+                    fut.set_exception(exc)
+            return
+        for (*_, fut), res in zip(batch, results):
+            if not fut.done():
+                fut.set_result(res)
+
+    async def close(self) -> None:
+        self._flush_now()
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
 
-class _Limiter:
-    def __init__(self, rps: int = 60) -> None:
-        self.rps = rps; self.calls: list[float] = []
-
-    async def wait(self):
-        now = time.perf_counter()
-        self.calls = [t for t in self.calls if now - t < 1]
-        if len(self.calls) >= self.rps:
-            await asyncio.sleep(1 - (now - self.calls[0]))
-        self.calls.append(time.perf_counter())
 
 class APIClient:
     """Минимальный клиент Bybit для офлайн-демо."""
 
-    PUB = _Limiter(150)
-    PRI = _Limiter(60)
+    BATCH_MAX = 10
 
     def __init__(self) -> None:
         self.ws = WSManager(self)
-        self.position: Dict[str, Decimal] = {s: Decimal() for s in config.TRADE_PAIRS}
-        self.orders: List[Order] = []
-
-    async def _call(self, m: str, path: str, params=None, private=False):
+        self.limiter = RateLimiter()
+        self.ledger = Ledger(config.TRADE_PAIRS)  # единый учёт позиций и PnL
+        self.stream = ExecutionStream()  # офлайн позиции биржи публикует сам _fill
+        self.orders = OrderHistory(config.ORDER_RING_CAP, config.ORDER_JOURNAL or None)
+        self.transport: HttpTransport | None = None
+        self.coalescer = (OrderCoalescer(self, config.ORDER_COALESCE_MS / 1000)
+                          if config.ORDER_COALESCE_MS > 0 else None)
+
+    async def _call(self, m: str, path: str, params=None, private=False, weight: int | None = None):
+        await self.limiter.acquire(path, weight)
         logger.debug("API call %s %s %s", m, path, params)
+        if self.transport is not None:
+            return await self.transport.request(m, path, params, private)
         await asyncio.sleep(0)  # simulate latency
         return {}
 
     # публичные обёртки
     async def get_server_time_ms(self) -> int:
-        return int(time.time() * 1000)
+        if self.transport is None:
+            return int(time.time() * 1000)
+        data = await self._call("GET", "/v5/market/time")
+        return int(data["result"]["timeNano"]) // 1_000_000
 
     async def get_best(self, sym: str) -> Tuple[Decimal, Decimal]:
         bid, ask = await self.ws.get_best(sym)
-        return Decimal(str(bid)), Decimal(str(ask))
-
-    async def place_order(self, sym: str, side: str, qty: Decimal, order_type="Market"):
-        bid, ask = await self.get_best(sym)
-        price = ask if side == "Buy" else bid
-        delta = qty if side == "Buy" else -qty
-        self.position[sym] += delta
+        inst = instrument(sym)
+        return inst.price(bid), inst.price(ask)
+
+    def _order_params(self, sym: str, side: str, qty: Decimal, order_type: str) -> dict:
+        return {"category": config.CATEGORY_MAP.get(sym, "linear"), "symbol": sym,
+                "side": side, "orderType": order_type, "qty": str(qty)}
+
+    @property
+    def position(self) -> Dict[str, Decimal]:
+        """Позиции из ledger в единицах актива (для отчётов и сверки)."""
+        return {sym: self.ledger.qty(sym) for sym in self.ledger}
+
+    def _fill(self, sym: str, side: str, qty: Decimal, book: bool = True) -> dict:
+        # офлайн-исполнение по текущему верху стакана; book=False — в историю, без ledger
+        inst = instrument(sym)
+        bid, ask = self.ws._prices.get(sym, (0, 0))
+        ticks = ask if side == "Buy" else bid
+        if book:
+            lots = inst.to_lots(qty)
+            self.ledger.fill(sym, lots if side == "Buy" else -lots, ticks)
+            self.stream.publish(sym, self.ledger.position(sym))
+        price = inst.price(ticks)
         order = Order(str(uuid.uuid4()), sym, side, qty, price, time.time())
         self.orders.append(order)
         logger.info("Executed %s %s %.6f at %s", sym, side, qty, price)
-        await self._call("POST", "/v5/order/create", {})
         return {"status": "ok", "price": price}
 
+    async def place_order(self, sym: str, side: str, qty: Decimal, order_type="Market"):
+        # исполнение учитывается только после того, как биржа приняла заявку
+        resp = await self._call("POST", "/v5/order/create",
+                                self._order_params(sym, side, qty, order_type), private=True)
+        code = (resp or {}).get("retCode", 0)
+        if code:
+            return {"status": "error", "code": code, "msg": resp.get("retMsg", "")}
+        return self._fill(sym, side, qty)
+
+    async def place_orders_batch(self, orders: Sequence[Tuple[str, str, Decimal]],
+                                 order_type="Market", book: bool = True) -> List[dict]:
+        """Bybit /v5/order/create-batch: до BATCH_MAX заявок одной категории за запрос.
+
+        Результаты возвращаются в порядке orders; отклонённые биржей заявки
+        получают {"status": "error", ...} и не исполняются локально. Ошибка
+        запроса (retCode верхнего уровня, транспорт) помечает только свою пачку.
+        book=False — корректирующие заявки сверки: ledger уже держит целевую
+        позицию, двигается только биржа.
+        """
+        results: List[dict | None] = [None] * len(orders)
+        by_cat: Dict[str, List[int]] = {}
+        for i, (sym, _, _) in enumerate(orders):
+            by_cat.setdefault(config.CATEGORY_MAP.get(sym, "linear"), []).append(i)
+        for cat, idx in by_cat.items():
+            for k in range(0, len(idx), self.BATCH_MAX):
+                chunk = idx[k:k + self.BATCH_MAX]
+                req = []
+                for i in chunk:
+                    params = self._order_params(*orders[i], order_type)
+                    del params["category"]
+                    req.append(params)
+                try:
+                    resp = await self._call("POST", "/v5/order/create-batch",
+                                            {"category": cat, "request": req}, private=True, weight=len(chunk))
+                except Exception as exc:
+                    # ошибка только этой пачки: прошлые уже исполнены и остаются ok
+                    logger.warning("Batch order err %s x%d: %s", cat, len(chunk), exc)
+                    err = {"status": "error", "code": getattr(exc, "code", -1), "msg": str(exc)}
+                    for i in chunk:
+                        results[i] = dict(err)
+                    continue
+                ext = ((resp or {}).get("retExtInfo") or {}).get("list") or []
+                for j, i in enumerate(chunk):
+                    code = ext[j].get("code", 0) if j < len(ext) else 0
+                    if code:
+                        results[i] = {"status": "error", "code": code, "msg": ext[j].get("msg", "")}
+                    else:
+                        results[i] = self._fill(*orders[i], book=book)
+        return results
+
+    async def submit_order(self, sym: str, side: str, qty: Decimal):
+        """Заявка через коалесцер (если включён), иначе обычный place_order."""
+        if self.coalescer is not None:
+            return await self.coalescer.submit(sym, side, qty)
+        return await self.place_order(sym, side, qty)
+
     async def restore_positions(self):
-        return self.position.copy()
+        # офлайн биржа — это сам ledger
+        await self._call("GET", "/v5/position/list", {"category": "linear"}, private=True)
+        return self.position
 
-    def get_orders(self) -> List[Order]:
-        return list(self.orders)
+    def get_orders(self, sym: str | None = None, side: str | None = None, since: float | None = None,
+                   offset: int = 0, limit: int | None = None) -> Iterator[Order]:
+        """Ленивый постраничный обход истории (новые первыми): кольцо, затем журнал."""
+        return self.orders.iter(sym, side, since, offset, limit)
 
     def clear_orders(self) -> None:
         self.orders.clear()
 
     async def start(self):
+        self.orders.open_journal()
+        if config.HTTP_ENABLED and self.transport is None:
+            from http_transport import HttpTransport
+            self.transport = HttpTransport(config.BYBIT_API_BASE_URL, config.API_KEY, config.API_SECRET)
+        if self.transport is not None:
+            await self.transport.start()
+            try:
+                await self.transport.sync_time(self.get_server_time_ms)
+            except Exception as exc:
+                logger.warning("Server time sync err: %s", exc)
+            self.transport.start_time_sync(self.get_server_time_ms)
         await self.ws.start()
 
     async def close(self):
+        if self.coalescer is not None:
+            await self.coalescer.close()
         await self.ws.close()
+        if self.transport is not None:
+            await self.transport.close()
+        self.orders.close()
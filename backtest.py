@@ -0,0 +1,204 @@
+"""Реплей записей md_recorder через стратегию, симулятор проскальзывания и логику позиций.
+
+Без сети и sleep: стаканы восстанавливаются из колонок записи, заявки
+исполняются мгновенно по верху стакана. Перебор параметров раскладывает
+(комбинация × шард символов) по процессам; колонки читаются через mmap,
+так что запись в память не копируется.
+
+    python backtest.py logs/md/20260101-000000 --slip-tol 0.4,0.6,0.8 \
+        --threshold 0.0001,0.0002 --taker-fee 0.00055,0.0002 --workers 8
+"""
+from __future__ import annotations
+import argparse, asyncio, itertools, json, logging, os, sys, time
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from typing import Dict, List, Sequence
+import config
+from fixed_point import instrument
+from ledger import Ledger
+from md_recorder import KIND_SNAPSHOT, MDTape
+from orderbook import BookGap, OrderBook
+
+logger = logging.getLogger(__name__)
+
+# параметр перебора → аргумент Backtester
+SWEEP_PARAMS = ("slip_tol", "threshold", "spot_fee", "taker_fee")
+
+
+class _ReplayFeed:
+    """Стаканы реплея с интерфейсом WSManager.book(), который читает SlippageSimulator."""
+
+    def __init__(self, depth: int) -> None:
+        self.depth = depth
+        self._books: Dict[str, OrderBook] = {}
+
+    def book(self, sym: str) -> OrderBook | None:
+        return self._books.get(sym)
+
+
+class _ReplayClient:
+    """Мгновенное исполнение по верху стакана реплея, без сети и ожидания."""
+
+    def __init__(self, depth: int, ledger: Ledger) -> None:
+        self.ws = _ReplayFeed(depth)
+        self.ledger = ledger
+
+    async def submit_order(self, sym: str, side: str, qty: Decimal) -> dict:
+        bid, ask = self.ws._books[sym].best()
+        lots = instrument(sym).to_lots(qty)
+        self.ledger.fill(sym, lots if side == "Buy" else -lots, ask if side == "Buy" else bid)
+        return {"status": "ok"}
+
+
+class Backtester:
+    """Прогон записи по символам symbols через TradingBotMulti._trade."""
+
+    BLOCK = 1 << 16
+    DEPTH = 50
+
+    def __init__(self, tape: MDTape, symbols: Sequence[str] | None = None, *,
+                 slip_tol: Decimal | None = None, threshold: Decimal | None = None,
+                 spot_fee: Decimal | None = None, taker_fee: Decimal | None = None) -> None:
+        from trading_multi import TradingBotMulti
+        self.tape = tape
+        tape.register_instruments()
+        self.symbols = list(tape.symbols if symbols is None else symbols)
+        spot_fee = config.SPOT_FEE_RATE if spot_fee is None else Decimal(spot_fee)
+        taker_fee = config.FUTURES_FEE_TAKER if taker_fee is None else Decimal(taker_fee)
+        self.params = {"slip_tol": str(slip_tol if slip_tol is not None else TradingBotMulti.SLIP_TOL),
+                       "threshold": str(threshold if threshold is not None else config.MIN_FUNDING_THRESHOLD),
+                       "spot_fee": str(spot_fee), "taker_fee": str(taker_fee)}
+        # комиссии в бэктесте учитываются всегда, метрики не нужны
+        self.ledger = Ledger(self.symbols, spot_fee + taker_fee, include_fees=True, metrics=False)
+        self.client = _ReplayClient(self.DEPTH, self.ledger)
+        self.bot = TradingBotMulti(
+            self.client, self.symbols, slip_tol=None if slip_tol is None else Decimal(slip_tol),
+            threshold=None if threshold is None else Decimal(threshold), fee=spot_fee + taker_fee,
+        )
+
+    def run(self) -> dict:
+        return asyncio.run(self._replay())
+
+    async def _replay(self) -> dict:
+        t, bot = self.tape, self.bot
+        books = self.client.ws._books
+        evaluate, trade, thr = bot.strategy.evaluate, bot._trade, bot._thr
+        names, px, qty = t.symbols, t.px, t.qty
+        last: Dict[str, tuple] = {}
+        idx = t.select(self.symbols)
+        t0 = time.perf_counter()
+        for start in range(0, idx.shape[0], self.BLOCK):
+            blk = idx[start:start + self.BLOCK]
+            rows = zip(t.sym[blk].tolist(), t.kind[blk].tolist(), t.seq[blk].tolist(),
+                       t.bid[blk].tolist(), t.ask[blk].tolist(), t.nb[blk].tolist(),
+                       t.na[blk].tolist(), t.offsets[blk].tolist())
+            for sid, kind, seq, bid, ask, nb, na, lo in rows:
+                sym = names[sid]
+                book = books.get(sym)
+                if book is None:
+                    book = books[sym] = OrderBook(sym, self.DEPTH)
+                mid, hi = lo + nb, lo + nb + na
+                if kind == KIND_SNAPSHOT:
+                    book.load(px[lo:mid], qty[lo:mid], px[mid:hi], qty[mid:hi], seq)
+                else:
+                    p, q = px[lo:hi].tolist(), qty[lo:hi].tolist()
+                    try:
+                        book.apply_delta(zip(p[:nb], q[:nb]), zip(p[nb:], q[nb:]), seq)
+                    except BookGap:
+                        continue  # до следующего снапшота
+                if ask <= 0:
+                    continue
+                last[sym] = (bid, ask)
+                action, edge = evaluate(bid, ask)
+                if edge.ge(thr):
+                    await trade(sym, action, edge, bid, ask)
+        elapsed = time.perf_counter() - t0
+        # переоценка открытых позиций по последней котировке (long — bid, short — ask)
+        for sym, (bid, ask) in last.items():
+            self.ledger.mark(sym, bid, ask)
+        return self._report(idx.shape[0], elapsed)
+
+    def _report(self, events: int, elapsed: float) -> dict:
+        by_symbol = {}
+        for sym in self.symbols:
+            r = self.ledger.summary(sym)
+            r["trades"] = r.pop("fills")
+            by_symbol[sym] = r
+        return {
+            "params": self.params,
+            "events": events,
+            "elapsed_sec": elapsed,
+            **_totals(by_symbol),
+            "by_symbol": by_symbol,
+        }
+
+
+def _totals(by_symbol: Dict[str, dict]) -> dict:
+    return {k: sum(r[k] for r in by_symbol.values()) for k in ("trades", "volume", "fees", "pnl")}
+
+
+def _job(path: str, params: Dict[str, str], symbols: List[str]) -> dict:
+    return Backtester(MDTape(path), symbols, **params).run()
+
+
+def shard_symbols(counts: Dict[str, int], shards: int) -> List[List[str]]:
+    """Жадное разбиение символов по числу событий: самый тяжёлый — в самый лёгкий шард."""
+    load = [0] * shards
+    out: List[List[str]] = [[] for _ in range(shards)]
+    for sym, n in sorted(counts.items(), key=lambda kv: -kv[1]):
+        i = load.index(min(load))
+        out[i].append(sym)
+        load[i] += n
+    return [s for s in out if s]
+
+
+def sweep(path: str | os.PathLike, grid: Dict[str, Sequence], workers: int | None = None,
+          shards: int | None = None) -> List[dict]:
+    """Все комбинации grid (ключи из SWEEP_PARAMS) по всем ядрам; лучшие по PnL первыми."""
+    workers = workers or os.cpu_count() or 1
+    tape = MDTape(path)
+    groups = shard_symbols(tape.event_counts(), shards or workers)
+    keys = [k for k in SWEEP_PARAMS if k in grid]
+    combos = [dict(zip(keys, map(str, vals))) for vals in itertools.product(*(grid[k] for k in keys))]
+    results: List[dict] = []
+    with ProcessPoolExecutor(workers) as pool:
+        futs = [[pool.submit(_job, str(path), combo, g) for g in groups] for combo in combos]
+        for combo_futs in futs:
+            parts = [f.result() for f in combo_futs]
+            by_symbol = {s: r for p in parts for s, r in p["by_symbol"].items()}
+            results.append({
+                "params": parts[0]["params"],
+                "events": sum(p["events"] for p in parts),
+                "elapsed_sec": max(p["elapsed_sec"] for p in parts),
+                **_totals(by_symbol),
+                "by_symbol": by_symbol,
+            })
+    results.sort(key=lambda r: r["pnl"], reverse=True)
+    return results
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("tape", help="каталог сессии md_recorder")
+    for name in SWEEP_PARAMS:
+        ap.add_argument("--" + name.replace("_", "-"), help="значения через запятую")
+    ap.add_argument("--workers", type=int)
+    ap.add_argument("--shards", type=int)
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--by-symbol", action="store_true", help="включить разбивку по символам")
+    args = ap.parse_args(argv)
+
+    grid = {k: [Decimal(v) for v in getattr(args, k).split(",")] for k in SWEEP_PARAMS
+            if getattr(args, k)}
+    t0 = time.perf_counter()
+    results = sweep(args.tape, grid, args.workers, args.shards)
+    for r in results[:args.top]:
+        if not args.by_symbol:
+            r.pop("by_symbol")
+        print(json.dumps(r))
+    print(f"{len(results)} runs in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
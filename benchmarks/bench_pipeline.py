@@ -0,0 +1,306 @@
+"""Нагрузочный бенчмарк полного конвейера TradingBotMulti.
+
+Синтетический фид вместо WSManager._simulate, APIClient._call — заглушка.
+Результат — JSON; с --baseline сравнивает с сохранённым прогоном и
+возвращает код 1 при регрессии.
+
+    python benchmarks/bench_pipeline.py --symbols 100 --tick-rate 20 --depth 50 \
+        --duration 10 --out bench.json [--baseline base.json --tolerance 0.15]
+
+С --rl-hidden N политика rl_policy получает случайные веса MLP со скрытым
+слоем N; в отчёт попадает латентность батчевого инференса.
+
+С --trace-alloc такт меряется tracemalloc: alloc_peak_bytes_per_cycle — пик
+памяти такта над его началом, так что временные объекты тоже учтены.
+tracemalloc замедляет прогон, тайминги такого прогона не сравнивать.
+"""
+from __future__ import annotations
+import argparse, asyncio, gc, json, os, platform, random, resource, sys, tempfile, time, tracemalloc
+from typing import Dict, List
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+
+# метрика → True, если больше — лучше
+METRICS: Dict[str, bool] = {
+    "ticks_per_sec": True,
+    "tick_to_order_p50_ms": False,
+    "tick_to_order_p99_ms": False,
+    "tick_to_order_p999_ms": False,
+    "loop_lag_p50_ms": False,
+    "loop_lag_p99_ms": False,
+    "loop_lag_max_ms": False,
+    "peak_rss_mb": False,
+    "retained_blocks_per_cycle": False,
+    "gc_gen0_per_1k_cycles": False,
+    "alloc_peak_bytes_per_cycle_p50": False,
+    "alloc_peak_bytes_per_cycle_p99": False,
+    "rl_infer_p50_ms": False,
+    "rl_infer_p99_ms": False,
+}
+
+# что именно меряют метрики памяти — попадает в JSON рядом с результатами
+NOTES: Dict[str, str] = {
+    "retained_blocks_per_cycle": "чистый прирост живых блоков аллокатора за прогон на такт; созданное "
+                                 "и освобождённое внутри такта взаимно гасится — это удержание "
+                                 "(утечки, рост кэшей), а не число аллокаций",
+    "gc_gen0_per_1k_cycles": "сборки gen0 на 1000 тактов; учитывает только контейнеры под GC",
+    "alloc_peak_bytes_per_cycle": "с --trace-alloc: пик tracemalloc над памятью начала такта, "
+                                  "временные объекты учтены; без флага 0. Тайминги такого прогона "
+                                  "не сравнивать",
+}
+
+
+def _pct(xs: List[float], q: float) -> float:
+    if not xs:
+        return 0.0
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(q * len(xs)))]
+
+
+class _Recorder:
+    """Подменяет Histogram: сохраняет сырые значения для точных перцентилей."""
+
+    def __init__(self) -> None:
+        self.samples: List[float] = []
+
+    def observe(self, v: float) -> None:
+        self.samples.append(v)
+
+
+class SyntheticFeed:
+    """Генератор L2-обновлений: снапшот + дельты ±1 тик, редкие пересечения стакана."""
+
+    def __init__(self, ws, symbols: List[str], tick_rate: float, depth: int,
+                 cross_prob: float, seed: int) -> None:
+        self.ws, self.symbols, self.depth = ws, symbols, depth
+        self.rate = tick_rate * len(symbols)
+        self.cross_prob = cross_prob
+        self.rng = random.Random(seed)
+        self.mid = {s: 10_000 for s in symbols}
+        self.crossed: set[str] = set()
+        self.sent = 0
+
+    def _snapshot(self, sym: str, cross: bool = False) -> None:
+        m, d = self.mid[sym], self.depth
+        top = m + 20 if cross else m - 1  # пересечение ≈ 20 б.п. выше порога
+        bids = [(top - i, 50_000) for i in range(d)]
+        asks = [(m + 1 + i, 50_000) for i in range(d)]
+        self.ws.on_snapshot(sym, bids, asks, self.ws.book(sym).seq + 1)
+
+    def _update(self, sym: str) -> None:
+        if sym in self.crossed:
+            self.crossed.discard(sym)
+            return self._snapshot(sym)
+        if self.rng.random() < self.cross_prob:
+            self.crossed.add(sym)
+            return self._snapshot(sym, cross=True)
+        m, d = self.mid[sym], self.depth
+        step = self.rng.randint(-1, 1)
+        q = self.rng.randint(10_000, 90_000)
+        if step > 0:
+            bids, asks = [(m, q), (m - d, 0)], [(m + 1, 0), (m + 1 + d, q)]
+        elif step < 0:
+            bids, asks = [(m - 1, 0), (m - 1 - d, q)], [(m, q), (m + d, 0)]
+        else:
+            bids, asks = [(m - 1, q)], [(m + 1, q)]
+        self.mid[sym] = m + step
+        self.ws.on_delta(sym, bids, asks, self.ws.book(sym).seq + 1)
+
+    async def run(self, duration: float) -> None:
+        for sym in self.symbols:
+            self._snapshot(sym)
+        self.sent = len(self.symbols)
+        t_start = last = time.perf_counter()
+        owed, i, n = 0.0, 0, len(self.symbols)
+        while last - t_start < duration:
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            owed += (now - last) * self.rate
+            last = now
+            k = int(owed)
+            owed -= k
+            for _ in range(k):
+                self._update(self.symbols[i])
+                i = (i + 1) % n
+            self.sent += k
+
+
+async def _lag_probe(samples: List[float], period: float = 0.01) -> None:
+    while True:
+        t = time.perf_counter()
+        await asyncio.sleep(period)
+        samples.append(max(0.0, (time.perf_counter() - t - period) * 1000))
+
+
+async def _bench(args) -> Dict[str, float]:
+    import trading_multi
+    from trading_multi import TradingBotMulti
+
+    bot = TradingBotMulti()
+
+    async def _call(*_a, **_kw):
+        return {}
+    bot.client._call = _call  # без сети и лимитера
+
+    t2o = _Recorder()
+    trading_multi.TICK_TO_ORDER_MS = t2o
+    cycles = 0
+    mark = bot.ledger.mark  # вызывается ровно раз на обработанный тик символа
+    alloc: List[int] = []
+    base = [0]
+
+    def _counted(sym, bid, ask):
+        nonlocal cycles
+        cycles += 1
+        mark(sym, bid, ask)
+        if args.trace_alloc:
+            # такт — от прошлого mark до этого: приём котировки, анализ, заявка, PnL
+            cur, peak = tracemalloc.get_traced_memory()
+            alloc.append(peak - base[0])
+            tracemalloc.reset_peak()
+            base[0] = cur
+    bot.ledger.mark = _counted
+
+    feed = SyntheticFeed(bot.client.ws, config.TRADE_PAIRS, args.tick_rate, args.depth,
+                         args.cross_prob, args.seed)
+    lag: List[float] = []
+    bot.metrics.start()  # сброс метрик в фоновом потоке, как в run()
+    infer = _Recorder()
+    if args.rl_hidden:
+        import numpy as np
+        import rl_policy
+        rl_policy._ST_INFER = infer
+        rng = np.random.default_rng(args.seed)
+        h, d = args.rl_hidden, len(rl_policy.OBS_FIELDS)
+        weights = os.path.join(tempfile.mkdtemp(), "policy.npz")
+        np.savez(weights, W1=rng.normal(0, 0.1, (d, h)), b1=np.zeros(h),
+                 W2=rng.normal(0, 0.1, (h, 2)), b2=np.array([0.0, 0.05]))
+        bot.rl = rl_policy.RLPolicy(weights, rollout_path="")
+        for s in config.TRADE_PAIRS:
+            bot.rl.bind(s)
+        bot.rl.start()
+    if args.batch:
+        loops = [asyncio.create_task(bot._batch_loop())]
+    else:
+        loops = [asyncio.create_task(bot._loop(s)) for s in config.TRADE_PAIRS]
+    probe = asyncio.create_task(_lag_probe(lag))
+    await asyncio.sleep(0)
+
+    gc0 = gc.get_stats()[0]["collections"]
+    blocks0 = sys.getallocatedblocks()
+    if args.trace_alloc:
+        tracemalloc.start()
+        base[0] = tracemalloc.get_traced_memory()[0]
+    t0 = time.perf_counter()
+    await feed.run(args.duration)
+    for _ in range(10):  # дать циклам догнать хвост фида
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - t0
+    if args.trace_alloc:
+        tracemalloc.stop()
+    blocks = sys.getallocatedblocks() - blocks0
+    gcs = gc.get_stats()[0]["collections"] - gc0
+
+    for t in (*loops, probe):
+        t.cancel()
+    await asyncio.gather(*loops, probe, return_exceptions=True)
+    await bot.close()
+
+    ms = t2o.samples
+    return {
+        "ticks_sent": feed.sent,
+        "cycles": cycles,
+        "orders": len(ms),
+        "ticks_per_sec": cycles / elapsed,
+        "tick_to_order_p50_ms": _pct(ms, 0.50),
+        "tick_to_order_p99_ms": _pct(ms, 0.99),
+        "tick_to_order_p999_ms": _pct(ms, 0.999),
+        "loop_lag_p50_ms": _pct(lag, 0.50),
+        "loop_lag_p99_ms": _pct(lag, 0.99),
+        "loop_lag_max_ms": max(lag, default=0.0),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        # чистый прирост живых блоков за прогон (утечки/рост кэшей, не число аллокаций:
+        # созданное и освобождённое внутри такта взаимно гасится) и сборки gen0
+        "retained_blocks_per_cycle": blocks / max(cycles, 1),
+        "gc_gen0_per_1k_cycles": gcs * 1000 / max(cycles, 1),
+        "alloc_peak_bytes_per_cycle_p50": _pct(alloc, 0.50),
+        "alloc_peak_bytes_per_cycle_p99": _pct(alloc, 0.99),
+        "rl_batches": len(infer.samples),
+        "rl_infer_p50_ms": _pct(infer.samples, 0.50),
+        "rl_infer_p99_ms": _pct(infer.samples, 0.99),
+    }
+
+
+def run(args) -> Dict:
+    if not 1 <= args.symbols <= 500:
+        raise SystemExit("--symbols must be in 1..500")
+    config.TRADE_PAIRS = [f"S{i:03d}USDT" for i in range(args.symbols)]
+    config.CATEGORY_MAP = {s: "linear" for s in config.TRADE_PAIRS}
+    config.ORDER_JOURNAL = ""
+    config.ORDER_COALESCE_MS = 0
+    config.BATCH_ANALYZE = args.batch
+    if args.uvloop:
+        import uvloop
+        uvloop.install()
+    results = asyncio.run(_bench(args))
+    return {
+        "params": {k: getattr(args, k) for k in
+                   ("symbols", "tick_rate", "depth", "duration", "batch", "cross_prob", "seed", "uvloop",
+                    "rl_hidden", "trace_alloc")},
+        "env": {"python": platform.python_version(), "machine": platform.machine(),
+                "platform": platform.platform()},
+        "results": results,
+        "notes": NOTES,
+    }
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Список регрессий: метрика хуже базовой больше чем на tolerance (доля)."""
+    bad = []
+    cur, base = current["results"], baseline["results"]
+    for name, higher_better in METRICS.items():
+        b, c = base.get(name), cur.get(name)
+        if b is None or c is None or b == 0:
+            continue
+        change = (c - b) / abs(b)
+        worse = -change if higher_better else change
+        if worse > tolerance:
+            bad.append(f"{name}: {b:.4g} -> {c:.4g} ({change:+.1%})")
+    return bad
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--symbols", type=int, default=40)
+    ap.add_argument("--tick-rate", type=float, default=20.0, help="тиков в секунду на символ")
+    ap.add_argument("--depth", type=int, default=50)
+    ap.add_argument("--duration", type=float, default=5.0)
+    ap.add_argument("--batch", action="store_true", help="BATCH_ANALYZE-режим")
+    ap.add_argument("--cross-prob", type=float, default=0.02)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--uvloop", action="store_true")
+    ap.add_argument("--rl-hidden", type=int, default=0, help="политика со случайными весами, 0 — без неё")
+    ap.add_argument("--trace-alloc", action="store_true", help="аллокации такта через tracemalloc")
+    ap.add_argument("--out")
+    ap.add_argument("--baseline")
+    ap.add_argument("--tolerance", type=float, default=0.15)
+    args = ap.parse_args(argv)
+
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print("REGRESSION", line, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
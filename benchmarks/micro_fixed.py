@@ -0,0 +1,77 @@
+"""Микро-бенчмарк одного такта горячего пути: Decimal против целых тиков.
+
+    python benchmarks/micro_fixed.py [--n 200000]
+"""
+from __future__ import annotations
+import argparse, os, random, sys, timeit
+from decimal import Decimal
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from fixed_point import Instrument, Ratio
+from strategy_multi import ArbitrageStrategyMulti
+
+INST = Instrument("BTCUSDT", Decimal("0.01"), Decimal("0.0001"))
+SLIP_TOL = Decimal("0.60")
+TRADE_VAL = Decimal("1") * config.MAX_POSITION_PERCENT * config.LEVERAGE
+
+
+def decimal_cycle(bid_f: float, ask_f: float, worst_f: float, entry: Decimal, pos: Decimal) -> bool:
+    """Прежний путь: Decimal(str(...)) из фида, edge, _calc_qty, проскальзывание, PnL.
+
+    Совпадение результатов с целочисленным путём проверяет tests/test_fixed_point.py.
+    """
+    bid, ask = Decimal(str(bid_f)), Decimal(str(ask_f))
+    edge = (bid - ask) / ask - config.SPOT_FEE_RATE - config.FUTURES_FEE_TAKER
+    ok = edge >= config.MIN_FUNDING_THRESHOLD
+    (TRADE_VAL / ask).quantize(Decimal("0.0001"))
+    worst = Decimal(str(worst_f))
+    ok = ok and not abs((worst - ask) / ask) > SLIP_TOL * edge
+    float(edge); float((bid - entry) * pos)
+    return ok
+
+
+def int_cycle(strat, thr: Ratio, tol: Ratio, notional: Ratio,
+              bid: int, ask: int, worst: int, entry: int, pos: int) -> bool:
+    """Новый путь: всё в тиках/лотах, float только для метрик."""
+    _, edge = strat.evaluate(bid, ask)
+    ok = edge.ge(thr)
+    INST.lots_for(notional, ask)
+    ok = ok and not abs(worst - ask) * tol.den * edge.den > tol.num * edge.num * ask
+    float(edge); (bid - entry) * pos * INST.pnl_f
+    return ok
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200_000)
+    n = ap.parse_args().n
+    rng = random.Random(1)
+    quotes = []
+    for _ in range(1024):
+        ask = rng.randint(9_000_000, 11_000_000)
+        quotes.append((ask + rng.randint(-300, 300), ask, ask + rng.randint(0, 50)))
+    strat = ArbitrageStrategyMulti(None)
+    thr, tol = Ratio.of(config.MIN_FUNDING_THRESHOLD), Ratio.of(SLIP_TOL)
+    notional = Ratio.of(TRADE_VAL)
+    dq = [(float(INST.price(b)), float(INST.price(a)), float(INST.price(w))) for b, a, w in quotes]
+    entry_d, pos_d = Decimal("100000.00"), Decimal("0.0010")
+
+    def run_dec():
+        for bf, af, wf in dq:
+            decimal_cycle(bf, af, wf, entry_d, pos_d)
+
+    def run_int():
+        for b, a, w in quotes:
+            int_cycle(strat, thr, tol, notional, b, a, w, 10_000_000, 10)
+
+    reps = max(1, n // len(quotes))
+    t_dec = min(timeit.repeat(run_dec, number=reps, repeat=3)) / (reps * len(quotes))
+    t_int = min(timeit.repeat(run_int, number=reps, repeat=3)) / (reps * len(quotes))
+    print(f"decimal: {t_dec * 1e9:8.0f} ns/cycle")
+    print(f"int:     {t_int * 1e9:8.0f} ns/cycle")
+    print(f"speedup: {t_dec / t_int:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
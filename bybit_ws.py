@@ -0,0 +1,301 @@
+from __future__ import annotations
+import asyncio, json, logging, time
+from typing import Dict, List, Set
+import aiohttp
+import config
+from fixed_point import instrument
+from monitoring import WS_CONFLATED, WS_RECONNECTS
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # без orjson — стандартный json
+    _loads = json.loads
+
+logger = logging.getLogger(__name__)
+
+_TOPIC = '{"topic":"'
+_OFF = len(_TOPIC)
+# из тикера берём только эти поля, остальное не копируется
+TICKER_FIELDS = ("fundingRate", "nextFundingTime", "fundingIntervalHour", "markPrice", "indexPrice")
+
+
+class _Pending:
+    """Принятое, но ещё не применённое состояние стакана символа."""
+
+    __slots__ = ("snap", "bids", "asks", "ts", "frames")
+
+    def __init__(self, snap: bool, ts: float) -> None:
+        self.snap = snap
+        self.bids: Dict[int, int] = {}
+        self.asks: Dict[int, int] = {}
+        self.ts = ts  # приём первого кадра
+        self.frames = 0
+
+
+class _Conn:
+    """Одно WS-соединение со своей долей топиков: пинг, переподключение, переподписка."""
+
+    def __init__(self, feed: "BybitWS", idx: int, url: str, symbols: List[str]) -> None:
+        self.feed, self.idx, self.url = feed, idx, url
+        self.symbols = symbols
+        self.topics = [t for s in symbols for t in feed.topics(s)]
+        self.ws: aiohttp.ClientWebSocketResponse | None = None
+
+    async def run(self) -> None:
+        feed, fails = self.feed, 0
+        while True:
+            try:
+                async with feed._session.ws_connect(self.url, autoping=True, max_msg_size=0) as ws:
+                    self.ws = ws
+                    await self.send("subscribe", self.topics)
+                    fails = 0
+                    ping = asyncio.create_task(self._ping(ws))
+                    try:
+                        await feed._read(ws)
+                    finally:
+                        ping.cancel()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("WS %s: %r", self.idx, exc)
+            self.ws = None
+            feed._drop(self.symbols)  # до нового снапшота стаканы этих символов не ведём
+            delay = feed.BACKOFF_SEC[min(fails, len(feed.BACKOFF_SEC) - 1)]
+            fails += 1
+            feed.reconnects += 1
+            WS_RECONNECTS.inc()
+            await asyncio.sleep(delay)
+
+    async def send(self, op: str, topics: List[str]) -> None:
+        ws, step = self.ws, self.feed.SUB_CHUNK
+        if ws is None or ws.closed:
+            return
+        for i in range(0, len(topics), step):
+            await ws.send_str(json.dumps({"op": op, "args": topics[i:i + step]}))
+
+    async def _ping(self, ws: aiohttp.ClientWebSocketResponse) -> None:
+        while not ws.closed:
+            await asyncio.sleep(self.feed.PING_SEC)
+            await ws.send_str('{"op":"ping"}')
+
+
+class BybitWS:
+    """Публичный WS Bybit v5: orderbook.N и tickers → WSManager.
+
+    Чтение и применение разделены: читатель только декодирует кадр и
+    сливает уровни в ожидающее состояние символа, применитель раз за
+    проход отдаёт стакану одно слитое обновление на символ. Если
+    применение отстаёт, кадры одного символа склеиваются (счётчик
+    dropped), а очередь не растёт: на символ держится не больше одного
+    ожидающего состояния. Кадры чужих топиков отбрасываются по префиксу
+    без разбора JSON, из тикеров копируются только нужные поля.
+    """
+
+    PING_SEC    = 20
+    BACKOFF_SEC = (0.5, 1, 2, 5, 10)
+    SUB_CHUNK   = 10  # аргументов в одном subscribe (лимит Bybit)
+    YIELD_EVERY = 64  # кадров подряд, после которых читатель уступает применителю
+
+    def __init__(self, sink, symbols: List[str], *, base_url: str | None = None,
+                 depth: int | None = None, per_conn: int | None = None, tickers: bool = True) -> None:
+        self.sink = sink  # on_snapshot / on_delta / on_ticker / book — интерфейс WSManager
+        self.depth = depth or config.BYBIT_WS_DEPTH
+        self.tickers_on = tickers
+        base = self._base = (base_url or config.BYBIT_WS_BASE_URL).rstrip("/")
+        per = self._per = per_conn or config.BYBIT_WS_SYMBOLS_PER_CONN
+        by_cat: Dict[str, List[str]] = {}
+        for s in symbols:
+            by_cat.setdefault(config.CATEGORY_MAP.get(s, "linear"), []).append(s)
+        self._conns = [_Conn(self, i, f"{base}/{cat}", group) for i, (cat, group) in enumerate(
+            (cat, syms[k:k + per]) for cat, syms in by_cat.items() for k in range(0, len(syms), per))]
+        self._conn_of = {s: c for c in self._conns for s in c.symbols}
+        self._pending: Dict[str, _Pending] = {}
+        self._u: Dict[str, int] = {}  # последний u биржи по символу
+        self.tickers: Dict[str, dict] = {}
+        self._tk_dirty: Set[str] = set()
+        self._wake = asyncio.Event()
+        self._session: aiohttp.ClientSession | None = None
+        self._tasks: List[asyncio.Task] = []
+        self._bg: Set[asyncio.Task] = set()
+        self.dropped: Dict[str, int] = {}
+        self.frames = self.gaps = self.reconnects = 0
+
+    def topics(self, sym: str) -> List[str]:
+        t = [f"orderbook.{self.depth}.{sym}"]
+        if self.tickers_on:
+            t.append(f"tickers.{sym}")
+        return t
+
+    # — чтение —
+    async def _read(self, ws: aiohttp.ClientWebSocketResponse) -> None:
+        on_frame, n = self.on_frame, 0
+        while True:
+            # тишина дольше двух пингов — соединение мёртвое
+            msg = await ws.receive(timeout=2 * self.PING_SEC)
+            if msg.type is aiohttp.WSMsgType.TEXT or msg.type is aiohttp.WSMsgType.BINARY:
+                on_frame(msg.data)
+            elif msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSING, aiohttp.WSMsgType.CLOSED):
+                raise ConnectionError(f"closed: {ws.close_code}")
+            elif msg.type is aiohttp.WSMsgType.ERROR:
+                raise ConnectionError(ws.exception())
+            n += 1
+            if n % self.YIELD_EVERY == 0:
+                await asyncio.sleep(0)
+
+    def on_frame(self, data: str | bytes, ts: float | None = None) -> None:
+        if isinstance(data, bytes):
+            data = data.decode()
+        self.frames += 1
+        if data.startswith(_TOPIC):  # компактный кадр биржи: топик виден без разбора
+            if data.startswith("orderbook.", _OFF):
+                msg = _loads(data)
+                self._on_book(msg["data"], msg["type"] == "snapshot", ts or time.perf_counter())
+            elif data.startswith("tickers.", _OFF):
+                self._on_ticker(_loads(data)["data"])
+            return
+        msg = _loads(data)  # служебный ответ или другое форматирование
+        topic = msg.get("topic")
+        if topic is None:
+            if msg.get("success") is False:
+                logger.warning("WS %s failed: %s", msg.get("op"), msg.get("ret_msg"))
+        elif topic.startswith("orderbook."):
+            self._on_book(msg["data"], msg["type"] == "snapshot", ts or time.perf_counter())
+        elif topic.startswith("tickers."):
+            self._on_ticker(msg["data"])
+
+    def _on_book(self, d: dict, snap: bool, ts: float) -> None:
+        sym, u = d["s"], d["u"]
+        if snap:
+            old = self._pending.get(sym)
+            if old is not None:
+                self._conflated(sym, old.frames)
+            p = self._pending[sym] = _Pending(True, ts)
+            self._u[sym] = u
+        else:
+            last = self._u.get(sym)
+            if last is None:
+                return  # ждём снапшот
+            if u != last + 1:
+                self.gaps += 1
+                logger.warning("WS book gap %s: u %s after %s, resubscribe", sym, u, last)
+                self._drop([sym])
+                self.resync(sym)
+                return
+            self._u[sym] = u
+            p = self._pending.get(sym)
+            if p is None:
+                p = self._pending[sym] = _Pending(False, ts)
+            else:
+                self._conflated(sym, 1)
+        inst = instrument(sym)
+        t, lt = inst.inv_tick, inst.inv_lot
+        for side, rows in ((p.bids, d["b"]), (p.asks, d["a"])):
+            for px, q in rows:
+                k, v = round(float(px) * t), round(float(q) * lt)
+                if v or not p.snap:
+                    side[k] = v
+                else:
+                    side.pop(k, None)  # в снапшоте нулевой уровень просто удаляется
+        p.frames += 1
+        self._wake.set()
+
+    def _on_ticker(self, d: dict) -> None:
+        sym = d["symbol"]
+        st = self.tickers.get(sym)
+        if st is None:
+            st = self.tickers[sym] = {}
+        for f in TICKER_FIELDS:
+            v = d.get(f)
+            if v is not None:
+                st[f] = v
+        if sym in self._tk_dirty:
+            self._conflated(sym, 1)
+        else:
+            self._tk_dirty.add(sym)
+        self._wake.set()
+
+    def _conflated(self, sym: str, n: int) -> None:
+        self.dropped[sym] = self.dropped.get(sym, 0) + n
+        WS_CONFLATED.inc(n)
+
+    def _drop(self, symbols: List[str]) -> None:
+        for s in symbols:
+            self._u.pop(s, None)
+            self._pending.pop(s, None)
+
+    def resync(self, sym: str) -> None:
+        """Переподписка на стакан символа: биржа пришлёт новый снапшот."""
+        conn = self._conn_of.get(sym)
+        if conn is None or conn.ws is None:
+            return  # снапшот придёт после переподключения
+        topic = self.topics(sym)[:1]
+
+        async def _resub():
+            await conn.send("unsubscribe", topic)
+            await conn.send("subscribe", topic)
+        self._spawn(_resub())
+
+    def add_symbol(self, sym: str) -> None:
+        """Подписка на новый символ: в соединение со свободным местом или в новое."""
+        if sym in self._conn_of:
+            return
+        url = f"{self._base}/{config.CATEGORY_MAP.get(sym, 'linear')}"
+        conn = next((c for c in self._conns if c.url == url and len(c.symbols) < self._per), None)
+        if conn is None:
+            conn = _Conn(self, len(self._conns), url, [])
+            self._conns.append(conn)
+            if self._session is not None:
+                self._tasks.append(asyncio.create_task(conn.run()))
+        topics = self.topics(sym)
+        conn.symbols.append(sym)
+        conn.topics += topics
+        self._conn_of[sym] = conn
+        if conn.ws is not None:
+            self._spawn(conn.send("subscribe", topics))
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.ensure_future(coro)
+        self._bg.add(task)
+        task.add_done_callback(self._bg.discard)
+
+    # — применение —
+    def flush(self) -> int:
+        """Отдать стаканам всё накопленное; возвращает число символов."""
+        pending, self._pending = self._pending, {}
+        sink = self.sink
+        for sym, p in pending.items():
+            book = sink.book(sym)
+            # непрерывность u проверена при приёме, у стакана своя нумерация
+            seq = (book.seq if book is not None else 0) + 1
+            if p.snap:
+                sink.on_snapshot(sym, p.bids.items(), p.asks.items(), seq, p.ts)
+            elif book is not None and not book.stale:
+                sink.on_delta(sym, p.bids.items(), p.asks.items(), seq, p.ts)
+        dirty, self._tk_dirty = self._tk_dirty, set()
+        for sym in dirty:
+            sink.on_ticker(sym, self.tickers[sym])
+        return len(pending) + len(dirty)
+
+    async def _apply_loop(self) -> None:
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as exc:
+                logger.exception("WS apply err: %s", exc)
+
+    async def start(self) -> None:
+        self._session = aiohttp.ClientSession()
+        self._tasks = [asyncio.create_task(c.run()) for c in self._conns]
+        self._tasks.append(asyncio.create_task(self._apply_loop()))
+        logger.info("Bybit WS: %s symbols over %s connections", len(self._conn_of), len(self._conns))
+
+    async def close(self) -> None:
+        for t in self._tasks + list(self._bg):
+            t.cancel()
+        await asyncio.gather(*self._tasks, *self._bg, return_exceptions=True)
+        self._tasks = []
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
@@ -9,8 +9,7 @@ except Exception:  # noqa: S110
         pass
 
 BASE_DIR = Path(__file__).resolve().parent
-LOG_DIR = BASE_DIR / "logs"
-LOG_DIR.mkdir(parents=True, exist_ok=True)
+LOG_DIR = BASE_DIR / "logs"  # каталоги создаются при первой записи, не при импорте
 
 load_dotenv(BASE_DIR / ".env")
 
@@ -28,12 +27,42 @@ BYBIT_API_BASE_URL = (
     ("https://api-testnet.bybit.com" if USE_TESTNET else "https://api.bybit.com")
 )
 
+# HTTP-транспорт (по умолчанию выключен — офлайн-демо)
+HTTP_ENABLED       = os.getenv("HTTP_ENABLED", "false").lower() in ("true", "1", "yes")
+HTTP_POOL_LIMIT    = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", "32"))
+HTTP_DNS_TTL       = int(os.getenv("HTTP_DNS_TTL", "300"))
+HTTP_KEEPALIVE_SEC = float(os.getenv("HTTP_KEEPALIVE_SEC", "60"))
+HTTP_TIMEOUT_SEC   = float(os.getenv("HTTP_TIMEOUT_SEC", "5"))
+TIME_SYNC_SEC      = float(os.getenv("TIME_SYNC_SEC", "60"))
+# circuit breaker на эндпоинт и хеджирование идемпотентных чтений (retry_utils.RetryPolicy)
+BREAKER_FAILS        = int(os.getenv("BREAKER_FAILS", "5"))
+BREAKER_COOLDOWN_SEC = float(os.getenv("BREAKER_COOLDOWN_SEC", "10"))
+HEDGE_MIN_MS         = float(os.getenv("HEDGE_MIN_MS", "20"))  # второй запрос не раньше этого
+
+# публичный WS Bybit вместо симулятора цен (по умолчанию выключен)
+BYBIT_WS_ENABLED   = os.getenv("BYBIT_WS_ENABLED", "false").lower() in ("true", "1", "yes")
+BYBIT_WS_BASE_URL  = (
+    os.getenv("BYBIT_WS_BASE_URL") or
+    ("wss://stream-testnet.bybit.com/v5/public" if USE_TESTNET else "wss://stream.bybit.com/v5/public")
+)
+BYBIT_WS_DEPTH            = int(os.getenv("BYBIT_WS_DEPTH", "50"))  # 1, 50, 200, 500
+BYBIT_WS_SYMBOLS_PER_CONN = int(os.getenv("BYBIT_WS_SYMBOLS_PER_CONN", "50"))
+
 TRADE_PAIRS = [p.strip().upper() for p in os.getenv("TRADE_PAIRS", "BTCUSDT").split(",") if p.strip()]
 CATEGORY_MAP = {s: "linear" for s in TRADE_PAIRS}
 
+# шаг цены/лота по умолчанию и переопределения вида {"BTCUSDT": {"tick": "0.1", "lot": "0.001"}}
+TICK_SIZE        = Decimal(os.getenv("TICK_SIZE", "0.01"))
+LOT_SIZE         = Decimal(os.getenv("LOT_SIZE", "0.0001"))
+INSTRUMENT_SPECS = json.loads(os.getenv("INSTRUMENT_SPECS", "{}"))
+
 MARGIN_MODE            = os.getenv("MARGIN_MODE", "CROSS").upper()
 LEVERAGE               = Decimal(os.getenv("LEVERAGE", "1"))
 MAX_POSITION_PERCENT   = Decimal(os.getenv("MAX_POSITION_PERCENT", "0.10"))
+# лимиты экспозиции в валюте котировки (общие для всех воркеров); 0 — без лимита
+MAX_GROSS_EXPOSURE     = float(os.getenv("MAX_GROSS_EXPOSURE", "0"))
+MAX_SYMBOL_EXPOSURE    = float(os.getenv("MAX_SYMBOL_EXPOSURE", "0"))
 
 INCLUDE_FEES           = os.getenv("INCLUDE_FEES", "false").lower() in ("true", "1", "yes")
 SPOT_FEE_RATE          = Decimal(os.getenv("SPOT_FEE_RATE", "0.0010"))
@@ -42,17 +71,56 @@ FUTURES_FEE_MAKER      = Decimal(os.getenv("FUTURES_FEE_MAKER_RATE", "0.00020"))
 
 FUNDING_INTERVAL_HOURS = int(os.getenv("FUNDING_INTERVAL_HOURS",  "8"))
 MIN_FUNDING_THRESHOLD  = Decimal(os.getenv("MIN_FUNDING_THRESHOLD", "0.0001"))
+# FUNDING_TOP_K > 0 — торгуем K лучших по funding перпов вместо статичного TRADE_PAIRS
+FUNDING_TOP_K          = int(os.getenv("FUNDING_TOP_K", "0"))
+FUNDING_SCAN_SEC       = float(os.getenv("FUNDING_SCAN_SEC", "60"))
+BATCH_ANALYZE          = os.getenv("BATCH_ANALYZE", "false").lower() in ("true", "1", "yes")
+ORDER_COALESCE_MS      = float(os.getenv("ORDER_COALESCE_MS", "0"))  # 0 — без коалесцинга
+ORDER_RING_CAP         = int(os.getenv("ORDER_RING_CAP", "10000"))
+ORDER_JOURNAL          = os.getenv("ORDER_JOURNAL", str(LOG_DIR / "orders.jnl"))  # пусто — без журнала
+MD_RECORD_DIR          = os.getenv("MD_RECORD_DIR", "")  # пусто — без записи рыночных данных
+# снапшот позиций, ledger и стаканов для быстрого старта; пусто — выключен
+STATE_SNAPSHOT         = os.getenv("STATE_SNAPSHOT", str(LOG_DIR / "state.npz"))
+STATE_SNAPSHOT_SEC     = float(os.getenv("STATE_SNAPSHOT_SEC", "5"))
+STATE_BOOK_MAX_AGE_SEC = float(os.getenv("STATE_BOOK_MAX_AGE_SEC", "60"))  # старше — стаканы не восстанавливаются
+# сверка позиций идёт по приватному потоку; полный опрос — только страховка
+RECONCILE_POLL_SEC     = float(os.getenv("RECONCILE_POLL_SEC", "60"))
+RECONCILE_DELAY_MS     = float(os.getenv("RECONCILE_DELAY_MS", "20"))  # окно сбора корректировок в батч
 
 USE_RL_MODEL  = os.getenv("USE_RL_MODEL", "true").lower() in ("true", "1", "yes")
-RL_MODEL_PATH = Path(os.getenv("RL_MODEL_PATH", "./policies/ppo_latest.zip"))
+# веса MLP-политики (rl_policy) — .npz с W1, b1, W2, b2; без файла сигналы проходят как есть
+RL_MODEL_PATH = Path(os.getenv("RL_MODEL_PATH", "./policies/policy.npz"))
 RL_UPDATE_SEC = int(os.getenv("RL_UPDATE_SEC", "30"))
 RL_MIN_ROLLOUT= int(os.getenv("RL_MIN_ROLLOUT", "512"))
 RL_BUFFER_CAP = 2048
+RL_INFER_MS   = float(os.getenv("RL_INFER_MS", "5"))  # ожидание решения; дольше — сигнал без политики
+RL_ROLLOUT_PATH = os.getenv("RL_ROLLOUT_PATH", str(LOG_DIR / "rollout.npz"))  # пусто — не выгружать
 
 PROM_HOST  = os.getenv("PROM_HOST", "0.0.0.0")
 PROM_PORT  = int(os.getenv("PROM_PORT", "9100"))
+# метрики горячего пути сбрасывает фоновый поток; кольцо замеров на символ — /timeseries
+METRICS_FLUSH_MS = float(os.getenv("METRICS_FLUSH_MS", "250"))
+METRICS_RING_CAP = int(os.getenv("METRICS_RING_CAP", "1024"))
+
+# WORKERS > 1 — супервизор шардирует TRADE_PAIRS по процессам
+WORKERS = int(os.getenv("WORKERS", "1"))
+# метрики воркеров агрегируются через файлы prometheus_client.multiprocess;
+# переменная должна быть выставлена до первого импорта prometheus_client
+PROM_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR") or (str(LOG_DIR / "prom") if WORKERS > 1 else "")
+if PROM_MULTIPROC_DIR:
+    Path(PROM_MULTIPROC_DIR).mkdir(parents=True, exist_ok=True)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = PROM_MULTIPROC_DIR
+
+EMAIL_ENABLED  = os.getenv("EMAIL_ENABLED", "0").lower() in ("true", "1", "yes")
+ALERT_EMAILS   = os.getenv("ALERT_EMAILS", "")
+EMAIL_SENDER   = os.getenv("EMAIL_SENDER", ALERT_EMAILS)
+EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD", "")
+TG_BOT_TOKEN   = os.getenv("TG_BOT_TOKEN", "")
+TG_CHAT_ID     = os.getenv("TG_CHAT_ID", "")
+ALERT_WEBHOOK  = os.getenv("ALERT_WEBHOOK", "")
 
 LOG_LEVEL  = os.getenv("LOG_LEVEL", "INFO").upper()
 LOG_FILE   = LOG_DIR / "bot.log"
+LOG_SAMPLING = os.getenv("LOG_SAMPLING", "")  # "api_client:10,rebalancer:5" — каждое N-е info
 
 getcontext().prec = 18
\ No newline at end of file
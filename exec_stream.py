@@ -0,0 +1,51 @@
+from __future__ import annotations
+import logging
+from decimal import Decimal
+from typing import Callable, Dict, List, NamedTuple
+from fixed_point import instrument
+
+logger = logging.getLogger(__name__)
+
+
+class PositionUpdate(NamedTuple):
+    sym: str
+    seq: int   # порядковый номер по символу, как seq в топике position Bybit v5
+    lots: int  # позиция на бирже после события, со знаком
+
+
+class ExecutionStream:
+    """Приватный поток позиций биржи.
+
+    Подписчики вызываются синхронно на каждое обновление. Офлайн это
+    локальная замена: APIClient публикует позицию после каждого исполнения,
+    а тесты могут публиковать расхождения напрямую. Сообщения приватного
+    WS Bybit (топик position) разбирает feed().
+    """
+
+    def __init__(self) -> None:
+        self._seq: Dict[str, int] = {}
+        self._subs: List[Callable[[PositionUpdate], None]] = []
+
+    def subscribe(self, cb: Callable[[PositionUpdate], None]) -> None:
+        self._subs.append(cb)
+
+    def unsubscribe(self, cb: Callable[[PositionUpdate], None]) -> None:
+        if cb in self._subs:
+            self._subs.remove(cb)
+
+    def publish(self, sym: str, lots: int, seq: int | None = None) -> None:
+        if seq is None:
+            seq = self._seq.get(sym, 0) + 1
+        self._seq[sym] = seq
+        upd = PositionUpdate(sym, seq, lots)
+        for cb in self._subs:
+            cb(upd)
+
+    def feed(self, msg: dict) -> None:
+        """{"topic": "position", "data": [{"symbol", "side", "size", "seq"}, ...]}"""
+        if msg.get("topic") != "position":
+            return
+        for row in msg.get("data") or ():
+            sym = row["symbol"]
+            lots = instrument(sym).to_lots(Decimal(row.get("size") or 0))
+            self.publish(sym, -lots if row.get("side") == "Sell" else lots, int(row["seq"]))
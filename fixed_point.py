@@ -0,0 +1,97 @@
+from __future__ import annotations
+import logging
+from decimal import Decimal
+from typing import Dict, NamedTuple
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def div_half_even(num: int, den: int) -> int:
+    """Целочисленное деление с банковским округлением (как Decimal.quantize)."""
+    q, r = divmod(num, den)
+    r2 = r * 2
+    if r2 > den or (r2 == den and q & 1):
+        q += 1
+    return q
+
+
+class Ratio(NamedTuple):
+    """Точная дробь num/den (den > 0) без нормализации через gcd."""
+
+    num: int
+    den: int
+
+    @classmethod
+    def of(cls, d: Decimal) -> "Ratio":
+        return cls(*d.as_integer_ratio())
+
+    def ge(self, other: "Ratio") -> bool:
+        return self.num * other.den >= other.num * self.den
+
+    def __float__(self) -> float:
+        return self.num / self.den
+
+    def to_decimal(self) -> Decimal:
+        return Decimal(self.num) / Decimal(self.den)
+
+
+class Instrument:
+    """Шаг цены и лота инструмента; цены — в тиках, объёмы — в лотах (int)."""
+
+    __slots__ = ("sym", "tick", "lot", "inv_tick", "inv_lot", "pnl_f",
+                 "_tn", "_td", "_ln", "_ld")
+
+    def __init__(self, sym: str, tick: Decimal, lot: Decimal) -> None:
+        self.sym, self.tick, self.lot = sym, tick, lot
+        self.inv_tick = float(1 / tick)
+        self.inv_lot = float(1 / lot)
+        self.pnl_f = float(tick * lot)
+        self._tn, self._td = tick.as_integer_ratio()
+        self._ln, self._ld = lot.as_integer_ratio()
+
+    # — граница с Decimal (отчёты, отправка заявок) —
+    def to_ticks(self, px: Decimal) -> int:
+        return div_half_even(*(Decimal(px) / self.tick).as_integer_ratio())
+
+    def to_lots(self, qty: Decimal) -> int:
+        return div_half_even(*(Decimal(qty) / self.lot).as_integer_ratio())
+
+    def price(self, ticks: int) -> Decimal:
+        return self.tick * ticks
+
+    def qty(self, lots: int) -> Decimal:
+        return self.lot * lots
+
+    # — быстрый путь для фида: строки/float из JSON —
+    def ticks_of(self, px: float | str) -> int:
+        return round(float(px) * self.inv_tick)
+
+    def lots_of(self, qty: float | str) -> int:
+        return round(float(qty) * self.inv_lot)
+
+    def lots_for(self, notional: Ratio, price: int) -> int:
+        """(notional / price).quantize(lot) целиком в целых числах."""
+        return div_half_even(notional.num * self._td * self._ld,
+                             notional.den * price * self._tn * self._ln)
+
+
+_INSTRUMENTS: Dict[str, Instrument] = {}
+
+
+def instrument(sym: str) -> Instrument:
+    inst = _INSTRUMENTS.get(sym)
+    if inst is None:
+        spec = config.INSTRUMENT_SPECS.get(sym, {})
+        inst = _INSTRUMENTS[sym] = Instrument(
+            sym,
+            Decimal(str(spec.get("tick", config.TICK_SIZE))),
+            Decimal(str(spec.get("lot", config.LOT_SIZE))),
+        )
+    return inst
+
+
+def register_instrument(sym: str, tick: Decimal, lot: Decimal) -> Instrument:
+    """Явная спецификация (например, из заголовка записи рыночных данных)."""
+    inst = _INSTRUMENTS[sym] = Instrument(sym, Decimal(tick), Decimal(lot))
+    return inst
@@ -0,0 +1,119 @@
+from __future__ import annotations
+import heapq, logging
+from decimal import Decimal
+from typing import Dict, Iterable, List, Tuple
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class FundingScanner:
+    """Кэш funding, времени следующего начисления и базиса по всем linear-перпам.
+
+    Рейтинг carry (|funding| в час) хранится в куче с ленивым удалением:
+    update кладёт новую запись за O(log n), прежняя запись символа остаётся
+    в куче и отбрасывается при чтении по несовпадению версии. top(k) снимает
+    k живых записей и возвращает их обратно — O(k log n) без пересортировки
+    вселенной. Когда мёртвых записей становится больше живых, куча
+    перестраивается за O(n).
+    """
+
+    def __init__(self, min_rate: float | None = None, interval_h: float | None = None) -> None:
+        self.min_rate = float(config.MIN_FUNDING_THRESHOLD if min_rate is None else min_rate)
+        self.interval_h = float(config.FUNDING_INTERVAL_HOURS if interval_h is None else interval_h)
+        self.rates: Dict[str, float] = {}
+        self.next_ts: Dict[str, int] = {}   # мс биржи
+        self.basis: Dict[str, float] = {}   # (mark - index) / index
+        self._score: Dict[str, float] = {}  # символы в рейтинге
+        self._ver: Dict[str, int] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self.specs: Dict[str, Tuple[Decimal, Decimal]] = {}  # tickSize, qtyStep
+
+    def __len__(self) -> int:
+        return len(self._score)
+
+    def update(self, sym: str, rate: float, next_ts: int | None = None, mark: float | None = None,
+               index: float | None = None, interval_h: float | None = None) -> None:
+        self.rates[sym] = rate
+        if next_ts:
+            self.next_ts[sym] = next_ts
+        if mark and index:
+            self.basis[sym] = (mark - index) / index
+        score = abs(rate) / (interval_h or self.interval_h) if abs(rate) >= self.min_rate else None
+        if self._score.get(sym) == score:
+            return
+        v = self._ver[sym] = self._ver.get(sym, 0) + 1
+        if score is None:
+            self._score.pop(sym, None)  # запись в куче устарела по версии
+            return
+        self._score[sym] = score
+        heapq.heappush(self._heap, (-score, v, sym))
+        if len(self._heap) > 2 * len(self._score) + 64:
+            self._compact()
+
+    def _compact(self) -> None:
+        ver = self._ver
+        self._heap = [(-s, ver[sym], sym) for sym, s in self._score.items()]
+        heapq.heapify(self._heap)
+
+    def top(self, k: int) -> List[Tuple[str, float]]:
+        """k лучших (символ, carry в час) по убыванию."""
+        heap, ver = self._heap, self._ver
+        out: List[Tuple[str, float]] = []
+        live = []
+        while heap and len(out) < k:
+            e = heapq.heappop(heap)
+            if ver.get(e[2]) != e[1]:
+                continue  # устаревшая запись уходит из кучи насовсем
+            live.append(e)
+            out.append((e[2], -e[0]))
+        for e in live:
+            heapq.heappush(heap, e)
+        return out
+
+    # — источники —
+    def on_ticker(self, sym: str, fields: dict) -> None:
+        """Поля тикера Bybit v5 (строки): из WS-фида или из /v5/market/tickers."""
+        rate = fields.get("fundingRate")
+        if not rate:
+            return  # срочные фьючерсы без funding
+        mark, index, hours = fields.get("markPrice"), fields.get("indexPrice"), fields.get("fundingIntervalHour")
+        self.update(sym, float(rate), int(fields.get("nextFundingTime") or 0),
+                    float(mark) if mark else None, float(index) if index else None,
+                    float(hours) if hours else None)
+
+    def load(self, rows: Iterable[dict]) -> int:
+        n = 0
+        for row in rows:
+            self.on_ticker(row["symbol"], row)
+            n += 1
+        return n
+
+    def load_specs(self, rows: Iterable[dict]) -> int:
+        """Шаги цены и лота из /v5/market/instruments-info; без них символ не торгуется."""
+        n = 0
+        for row in rows:
+            tick = (row.get("priceFilter") or {}).get("tickSize")
+            lot = (row.get("lotSizeFilter") or {}).get("qtyStep")
+            if tick and lot:
+                self.specs[row["symbol"]] = (Decimal(tick), Decimal(lot))
+                n += 1
+        return n
+
+    async def refresh_specs(self, client: "APIClient") -> int:  # noqa: F821
+        """Спецификации всех linear-инструментов, постранично по cursor."""
+        n, cursor = 0, ""
+        while True:
+            params = {"category": "linear", "limit": 1000}
+            if cursor:
+                params["cursor"] = cursor
+            result = ((await client._call("GET", "/v5/market/instruments-info", params)) or {}).get("result") or {}
+            n += self.load_specs(result.get("list") or ())
+            cursor = result.get("nextPageCursor") or ""
+            if not cursor:
+                return n
+
+    async def refresh(self, client: "APIClient") -> int:  # noqa: F821
+        """Полный срез по всей категории linear одним запросом."""
+        resp = await client._call("GET", "/v5/market/tickers", {"category": "linear"})
+        return self.load(((resp or {}).get("result") or {}).get("list") or ())
@@ -0,0 +1,111 @@
+from __future__ import annotations
+import asyncio, hashlib, hmac, json, logging, time
+from typing import Any, Awaitable, Callable, Dict
+from urllib.parse import urlencode
+import aiohttp
+import config
+from monitoring import API_LATENCY_MS
+
+logger = logging.getLogger(__name__)
+
+
+class BybitAPIError(Exception):
+    def __init__(self, code: int, msg: str, path: str) -> None:
+        super().__init__(f"{path}: {code} {msg}")
+        self.code, self.msg, self.path = code, msg, path
+
+
+class HttpTransport:
+    """Долгоживущая пул-сессия к Bybit v5 с подписью запросов.
+
+    Одна ClientSession на клиента: keep-alive, кэш DNS, ограничения пула.
+    HMAC-ключ готовится один раз, на запрос делается только copy().
+    Смещение серверного времени кэшируется и обновляется фоном.
+    """
+
+    RECV_WINDOW = "5000"
+
+    def __init__(self, base_url: str, api_key: str, api_secret: str, *,
+                 limit: int = config.HTTP_POOL_LIMIT, limit_per_host: int = config.HTTP_POOL_PER_HOST,
+                 dns_ttl: int = config.HTTP_DNS_TTL, keepalive: float = config.HTTP_KEEPALIVE_SEC,
+                 timeout: float = config.HTTP_TIMEOUT_SEC) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self._mac = hmac.new(api_secret.encode(), digestmod=hashlib.sha256)
+        self._conn_kw = dict(limit=limit, limit_per_host=limit_per_host, ttl_dns_cache=dns_ttl,
+                             use_dns_cache=True, keepalive_timeout=keepalive)
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session: aiohttp.ClientSession | None = None
+        self._sync_task: asyncio.Task | None = None
+        self.time_offset_ms = 0
+
+    async def start(self) -> None:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(**self._conn_kw), timeout=self._timeout,
+            )
+
+    async def close(self) -> None:
+        if self._sync_task:
+            self._sync_task.cancel()
+            self._sync_task = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    # — время сервера —
+    def now_ms(self) -> int:
+        return int(time.time() * 1000) + self.time_offset_ms
+
+    async def sync_time(self, fetch: Callable[[], Awaitable[int]]) -> int:
+        t0 = time.time()
+        server = await fetch()
+        t1 = time.time()
+        self.time_offset_ms = server - int((t0 + t1) * 500)
+        return self.time_offset_ms
+
+    def start_time_sync(self, fetch: Callable[[], Awaitable[int]], every: float = config.TIME_SYNC_SEC) -> None:
+        async def _loop():
+            while True:
+                await asyncio.sleep(every)
+                try:
+                    await self.sync_time(fetch)
+                except Exception as exc:
+                    logger.warning("Server time sync err: %s", exc)
+        self._sync_task = asyncio.create_task(_loop())
+
+    # — подпись и запрос —
+    def sign(self, ts: str, payload: str) -> str:
+        mac = self._mac.copy()
+        mac.update(f"{ts}{self.api_key}{self.RECV_WINDOW}{payload}".encode())
+        return mac.hexdigest()
+
+    async def request(self, method: str, path: str, params: Dict[str, Any] | None = None,
+                      private: bool = False) -> Dict[str, Any]:
+        if self._session is None:
+            await self.start()
+        url = self.base_url + path
+        headers: Dict[str, str] = {}
+        if method == "GET":
+            payload = urlencode(params or {})
+            if payload:
+                url = f"{url}?{payload}"
+            body = None
+        else:
+            payload = body = json.dumps(params or {}, separators=(",", ":"))
+            headers["Content-Type"] = "application/json"
+        if private:
+            ts = str(self.now_ms())
+            headers.update({
+                "X-BAPI-API-KEY": self.api_key, "X-BAPI-TIMESTAMP": ts,
+                "X-BAPI-RECV-WINDOW": self.RECV_WINDOW, "X-BAPI-SIGN": self.sign(ts, payload),
+            })
+        t0 = time.perf_counter()
+        try:
+            async with self._session.request(method, url, data=body, headers=headers) as resp:
+                data = await resp.json(content_type=None)
+        finally:
+            API_LATENCY_MS.labels(path=path).observe((time.perf_counter() - t0) * 1000)
+        if data.get("retCode", 0):
+            raise BybitAPIError(data["retCode"], data.get("retMsg", ""), path)
+        return data
@@ -0,0 +1,185 @@
+from __future__ import annotations
+import logging
+from decimal import Decimal
+from typing import Dict, Iterator, List, Tuple
+import numpy as np
+import config
+from fixed_point import Ratio, instrument
+from metrics_pipeline import pipeline
+from monitoring import PNL_TOTAL, PNL_UNREAL, POSITION_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class _Pos:
+    """Позиция одного символа: всё в целых тиках × лотах, кроме комиссий."""
+
+    __slots__ = ("sym", "lots", "cost", "realized", "unreal", "mark", "fees", "volume", "fills",
+                 "pnl_f", "inv_lot", "_g_unreal", "_g_real", "_g_size", "_pushed")
+
+    def __init__(self, sym: str, metrics: bool) -> None:
+        self.sym = sym
+        self.lots = 0        # со знаком
+        self.cost = 0        # Σ лоты × цена открытой части (со знаком позиции)
+        self.realized = 0
+        self.unreal = 0
+        self.mark = 0
+        self.fees = 0.0      # в валюте котировки
+        self.volume = 0
+        self.fills = 0
+        inst = instrument(sym)
+        self.pnl_f, self.inv_lot = inst.pnl_f, inst.inv_lot
+        if metrics:
+            self._g_unreal = PNL_UNREAL.labels(sym=sym)
+            self._g_real = PNL_TOTAL.labels(sym=sym)
+            self._g_size = POSITION_SIZE.labels(sym=sym)
+        else:
+            self._g_unreal = self._g_real = self._g_size = None
+        self._pushed = [None, None, None]  # unreal, realized, size — последние отправленные
+
+
+class Ledger:
+    """Единый учёт позиций и PnL по средней цене входа.
+
+    fill и mark — O(1) в целых числах; частичное закрытие списывает
+    пропорциональную часть стоимости, остаток округления уходит в
+    оставшуюся позицию, так что полный цикл открытие → закрытие точен.
+    Метрики отправляются только при изменении значения и не с loop:
+    gauge.set уходит через defer конвейера метрик (по умолчанию общий).
+    """
+
+    def __init__(self, symbols: List[str] | None = None, fee: Decimal | None = None,
+                 include_fees: bool | None = None, metrics: bool = True, defer=None) -> None:
+        if fee is None:
+            fee = config.SPOT_FEE_RATE + config.FUTURES_FEE_TAKER
+        self.fee = Ratio.of(fee)
+        self._fee_f = float(self.fee)
+        self.include_fees = config.INCLUDE_FEES if include_fees is None else include_fees
+        self.metrics = metrics
+        self._defer = (defer or pipeline().defer) if metrics else None
+        self._pos: Dict[str, _Pos] = {}
+        for sym in config.TRADE_PAIRS if symbols is None else symbols:
+            self.add_symbol(sym)
+
+    def add_symbol(self, sym: str) -> _Pos:
+        p = self._pos.get(sym)
+        if p is None:
+            p = self._pos[sym] = _Pos(sym, self.metrics)
+        return p
+
+    def __contains__(self, sym: str) -> bool:
+        return sym in self._pos
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._pos)
+
+    # — изменения —
+    def fill(self, sym: str, lots: int, price: int) -> int:
+        """Исполнение lots (со знаком) по price тиков; возвращает реализованный PnL в тиках × лотах."""
+        p = self._pos.get(sym) or self.add_symbol(sym)
+        size = abs(lots)
+        real = 0
+        if p.lots and (lots > 0) != (p.lots > 0):
+            q = p.lots if size >= abs(p.lots) else -lots  # закрываемая часть, знак позиции
+            cr = p.cost if q == p.lots else p.cost * q // p.lots
+            real = q * price - cr
+            p.lots -= q
+            p.cost -= cr
+            lots += q
+        if lots:  # открытие, наращивание или переворот
+            p.lots += lots
+            p.cost += lots * price
+        p.realized += real
+        p.volume += size * price
+        p.fills += 1
+        if self.include_fees:
+            p.fees += size * price * p.pnl_f * self._fee_f
+        p.mark = price
+        p.unreal = p.lots * price - p.cost
+        self._push(p)
+        return real
+
+    def restore(self, sym: str, lots: int, price: int) -> None:
+        """Позиция без истории (рестарт воркера): стоимость — по цене price."""
+        p = self._pos.get(sym) or self.add_symbol(sym)
+        p.lots, p.cost, p.mark, p.unreal = lots, lots * price, price, 0
+        self._push(p)
+
+    # — снапшот состояния —
+    STATE_COLUMNS = ("lots", "cost", "realized", "mark", "volume", "fills")
+
+    def dump(self) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """(символы, int64[n, STATE_COLUMNS], комиссии float64[n]) для снапшота."""
+        syms = list(self._pos)
+        ps = self._pos.values()
+        ints = np.array([[getattr(p, c) for c in self.STATE_COLUMNS] for p in ps], np.int64)
+        fees = np.array([p.fees for p in ps], np.float64)
+        return syms, ints.reshape(-1, len(self.STATE_COLUMNS)), fees
+
+    def load(self, syms: List[str], ints: np.ndarray, fees: np.ndarray) -> None:
+        """Полное состояние из dump(): средняя цена, реализованный PnL и статистика."""
+        for sym, row, fee in zip(syms, ints.tolist(), fees.tolist()):
+            p = self.add_symbol(sym)
+            p.lots, p.cost, p.realized, p.mark, p.volume, p.fills = row
+            p.fees = fee
+            p.unreal = p.lots * p.mark - p.cost if p.lots else 0
+            self._push(p)
+
+    def mark(self, sym: str, bid: int, ask: int) -> None:
+        """Переоценка по стороне закрытия: long — по bid, short — по ask."""
+        p = self._pos.get(sym)
+        if p is None or not p.lots:
+            return
+        px = bid if p.lots > 0 else ask
+        if px == p.mark:
+            return
+        p.mark = px
+        p.unreal = p.lots * px - p.cost
+        if p._g_unreal is not None:
+            v = p.unreal * p.pnl_f
+            if v != p._pushed[0]:
+                p._pushed[0] = v
+                self._defer((p._g_unreal.set, v))
+
+    def _push(self, p: _Pos) -> None:
+        if p._g_unreal is None:
+            return
+        vals = (p.unreal * p.pnl_f, p.realized * p.pnl_f - p.fees, p.lots / p.inv_lot)
+        for i, (g, v) in enumerate(zip((p._g_unreal, p._g_real, p._g_size), vals)):
+            if v != p._pushed[i]:
+                p._pushed[i] = v
+                self._defer((g.set, v))
+
+    # — чтение —
+    def position(self, sym: str) -> int:
+        p = self._pos.get(sym)
+        return 0 if p is None else p.lots
+
+    def last_price(self, sym: str) -> int:
+        """Цена последнего исполнения или переоценки, тики."""
+        p = self._pos.get(sym)
+        return 0 if p is None else p.mark
+
+    def qty(self, sym: str) -> Decimal:
+        return instrument(sym).qty(self.position(sym))
+
+    def avg_price(self, sym: str) -> Decimal | None:
+        p = self._pos.get(sym)
+        if p is None or not p.lots:
+            return None
+        return instrument(sym).tick * Decimal(p.cost) / p.lots
+
+    def realized(self, sym: str) -> float:
+        """Реализованный PnL за вычетом комиссий (если INCLUDE_FEES)."""
+        p = self._pos[sym]
+        return p.realized * p.pnl_f - p.fees
+
+    def unrealized(self, sym: str) -> float:
+        p = self._pos[sym]
+        return p.unreal * p.pnl_f
+
+    def summary(self, sym: str) -> dict:
+        p = self._pos[sym]
+        return {"position": float(self.qty(sym)), "fills": p.fills, "volume": p.volume * p.pnl_f,
+                "fees": p.fees, "realized": self.realized(sym), "unrealized": self.unrealized(sym),
+                "pnl": self.realized(sym) + self.unrealized(sym)}
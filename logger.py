@@ -1,38 +1,103 @@
 from __future__ import annotations
-import json, logging, logging.handlers, sys
-from datetime import datetime
+import atexit, json, logging, logging.handlers, queue, sys, time
 from pathlib import Path
+from typing import Dict
 import config
 
 LOG_PATH: Path = config.LOG_FILE
-LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+
+_dumps = json.JSONEncoder(ensure_ascii=False).encode
+
 
 class JsonFormatter(logging.Formatter):
+    """JSON-строка без промежуточного dict; метка времени кэшируется на миллисекунду."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._sec = -1
+        self._sec_str = ""
+        self._ms = -1
+        self._ts = ""
+        self._names: Dict[str, str] = {}
+
+    def _stamp(self, created: float) -> str:
+        ms = int(created * 1000)
+        if ms != self._ms:
+            sec = ms // 1000
+            if sec != self._sec:
+                self._sec = sec
+                self._sec_str = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(sec))
+            self._ms = ms
+            self._ts = f'{{"ts":"{self._sec_str}.{ms % 1000:03d}Z","lvl":"'
+        return self._ts
+
     def format(self, record):
-        payload = {
-            "ts": datetime.utcnow().isoformat(timespec="milliseconds") + "Z",
-            "lvl": record.levelname.lower(),
-            "msg": record.getMessage(),
-            "mod": record.name,
-        }
+        mod = self._names.get(record.name)
+        if mod is None:
+            mod = self._names[record.name] = _dumps(record.name)
+        line = (f'{self._stamp(record.created)}{record.levelname.lower()}","msg":'
+                f'{_dumps(record.getMessage())},"mod":{mod}')
         if record.exc_info:
-            payload["exc"] = self.formatException(record.exc_info)
-        return json.dumps(payload, ensure_ascii=False)
+            line += ',"exc":' + _dumps(self.formatException(record.exc_info))
+        return line + "}"
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает 1 из every INFO/DEBUG-сообщений логгера; WARNING и выше — всегда."""
+
+    def __init__(self, every: int) -> None:
+        super().__init__()
+        self.every = max(1, every)
+        self._n = 0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        n, self._n = self._n, self._n + 1
+        return n % self.every == 0
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Кладёт запись в очередь, не форматируя JSON в потоке торгового цикла."""
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+def _parse_sampling(spec: str) -> Dict[str, int]:
+    # "api_client:10,rebalancer:5" — логировать каждое N-е info-сообщение
+    out: Dict[str, int] = {}
+    for item in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, every = item.partition(":")
+        out[name] = int(every or 1)
+    return out
+
 
 def setup_logger() -> logging.Logger:
+    global _listener
     logger = logging.getLogger()
     if logger.handlers:
         return logger
     logger.setLevel(getattr(logging, config.LOG_LEVEL, logging.INFO))
+    LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
     sh = logging.StreamHandler(sys.stdout)
     sh.setFormatter(JsonFormatter())
     fh = logging.handlers.TimedRotatingFileHandler(
         LOG_PATH, when="midnight", backupCount=14, encoding="utf-8"
     )
     fh.setFormatter(JsonFormatter())
-    logger.addHandler(sh)
-    logger.addHandler(fh)
+    # запись на диск и в stdout — в фоновом потоке
+    q: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(q, sh, fh, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    logger.addHandler(_QueueHandler(q))
+    for name, every in _parse_sampling(config.LOG_SAMPLING).items():
+        logging.getLogger(name).addFilter(SamplingFilter(every))
     logging.getLogger("aiohttp").setLevel(logging.WARNING)
     return logger
-
-setup_logger()
\ No newline at end of file
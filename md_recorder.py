@@ -0,0 +1,174 @@
+from __future__ import annotations
+import json, logging, os, time
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Tuple
+import numpy as np
+from fixed_point import instrument, register_instrument
+
+logger = logging.getLogger(__name__)
+
+KIND_SNAPSHOT, KIND_DELTA = 0, 1
+
+# одно значение на обновление стакана; bid/ask — верх стакана после применения
+EVENT_COLUMNS: Dict[str, str] = {
+    "ts": "<f8", "sym": "<u2", "kind": "u1", "seq": "<i8",
+    "bid": "<i8", "ask": "<i8", "nb": "<u2", "na": "<u2",
+}
+# уровни подряд: nb уровней bids, затем na уровней asks каждого события
+LEVEL_COLUMNS: Dict[str, str] = {"px": "<i8", "qty": "<i8"}
+
+
+class _Column:
+    """Append-only memory-mapped массив одного dtype; файл растёт блоками."""
+
+    __slots__ = ("path", "dtype", "chunk", "n", "_f", "_mm")
+
+    def __init__(self, path: Path, dtype: str, chunk: int) -> None:
+        self.path, self.dtype, self.chunk = path, np.dtype(dtype), chunk
+        self.n = 0
+        self._f = open(path, "w+b")
+        self._mm: np.memmap | None = None
+        self._grow(chunk)
+
+    def _grow(self, need: int) -> None:
+        cap = 0 if self._mm is None else self._mm.shape[0]
+        cap += max(self.chunk, need)
+        if self._mm is not None:
+            self._mm.flush()
+        self._f.truncate(cap * self.dtype.itemsize)
+        self._mm = np.memmap(self._f, self.dtype, "r+", shape=(cap,))
+
+    def append(self, v) -> None:
+        if self.n == self._mm.shape[0]:
+            self._grow(1)
+        self._mm[self.n] = v
+        self.n += 1
+
+    def extend(self, vs: Sequence) -> None:
+        k = len(vs)
+        if self.n + k > self._mm.shape[0]:
+            self._grow(k)
+        self._mm[self.n:self.n + k] = vs
+        self.n += k
+
+    def flush(self) -> None:
+        self._mm.flush()
+
+    def close(self) -> None:
+        self._mm.flush()
+        self._mm = None  # снять отображение до усечения файла
+        self._f.truncate(self.n * self.dtype.itemsize)
+        self._f.close()
+
+
+class MDRecorder:
+    """Запись всех обновлений стакана в колоночные memory-mapped файлы.
+
+    Каталог сессии: meta.json (символы, шаги цены/лота, число записей) и по
+    файлу на колонку. meta.json переписывается атомарно каждые META_EVERY
+    событий, так что после сбоя читается всё до последней фиксации.
+    """
+
+    CHUNK = 1 << 16
+    META_EVERY = 1 << 14
+
+    def __init__(self, path: str | os.PathLike) -> None:
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._ev = [_Column(self.path / f"{n}.bin", dt, self.CHUNK) for n, dt in EVENT_COLUMNS.items()]
+        self._px, self._qty = (_Column(self.path / f"{n}.bin", dt, self.CHUNK * 16)
+                               for n, dt in LEVEL_COLUMNS.items())
+        self._ids: Dict[str, int] = {}
+        self.symbols: List[str] = []
+        self.count = 0
+        self._write_meta()
+
+    @classmethod
+    def session(cls, root: str | os.PathLike) -> "MDRecorder":
+        return cls(Path(root) / time.strftime("%Y%m%d-%H%M%S"))
+
+    def record(self, sym: str, kind: int, seq: int, bids: List[Tuple[int, int]],
+               asks: List[Tuple[int, int]], best: Tuple[int, int] | None, ts: float | None = None) -> None:
+        sid = self._ids.get(sym)
+        if sid is None:
+            sid = self._add_symbol(sym)
+        bid, ask = best or (0, 0)
+        row = (time.time() if ts is None else ts, sid, kind, seq, bid, ask, len(bids), len(asks))
+        for col, v in zip(self._ev, row):
+            col.append(v)
+        levels = bids + asks
+        if levels:
+            px, qty = zip(*levels)
+            self._px.extend(px)
+            self._qty.extend(qty)
+        self.count += 1
+        if not self.count % self.META_EVERY:
+            self.flush()
+
+    def _add_symbol(self, sym: str) -> int:
+        sid = self._ids[sym] = len(self.symbols)
+        self.symbols.append(sym)
+        self._write_meta()
+        return sid
+
+    def _write_meta(self) -> None:
+        specs = {s: {"tick": str(instrument(s).tick), "lot": str(instrument(s).lot)} for s in self.symbols}
+        meta = {"version": 1, "symbols": self.symbols, "specs": specs,
+                "events": self.count, "levels": self._px.n,
+                "columns": {**EVENT_COLUMNS, **LEVEL_COLUMNS}}
+        tmp = self.path / "meta.json.tmp"
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, self.path / "meta.json")
+
+    def flush(self) -> None:
+        for col in (*self._ev, self._px, self._qty):
+            col.flush()
+        self._write_meta()
+
+    def close(self) -> None:
+        self.flush()
+        for col in (*self._ev, self._px, self._qty):
+            col.close()
+        logger.info("Market data recorded: %s events → %s", self.count, self.path)
+
+
+class MDTape:
+    """Чтение записи: колонки как ndarray поверх mmap, без копирования в память."""
+
+    def __init__(self, path: str | os.PathLike) -> None:
+        self.path = Path(path)
+        meta = json.loads((self.path / "meta.json").read_text())
+        self.symbols: List[str] = meta["symbols"]
+        self.specs: Dict[str, Dict[str, str]] = meta["specs"]
+        n, m = meta["events"], meta["levels"]
+        (self.ts, self.sym, self.kind, self.seq, self.bid, self.ask, self.nb, self.na) = (
+            self._column(name, dt, n) for name, dt in EVENT_COLUMNS.items())
+        self.px, self.qty = (self._column(name, dt, m) for name, dt in LEVEL_COLUMNS.items())
+        # начало уровней каждого события
+        sizes = self.nb.astype(np.int64) + self.na
+        self.offsets = np.concatenate(([0], np.cumsum(sizes)))[:n]
+
+    def _column(self, name: str, dtype: str, n: int) -> np.ndarray:
+        if not n:
+            return np.zeros(0, dtype=dtype)
+        return np.asarray(np.memmap(self.path / f"{name}.bin", dtype, "r"))[:n]
+
+    def __len__(self) -> int:
+        return self.sym.shape[0]
+
+    def register_instruments(self) -> None:
+        """Шаги цены/лота из записи, чтобы тики трактовались так же, как при записи."""
+        for sym, spec in self.specs.items():
+            register_instrument(sym, Decimal(spec["tick"]), Decimal(spec["lot"]))
+
+    def select(self, symbols: Iterable[str] | None = None) -> np.ndarray:
+        """Индексы событий указанных символов в порядке записи."""
+        if symbols is None:
+            return np.arange(len(self))
+        ids = [self.symbols.index(s) for s in symbols if s in self.symbols]
+        return np.flatnonzero(np.isin(self.sym, ids))
+
+    def event_counts(self) -> Dict[str, int]:
+        counts = np.bincount(self.sym, minlength=len(self.symbols))
+        return dict(zip(self.symbols, counts.tolist()))
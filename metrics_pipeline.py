@@ -0,0 +1,153 @@
+"""Метрики горячего пути вне event loop.
+
+Цикл символа кладёт в deque сырой кортеж (слот, время, edge, bid, ask,
+латентность): append атомарен под GIL, без блокировок и без float(Ratio).
+Остальные обновления горячего пути (гистограммы стадий, gauge ledger)
+откладываются через defer парой (метод, значение). Поток metrics-flush раз
+в METRICS_FLUSH_MS забирает накопленное, выставляет заранее привязанные
+gauge-потомки (последнее значение за период), применяет отложенные вызовы
+и пишет замеры в NumPy-кольцо символа на METRICS_RING_CAP строк, которое
+отдаёт /timeseries. Блокировки prometheus_client и запись mmap-файлов
+multiprocess-режима остаются в этом потоке.
+"""
+from __future__ import annotations
+import logging, math, threading, time
+from collections import deque
+from typing import Dict, List
+import numpy as np
+import config
+from monitoring import CYCLE_LATENCY_MS, ORDERS_ACTIVE, TRADING_EDGE
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ("ts", "edge", "spread_bps", "latency_ms")
+_NAN = math.nan
+
+
+class MetricsPipeline:
+    QUEUE_MAX = 1 << 16  # при остановленном потоке старые замеры вытесняются
+
+    def __init__(self, cap: int | None = None, flush_sec: float | None = None) -> None:
+        self.cap = config.METRICS_RING_CAP if cap is None else cap
+        self.flush_sec = config.METRICS_FLUSH_MS / 1000 if flush_sec is None else flush_sec
+        self._q: deque = deque(maxlen=self.QUEUE_MAX)
+        self._ops: deque = deque(maxlen=self.QUEUE_MAX)
+        self.defer = self._ops.append  # defer((hist.observe, v)) — один append на loop
+        self._slots: Dict[str, int] = {}
+        self._syms: List[str] = []
+        self._edge: list = []
+        self._lat: list = []
+        self._orders: list = []
+        self._ring = np.full((0, self.cap, len(FIELDS)), _NAN)
+        self._head = np.zeros(0, np.int64)  # записано замеров на слот
+        self._lock = threading.Lock()       # flush ↔ /timeseries ↔ bind; loop его не берёт
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    # — event loop —
+    def bind(self, sym: str) -> int:
+        """Слот символа: gauge-потомки создаются здесь, а не на каждом тике."""
+        slot = self._slots.get(sym)
+        if slot is not None:
+            return slot
+        with self._lock:
+            slot = len(self._syms)
+            self._edge.append(TRADING_EDGE.labels(sym=sym))
+            self._lat.append(CYCLE_LATENCY_MS.labels(sym=sym))
+            self._orders.append(ORDERS_ACTIVE.labels(sym=sym))
+            self._ring = np.concatenate([self._ring, np.full((1, self.cap, len(FIELDS)), _NAN)])
+            self._head = np.append(self._head, 0)
+            self._syms.append(sym)
+            self._slots[sym] = slot
+        return slot
+
+    def record(self, slot: int, edge, bid: int = 0, ask: int = 0, latency_ms: float | None = None) -> None:
+        """edge — Ratio, float или None; перевод в float делает поток сброса."""
+        self._q.append((slot, time.time(), edge, bid, ask, latency_ms))
+
+    def order_active(self, slot: int) -> None:
+        self.defer((self._orders[slot].set, 1))
+
+    # — поток сброса —
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_sec):
+            try:
+                self.flush()
+            except Exception as exc:
+                logger.warning("Metrics flush err: %s", exc)
+
+    def flush(self) -> int:
+        ops = self._ops
+        for _ in range(len(ops)):
+            fn, value = ops.popleft()
+            fn(value)
+        q = self._q
+        n = len(q)
+        if not n:
+            return 0
+        rows = [q.popleft() for _ in range(n)]
+        vals = np.empty((n, len(FIELDS)))
+        slots = np.empty(n, np.int64)
+        last_edge: Dict[int, float] = {}
+        last_lat: Dict[int, float] = {}
+        for i, (slot, ts, edge, bid, ask, lat) in enumerate(rows):
+            e = _NAN if edge is None else float(edge)
+            if edge is not None:
+                last_edge[slot] = e
+            if lat is not None:
+                last_lat[slot] = lat
+            side = ask + bid
+            slots[i] = slot
+            vals[i] = (ts, e, (ask - bid) * 2e4 / side if side else _NAN, _NAN if lat is None else lat)
+        for slot, e in last_edge.items():
+            self._edge[slot].set(e)
+        for slot, lat in last_lat.items():
+            self._lat[slot].set(lat)
+        # позиция в кольце: счётчик слота плюс порядковый номер замера внутри пачки
+        order = np.argsort(slots, kind="stable")
+        ss = slots[order]
+        rank = np.arange(n) - np.searchsorted(ss, ss)
+        with self._lock:
+            self._ring[ss, (self._head[ss] + rank) % self.cap] = vals[order]
+            self._head += np.bincount(slots, minlength=len(self._head))
+        return n
+
+    # — чтение (поток экспозиции) —
+    def series(self, sym: str, n: int | None = None) -> Dict[str, list] | None:
+        """Последние n замеров символа по столбцам FIELDS, от старых к новым."""
+        slot = self._slots.get(sym)
+        if slot is None:
+            return None
+        with self._lock:
+            head = int(self._head[slot])
+            k = min(head, self.cap, self.cap if n is None else max(n, 0))
+            rows = self._ring[slot, (head - k + np.arange(k)) % self.cap]
+        return {f: [None if math.isnan(v) else v for v in rows[:, j].tolist()] for j, f in enumerate(FIELDS)}
+
+    def symbols(self) -> List[str]:
+        return list(self._syms)
+
+
+_pipeline: MetricsPipeline | None = None
+
+
+def pipeline() -> MetricsPipeline:
+    """Общий конвейер процесса, создаётся при первом обращении."""
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = MetricsPipeline()
+    return _pipeline
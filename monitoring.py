@@ -1,35 +1,145 @@
 from __future__ import annotations
-import asyncio, logging, time
+import asyncio, logging, os, sys, threading, time
+from collections import Counter as _Tally
 from http import HTTPStatus
-from aiohttp import web
-from prometheus_client import (
-    CONTENT_TYPE_LATEST, Counter, Gauge, generate_latest
-)
-import config
+from typing import TYPE_CHECKING
+import config  # до prometheus_client: выставляет PROMETHEUS_MULTIPROC_DIR
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+if TYPE_CHECKING:  # HTTP-экспозиция (aiohttp.web) импортируется при старте сервера
+    from aiohttp import web
 
 logger = logging.getLogger(__name__)
 
-PNL_TOTAL        = Gauge("pnl_total",        "Realized PnL",              ["sym"])
-PNL_UNREAL       = Gauge("pnl_unreal",       "Unrealized PnL",            ["sym"])
-TRADING_EDGE     = Gauge("trading_edge",     "Edge before entry",         ["sym"])
-CYCLE_LATENCY_MS = Gauge("cycle_latency_ms", "Loop latency ms",           ["sym"])
-ORDERS_ACTIVE    = Gauge("orders_active",    "Active orders flag",        ["sym"])
-POSITION_SIZE    = Gauge("position_size",    "Position size",             ["sym"])
+# символ принадлежит одному воркеру, поэтому в multiprocess-режиме
+# значения живых процессов суммируются (mode игнорируется в одном процессе)
+_SUM, _MAX = "livesum", "livemax"
+PNL_TOTAL        = Gauge("pnl_total",        "Realized PnL",              ["sym"], multiprocess_mode=_SUM)
+PNL_UNREAL       = Gauge("pnl_unreal",       "Unrealized PnL",            ["sym"], multiprocess_mode=_SUM)
+TRADING_EDGE     = Gauge("trading_edge",     "Edge before entry",         ["sym"], multiprocess_mode=_SUM)
+CYCLE_LATENCY_MS = Gauge("cycle_latency_ms", "Loop latency ms",           ["sym"], multiprocess_mode=_MAX)
+ORDERS_ACTIVE    = Gauge("orders_active",    "Active orders flag",        ["sym"], multiprocess_mode=_SUM)
+POSITION_SIZE    = Gauge("position_size",    "Position size",             ["sym"], multiprocess_mode=_SUM)
+GROSS_EXPOSURE   = Gauge("gross_exposure",   "Gross exposure, all shards", multiprocess_mode=_MAX)
 ERROR_COUNTER    = Counter("error_total",    "Total errors",              ["type"])
+WORKER_RESTARTS  = Counter("worker_restarts_total", "Crashed shard workers restarted", ["shard"])
+WS_CONFLATED     = Counter("ws_conflated_total", "WS frames merged before apply (consumer behind)")
+WS_RECONNECTS    = Counter("ws_reconnects_total", "Public WS reconnects")
+RETRY_EVENTS     = Counter("retry_events_total", "Retry policy: retry, hedge, deadline, exhausted, rejected",
+                           ["endpoint", "kind"])
+CIRCUIT_STATE    = Gauge("circuit_state", "Circuit breaker: 0 closed, 1 half-open, 2 open", ["endpoint"],
+                         multiprocess_mode=_MAX)
+RECONCILE_EVENTS = Counter("reconcile_total", "Position reconciliation polls, stream gaps, corrections", ["kind"])
+API_LATENCY_MS   = Histogram("api_latency_ms", "REST request latency ms",  ["path"],
+                             buckets=(1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500))
+_FAST_BUCKETS    = (.01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 25, 50, 100, 250)
+STAGE_LATENCY_MS = Histogram("stage_latency_ms", "Trading loop stage latency ms", ["stage"],
+                             buckets=_FAST_BUCKETS)
+TICK_TO_ORDER_MS = Histogram("tick_to_order_ms", "WS receive to order submit ms",
+                             buckets=_FAST_BUCKETS)
+
+PROFILE_MAX_SEC  = 30.0
+TIMESERIES_MAX   = 4096
+
+def _registry():
+    """В режиме супервизора — сводка по файлам всех воркеров, иначе реестр процесса."""
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return REGISTRY
+    from prometheus_client import CollectorRegistry, multiprocess
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
 
 async def metrics_handler(_: web.Request):
-    return web.Response(body=generate_latest(), content_type=CONTENT_TYPE_LATEST)
+    # выполняется в потоке экспозиции: сериализация не занимает торговый loop
+    from aiohttp import web
+    from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+    # CONTENT_TYPE_LATEST содержит charset, поэтому заголовком, а не content_type=
+    return web.Response(body=generate_latest(_registry()), headers={"Content-Type": CONTENT_TYPE_LATEST})
 
 async def health_handler(_: web.Request):
+    from aiohttp import web
     return web.Response(status=HTTPStatus.OK, text="OK")
 
-async def start_metrics_server():
+def sample_stacks(thread_id: int, seconds: float, interval: float = 0.005) -> _Tally:
+    """Сэмплирующий профайлер: стеки потока thread_id в collapsed-формате (flamegraph)."""
+    stacks: _Tally = _Tally()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        parts = []
+        while frame is not None:
+            code = frame.f_code
+            parts.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+            frame = frame.f_back
+        if parts:
+            stacks[";".join(reversed(parts))] += 1
+        time.sleep(interval)
+    return stacks
+
+async def profile_handler(request: web.Request, loop_thread: int | None = None):
+    """GET /debug/profile?seconds=5&interval=0.005 — профиль потока event loop."""
+    from aiohttp import web
+    try:
+        seconds = min(float(request.query.get("seconds", "5")), PROFILE_MAX_SEC)
+        interval = max(float(request.query.get("interval", "0.005")), 0.001)
+    except ValueError:
+        return web.Response(status=HTTPStatus.BAD_REQUEST, text="bad seconds/interval")
+    if loop_thread is None:
+        loop_thread = threading.get_ident()  # обработчик выполняется в потоке loop
+    stacks = await asyncio.get_running_loop().run_in_executor(
+        None, sample_stacks, loop_thread, seconds, interval)
+    body = "\n".join(f"{stack} {n}" for stack, n in stacks.most_common())
+    return web.Response(text=body + "\n")
+
+async def timeseries_handler(request: web.Request):
+    """GET /timeseries?sym=BTCUSDT&n=300 — последние замеры edge, спреда и латентности."""
+    from aiohttp import web
+    from metrics_pipeline import pipeline
+    try:
+        n = min(int(request.query.get("n", "300")), TIMESERIES_MAX)
+    except ValueError:
+        return web.Response(status=HTTPStatus.BAD_REQUEST, text="bad n")
+    pipe = pipeline()
+    syms = request.query.getall("sym", None) or pipe.symbols()
+    out = {}
+    for sym in syms:
+        series = pipe.series(sym, n)
+        if series is not None:
+            out[sym] = series
+    return web.json_response(out)
+
+def make_app(loop_thread: int | None = None) -> web.Application:
+    """loop_thread — поток торгового loop для /debug/profile; по умолчанию текущий."""
+    from aiohttp import web
+    thread = threading.get_ident() if loop_thread is None else loop_thread
+
+    async def profile(request: web.Request):
+        return await profile_handler(request, thread)
+
     app = web.Application()
-    app.add_routes([web.get("/metrics", metrics_handler), web.get("/health", health_handler)])
-    runner = web.AppRunner(app)
-    await runner.setup()
-    await web.TCPSite(runner, config.PROM_HOST, config.PROM_PORT).start()
+    app.add_routes([web.get("/metrics", metrics_handler), web.get("/health", health_handler),
+                    web.get("/debug/profile", profile),
+                    web.get("/timeseries", timeseries_handler)])
+    return app
+
+def _serve(app: web.Application) -> None:
+    from aiohttp import web
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        runner = web.AppRunner(app)
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.TCPSite(runner, config.PROM_HOST, config.PROM_PORT).start())
+    except Exception as exc:
+        logger.error("Metrics server failed: %s", exc)
+        return
     logger.info("Prometheus → http://%s:%s/metrics", config.PROM_HOST, config.PROM_PORT)
+    loop.run_forever()
+
+async def start_metrics_server():
+    """HTTP-экспозиция в отдельном потоке со своим loop: скрейп не добавляет лаг торговому."""
+    app = make_app(threading.get_ident())
+    threading.Thread(target=_serve, args=(app,), name="metrics-http", daemon=True).start()
 
 async def heartbeat():
     while True:
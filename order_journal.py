@@ -0,0 +1,229 @@
+from __future__ import annotations
+import logging, mmap, os, struct, uuid, zlib
+from dataclasses import dataclass
+from decimal import Decimal
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class Order:
+    id: str
+    symbol: str
+    side: str
+    qty: Decimal
+    price: Decimal
+    ts: float
+
+
+def _dec_pack(d: Decimal) -> Tuple[int, int]:
+    sign, digits, exp = d.as_tuple()
+    m = int("".join(map(str, digits)) or "0")
+    return (-m if sign else m), exp
+
+
+def _dec_unpack(m: int, exp: int) -> Decimal:
+    return Decimal(f"{m}E{exp}")
+
+
+class OrderRing:
+    """Кольцо фиксированной ёмкости для последних заявок; append за O(1)."""
+
+    __slots__ = ("cap", "_buf", "_head", "_n")
+
+    def __init__(self, cap: int) -> None:
+        self.cap = cap
+        self._buf: List[Optional[Order]] = [None] * cap
+        self._head = 0  # следующая позиция записи
+        self._n = 0
+
+    def append(self, order: Order) -> None:
+        self._buf[self._head] = order
+        self._head = (self._head + 1) % self.cap
+        if self._n < self.cap:
+            self._n += 1
+
+    def clear(self) -> None:
+        self._buf = [None] * self.cap
+        self._head = self._n = 0
+
+    def __len__(self) -> int:
+        return self._n
+
+    def newest_first(self) -> Iterator[Order]:
+        buf, cap, i = self._buf, self.cap, self._head
+        for _ in range(self._n):
+            i = (i - 1) % cap
+            yield buf[i]
+
+
+class OrderJournal:
+    """Append-only журнал заявок в memory-mapped файле с записями фиксированного размера.
+
+    Каждая запись несёт crc32, файл растёт блоками и заполнен нулями после
+    последней записи. При открытии конец журнала ищется бинарным поиском по
+    первой нулевой записи, а недописанная запись (сбой посреди append)
+    отбрасывается по crc.
+    """
+
+    MAGIC = b"ORDJ\x01\x00\x00\x00"
+    _REC = struct.Struct("<d16s16scqbqb")
+    _CRC = struct.Struct("<I")
+    REC_SIZE = _REC.size + _CRC.size
+    HEADER = 16
+    CHUNK = 1 << 20
+
+    def __init__(self, path: str | os.PathLike) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(self._fd)
+                raise
+        size = os.fstat(self._fd).st_size
+        if size < self.HEADER:
+            os.ftruncate(self._fd, self.HEADER + self.CHUNK)
+            os.pwrite(self._fd, self.MAGIC.ljust(self.HEADER, b"\0"), 0)
+        elif os.pread(self._fd, len(self.MAGIC), 0) != self.MAGIC:
+            os.close(self._fd)
+            raise ValueError(f"{self.path}: not an order journal")
+        self._mm = mmap.mmap(self._fd, 0)
+        self.count = self._recover()
+
+    # — запись —
+    def _capacity(self) -> int:
+        return (len(self._mm) - self.HEADER) // self.REC_SIZE
+
+    def _off(self, i: int) -> int:
+        return self.HEADER + i * self.REC_SIZE
+
+    def append(self, o: Order) -> None:
+        if self.count >= self._capacity():
+            self._mm.close()
+            os.ftruncate(self._fd, self._off(self.count) + self.CHUNK)
+            self._mm = mmap.mmap(self._fd, 0)
+        qm, qe = _dec_pack(o.qty)
+        pm, pe = _dec_pack(o.price)
+        rec = self._REC.pack(o.ts, uuid.UUID(o.id).bytes, o.symbol.encode()[:16],
+                             o.side[:1].encode(), qm, qe, pm, pe)
+        off = self._off(self.count)
+        self._mm[off:off + self.REC_SIZE] = rec + self._CRC.pack(zlib.crc32(rec))
+        self.count += 1
+
+    def flush(self) -> None:
+        self._mm.flush()
+
+    def close(self) -> None:
+        if self._mm is not None and not self._mm.closed:
+            self._mm.flush()
+            self._mm.close()
+            os.close(self._fd)
+
+    # — чтение —
+    def _valid(self, i: int) -> bool:
+        off = self._off(i)
+        raw = self._mm[off:off + self.REC_SIZE]
+        rec, (crc,) = raw[:self._REC.size], self._CRC.unpack_from(raw, self._REC.size)
+        return any(raw) and zlib.crc32(rec) == crc
+
+    def _recover(self) -> int:
+        lo, hi = 0, self._capacity()
+        zero = bytes(self.REC_SIZE)
+        while lo < hi:  # первая нулевая запись
+            mid = (lo + hi) // 2
+            off = self._off(mid)
+            if self._mm[off:off + self.REC_SIZE] == zero:
+                hi = mid
+            else:
+                lo = mid + 1
+        n = lo
+        while n and not self._valid(n - 1):  # хвост, оборванный сбоем
+            n -= 1
+            off = self._off(n)
+            self._mm[off:off + self.REC_SIZE] = zero
+        return n
+
+    def read(self, i: int) -> Order:
+        ts, oid, sym, side, qm, qe, pm, pe = self._REC.unpack_from(self._mm, self._off(i))
+        return Order(str(uuid.UUID(bytes=oid)), sym.rstrip(b"\0").decode(),
+                     "Buy" if side == b"B" else "Sell", _dec_unpack(qm, qe), _dec_unpack(pm, pe), ts)
+
+    def __len__(self) -> int:
+        return self.count
+
+
+class OrderHistory:
+    """Последние заявки в кольце плюс полная история в журнале."""
+
+    def __init__(self, cap: int, journal_path: str | os.PathLike | None = None) -> None:
+        self.ring = OrderRing(cap)
+        self.journal_path = journal_path
+        self.journal: OrderJournal | None = None
+        self._journaled = 0  # сколько самых новых записей кольца есть в журнале
+        self._base = 0       # записи журнала до clear() в историю не входят
+
+    def open_journal(self) -> None:
+        if self.journal is not None or not self.journal_path:
+            return
+        try:
+            self.journal = OrderJournal(self.journal_path)
+        except OSError as exc:
+            logger.warning("Order journal disabled (%s): %s", self.journal_path, exc)
+
+    def close(self) -> None:
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    def append(self, order: Order) -> None:
+        self.ring.append(order)
+        if self.journal is not None:
+            self.journal.append(order)
+            self._journaled += 1
+
+    def clear(self) -> None:
+        """Пустая история; файл журнала не усекается, старые записи просто не видны."""
+        self.ring.clear()
+        self._journaled = 0
+        self._base = 0 if self.journal is None else self.journal.count
+
+    def __len__(self) -> int:
+        return len(self.ring)
+
+    def __iter__(self) -> Iterator[Order]:
+        return self.iter()
+
+    def iter(self, sym: str | None = None, side: str | None = None, since: float | None = None,
+             offset: int = 0, limit: int | None = None) -> Iterator[Order]:
+        """Ленивый обход от новых к старым: сначала кольцо, затем журнал, без копии."""
+        skipped = yielded = 0
+        for o in self._newest_first():
+            if since is not None and o.ts < since:
+                return
+            if (sym is not None and o.symbol != sym) or (side is not None and o.side != side):
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            if limit is not None and yielded >= limit:
+                return
+            yielded += 1
+            yield o
+
+    def _newest_first(self) -> Iterator[Order]:
+        yield from self.ring.newest_first()
+        j = self.journal
+        if j is None:
+            return
+        for i in range(j.count - min(len(self.ring), self._journaled) - 1, self._base - 1, -1):
+            yield j.read(i)
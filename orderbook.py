@@ -0,0 +1,137 @@
+from __future__ import annotations
+import logging
+from typing import Iterable, Literal, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+Levels = Iterable[Tuple[int, int]]  # (цена в тиках, объём в лотах)
+
+
+def _levels(levels: Levels) -> np.ndarray:
+    if isinstance(levels, np.ndarray):
+        return levels.reshape(-1, 2)
+    return np.array(list(levels), dtype=np.int64).reshape(-1, 2)
+
+
+class BookGap(Exception):
+    """Пропущен номер обновления — стакан нужно пересинхронизировать снапшотом."""
+
+
+class _Side:
+    """Одна сторона стакана в отсортированных int64-массивах фиксированной ёмкости.
+
+    Ключи хранятся по возрастанию: для asks это цена, для bids — цена со знаком
+    минус, поэтому лучший уровень всегда в позиции 0.
+    """
+
+    __slots__ = ("keys", "qty", "n", "sign")
+
+    def __init__(self, cap: int, sign: int) -> None:
+        self.keys = np.zeros(cap, dtype=np.int64)
+        self.qty = np.zeros(cap, dtype=np.int64)
+        self.n = 0
+        self.sign = sign
+
+    def clear(self) -> None:
+        self.n = 0
+
+    def load(self, prices: np.ndarray, qty: np.ndarray) -> None:
+        """Снапшот одним векторным проходом: сортировка и обрезка по ёмкости."""
+        live = qty > 0
+        keys = prices[live] * self.sign
+        order = np.argsort(keys, kind="stable")[:self.keys.shape[0]]
+        n = order.shape[0]
+        self.keys[:n] = keys[order]
+        self.qty[:n] = qty[live][order]
+        self.n = n
+
+    def set(self, price: int, qty: int) -> None:
+        keys, n = self.keys, self.n
+        k = price * self.sign
+        i = int(keys[:n].searchsorted(k))  # O(log n)
+        if i < n and keys[i] == k:
+            if qty:
+                self.qty[i] = qty
+            else:  # удаление уровня
+                keys[i:n-1] = keys[i+1:n]
+                self.qty[i:n-1] = self.qty[i+1:n]
+                self.n = n - 1
+            return
+        if not qty:
+            return
+        cap = keys.shape[0]
+        if n == cap:
+            if i == cap:
+                return  # глубже отслеживаемой глубины
+            n -= 1      # вытесняем самый дальний уровень
+        keys[i+1:n+1] = keys[i:n]
+        self.qty[i+1:n+1] = self.qty[i:n]
+        keys[i] = k
+        self.qty[i] = qty
+        self.n = n + 1
+
+    def prices(self) -> np.ndarray:
+        return self.keys[:self.n] * self.sign
+
+    def sizes(self) -> np.ndarray:
+        return self.qty[:self.n]
+
+
+class OrderBook:
+    """Компактный L2-стакан: снапшот + дельты с контролем последовательности."""
+
+    __slots__ = ("sym", "bids", "asks", "seq", "stale")
+
+    def __init__(self, sym: str, depth: int = 50) -> None:
+        self.sym = sym
+        self.bids = _Side(depth, -1)
+        self.asks = _Side(depth, 1)
+        self.seq = 0
+        self.stale = True
+
+    def apply_snapshot(self, bids: Levels, asks: Levels, seq: int) -> None:
+        b, a = _levels(bids), _levels(asks)
+        self.load(b[:, 0], b[:, 1], a[:, 0], a[:, 1], seq)
+
+    def load(self, bid_px: np.ndarray, bid_qty: np.ndarray,
+             ask_px: np.ndarray, ask_qty: np.ndarray, seq: int) -> None:
+        """Снапшот из готовых int64-колонок (реплей записей без Python-цикла по уровням)."""
+        self.bids.load(bid_px, bid_qty)
+        self.asks.load(ask_px, ask_qty)
+        self.seq = seq
+        self.stale = False
+
+    def apply_delta(self, bids: Levels, asks: Levels, seq: int) -> None:
+        if self.stale or seq != self.seq + 1:
+            self.stale = True
+            raise BookGap(f"{self.sym}: seq {seq} after {self.seq}")
+        for p, q in bids:
+            self.bids.set(p, q)
+        for p, q in asks:
+            self.asks.set(p, q)
+        self.seq = seq
+
+    def best(self) -> Tuple[int, int] | None:
+        if not self.bids.n or not self.asks.n:
+            return None
+        return int(-self.bids.keys[0]), int(self.asks.keys[0])
+
+    def walk(self, side: Literal["Buy", "Sell"], qty: int,
+             depth: int | None = None) -> Tuple[int, int] | None:
+        """(notional, worst) для рыночной заявки объёмом qty лотов или None, если глубины мало.
+
+        notional — сумма тиков × лотов, т.е. VWAP = notional / qty без потери точности.
+        """
+        book = self.asks if side == "Buy" else self.bids
+        n = book.n if depth is None else min(book.n, depth)
+        if not n or qty <= 0:
+            return None
+        px = book.keys[:n] * book.sign
+        cum = np.cumsum(book.qty[:n])
+        i = int(np.searchsorted(cum, qty))
+        if i >= n:
+            return None
+        filled = int(cum[i-1]) if i else 0
+        notional = int(np.dot(px[:i], book.qty[:i])) + int(px[i]) * (qty - filled)
+        return notional, int(px[i])
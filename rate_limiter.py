@@ -0,0 +1,133 @@
+from __future__ import annotations
+import asyncio, heapq, itertools, logging, time
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# приоритеты: меньше — раньше
+PRIO_ORDER, PRIO_POSITION, PRIO_QUERY = 0, 1, 2
+
+# группы лимитов Bybit v5 (на UID): запросов в секунду и допустимый всплеск
+LIMIT_GROUPS: Dict[str, Tuple[float, float]] = {
+    "order":    (10.0, 10.0),    # create / amend / cancel, batch считается по числу заявок
+    "position": (50.0, 50.0),    # /v5/position/*
+    "query":    (50.0, 50.0),    # order/realtime, history, account
+}
+# общий лимит IP: 600 запросов / 5 с на все эндпоинты; у public — только он.
+# Здесь встречаются все классы, поэтому очередь по приоритету работает именно тут
+IP_LIMIT: Tuple[float, float] = (120.0, 600.0)
+
+# path → (группа, вес, приоритет)
+ENDPOINTS: Dict[str, Tuple[str, int, int]] = {
+    "/v5/order/create":       ("order", 1, PRIO_ORDER),
+    "/v5/order/amend":        ("order", 1, PRIO_ORDER),
+    "/v5/order/cancel":       ("order", 1, PRIO_ORDER),
+    "/v5/order/cancel-all":   ("order", 1, PRIO_ORDER),
+    "/v5/order/create-batch": ("order", 1, PRIO_ORDER),
+    "/v5/order/cancel-batch": ("order", 1, PRIO_ORDER),
+    "/v5/position/list":      ("position", 1, PRIO_POSITION),
+}
+
+
+def classify(path: str) -> Tuple[str, int, int]:
+    spec = ENDPOINTS.get(path)
+    if spec is not None:
+        return spec
+    if path.startswith("/v5/market/"):
+        return "public", 1, PRIO_QUERY
+    if path.startswith("/v5/position/"):
+        return "position", 1, PRIO_POSITION
+    return "query", 1, PRIO_QUERY
+
+
+class TokenBucket:
+    """O(1) token bucket; ожидающие обслуживаются по приоритету, затем FIFO.
+
+    Токены списываются в момент пробуждения, поэтому всплеск не может
+    превысить лимит даже при конкурентных вызовах.
+    """
+
+    def __init__(self, rate: float, burst: float | None = None) -> None:
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._timer: asyncio.TimerHandle | None = None
+        self.acquired = 0
+        self.throttled = 0
+        self.throttled_sec = 0.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def _drain(self) -> None:
+        self._timer = None
+        self._refill()
+        heap = self._heap
+        while heap:
+            _, _, weight, fut = heap[0]
+            if fut.done():  # ожидающий отменён
+                heapq.heappop(heap)
+                continue
+            if self._tokens < weight:
+                break
+            heapq.heappop(heap)
+            self._tokens -= weight
+            fut.set_result(None)
+        if heap:
+            delay = (heap[0][2] - self._tokens) / self.rate
+            self._timer = asyncio.get_running_loop().call_later(delay, self._drain)
+
+    async def acquire(self, weight: float = 1, priority: int = PRIO_QUERY) -> None:
+        weight = min(weight, self.burst)
+        self._refill()
+        self.acquired += 1
+        if not self._heap and self._tokens >= weight:
+            self._tokens -= weight
+            return
+        fut = asyncio.get_running_loop().create_future()
+        item = (priority, next(self._seq), weight, fut)
+        heapq.heappush(self._heap, item)
+        if self._heap[0] is item:  # новая голова очереди — пересчитать таймер
+            if self._timer is not None:
+                self._timer.cancel()
+            self._drain()
+        t0 = time.perf_counter()
+        try:
+            await fut
+        finally:
+            self.throttled += 1
+            self.throttled_sec += time.perf_counter() - t0
+
+
+class RateLimiter:
+    """Token bucket'ы групп лимитов Bybit v5 и общий bucket IP.
+
+    Запрос сначала проходит bucket своей группы (вес — число заявок), затем
+    общий bucket IP (вес 1 на HTTP-запрос). При нехватке лимита IP заявки
+    обгоняют опрос позиций и запросы.
+    """
+
+    def __init__(self, groups: Dict[str, Tuple[float, float]] | None = None,
+                 ip: Tuple[float, float] | None = None) -> None:
+        self.buckets = {g: TokenBucket(r, b) for g, (r, b) in (groups or LIMIT_GROUPS).items()}
+        self.ip = TokenBucket(*(ip or IP_LIMIT))
+
+    async def acquire(self, path: str, weight: int | None = None, priority: int | None = None) -> None:
+        group, w, prio = classify(path)
+        prio = prio if priority is None else priority
+        bucket = self.buckets.get(group)
+        if bucket is not None:
+            await bucket.acquire(w if weight is None else weight, prio)
+        await self.ip.acquire(1, prio)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {
+            g: {"acquired": b.acquired, "throttled": b.throttled,
+                "throttled_sec": round(b.throttled_sec, 6), "queued": len(b._heap)}
+            for g, b in (*self.buckets.items(), ("ip", self.ip))
+        }
@@ -1,25 +1,134 @@
 from __future__ import annotations
 import asyncio, logging
 from decimal import Decimal
+from typing import Dict, Set
 import config
-from retry_utils import retry_async
+from exec_stream import PositionUpdate
+from fixed_point import instrument
+from monitoring import RECONCILE_EVENTS
+from retry_utils import CircuitOpen, RetryPolicy
 
 logger = logging.getLogger(__name__)
 MIN_IMBAL_QTY = Decimal("0.0001")
 
-async def smart_rebalance(client: "APIClient", bot: "TradingBotMulti"):  # noqa: F821
-    while True:
-        await asyncio.sleep(2)
+_EV_POLL = RECONCILE_EVENTS.labels(kind="poll")
+_EV_GAP  = RECONCILE_EVENTS.labels(kind="gap")
+_EV_FIX  = RECONCILE_EVENTS.labels(kind="correction")
+
+# чтение позиций идемпотентно: хедж по p95 и не дольше POLL_BUDGET_SEC на опрос
+POLL_BUDGET_SEC = 5.0
+_READS = RetryPolicy(attempts=3, wait=0.2, budget=POLL_BUDGET_SEC, hedge=True)
+
+
+class Reconciler:
+    """Сверка ledger с позициями биржи по приватному потоку исполнений.
+
+    Каждое обновление потока помечает символ грязным; сверяются только
+    грязные символы, а корректирующие заявки уходят одним create-batch.
+    Ledger — целевая позиция бота: заявка двигает биржу к нему и в ledger
+    не записывается.
+    Пропуск seq по символу означает потерянное обновление — тогда, как и
+    раз в RECONCILE_POLL_SEC на всякий случай, идёт полный опрос позиций.
+    """
+
+    RETRY_SEC = 2.0  # пауза после неудачного полного опроса
+
+    def __init__(self, client: "APIClient", bot: "TradingBotMulti",  # noqa: F821
+                 poll_sec: float | None = None, delay: float | None = None) -> None:
+        self.client, self.bot = client, bot
+        self.ledger = bot.ledger
+        self.poll_sec = config.RECONCILE_POLL_SEC if poll_sec is None else poll_sec
+        self.delay = config.RECONCILE_DELAY_MS / 1000 if delay is None else delay
+        self.exch: Dict[str, int] = {}  # позиция биржи, лоты
+        self._seq: Dict[str, int] = {}
+        self.dirty: Set[str] = set()
+        self._wake = asyncio.Event()
+        self._need_poll = True  # первый проход — полная сверка
+        self.polls = self.gaps = 0
+
+    def on_update(self, u: PositionUpdate) -> None:
+        last = self._seq.get(u.sym)
+        if last is not None:
+            if u.seq <= last:
+                return  # повтор или устаревшее
+            if u.seq != last + 1:
+                self.gaps += 1
+                _EV_GAP.inc()
+                self._need_poll = True
+                logger.warning("Position stream gap %s: %s -> %s", u.sym, last, u.seq)
+        self._seq[u.sym] = u.seq
+        self.exch[u.sym] = u.lots
+        self.dirty.add(u.sym)
+        self._wake.set()
+
+    async def poll(self) -> None:
+        before = dict(self._seq)
+        on_chain = await _READS.call(self.client.restore_positions, "/v5/position/list")
+        for sym in self.ledger:
+            # обновления, пришедшие во время запроса, новее ответа
+            if self._seq.get(sym) == before.get(sym):
+                self.exch[sym] = instrument(sym).to_lots(on_chain.get(sym, Decimal()))
+        self.dirty.update(self.ledger)
+        self._need_poll = False
+        self.polls += 1
+        _EV_POLL.inc()
+
+    async def reconcile(self) -> int:
+        """Корректирующие заявки по грязным символам; возвращает их число."""
+        dirty, self.dirty = self.dirty, set()
+        orders = []
+        for sym in dirty:
+            if sym not in self.exch:
+                continue
+            diff = self.ledger.position(sym) - self.exch[sym]  # сколько докупить на бирже
+            qty = instrument(sym).qty(abs(diff))
+            if qty < MIN_IMBAL_QTY:
+                continue
+            orders.append((sym, "Buy" if diff > 0 else "Sell", qty))
+        if not orders:
+            return 0
+        before = {sym: self._seq.get(sym) for sym, _, _ in orders}
+        results = await self.client.place_orders_batch(orders, book=False)
+        for (sym, side, qty), res in zip(orders, results):
+            if res.get("status") != "ok":
+                logger.warning("Rebalance %s %s rejected: %s", sym, side, res.get("msg"))
+                continue
+            _EV_FIX.inc()
+            if self._seq.get(sym) == before[sym]:
+                # поток ещё не подтвердил: считаем биржу выровненной, без повторной заявки
+                lots = instrument(sym).to_lots(qty)
+                self.exch[sym] += lots if side == "Buy" else -lots
+            logger.info("Rebalance %s %s %.6f", sym, side, qty)
+        return len(orders)
+
+    async def run(self) -> None:
+        stream = self.client.stream
+        stream.subscribe(self.on_update)
+        loop = asyncio.get_running_loop()
+        next_poll = loop.time()
         try:
-            on_chain = await retry_async(client.restore_positions)
-            for sym in config.TRADE_PAIRS:
-                diff = bot.position[sym] - on_chain.get(sym, Decimal())
-                if abs(diff) < MIN_IMBAL_QTY:
-                    continue
-                side = "Buy" if diff < 0 else "Sell"
-                qty  = abs(diff)
-                await client.place_order(sym, side, qty)
-                bot.position[sym] -= diff
-                logger.info("Rebalance %s %s %.6f", sym, side, qty)
-        except Exception as exc:
-            logger.warning("Rebalance err: %s", exc)
+            while True:
+                if not self._need_poll:
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), max(0.0, next_poll - loop.time()))
+                    except asyncio.TimeoutError:
+                        self._need_poll = True
+                self._wake.clear()
+                try:
+                    if self._need_poll:
+                        await self.poll()
+                        next_poll = loop.time() + self.poll_sec
+                    elif self.delay:
+                        await asyncio.sleep(self.delay)  # копим обновления в один батч
+                    await self.reconcile()
+                except Exception as exc:
+                    logger.warning("Rebalance err: %s", exc)
+                    if self._need_poll:
+                        wait = exc.retry_in if isinstance(exc, CircuitOpen) else 0.0
+                        await asyncio.sleep(max(self.RETRY_SEC, wait))
+        finally:
+            stream.unsubscribe(self.on_update)
+
+
+async def smart_rebalance(client: "APIClient", bot: "TradingBotMulti"):  # noqa: F821
+    await Reconciler(client, bot).run()
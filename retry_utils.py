@@ -1,22 +1,210 @@
 from __future__ import annotations
-import asyncio, logging
-from typing import Awaitable, Callable, TypeVar
-import tenacity
+import asyncio, logging, time
+from typing import Awaitable, Callable, Dict, Tuple, TypeVar
+import config
+from monitoring import CIRCUIT_STATE, RETRY_EVENTS
 
 logger = logging.getLogger(__name__)
 _T = TypeVar("_T")
 
+
+class CircuitOpen(Exception):
+    """Эндпоинт в состоянии open: запрос не отправляется."""
+
+    def __init__(self, endpoint: str, retry_in: float) -> None:
+        super().__init__(f"{endpoint}: circuit open, retry in {retry_in:.1f}s")
+        self.endpoint, self.retry_in = endpoint, retry_in
+
+
+class CircuitBreaker:
+    """closed → open после fails ошибок подряд; через cooldown — half-open.
+
+    В half-open пропускается одна пробная попытка: успех закрывает цепь,
+    ошибка снова открывает её на cooldown.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+    __slots__ = ("endpoint", "fails", "cooldown", "state", "opened_at", "_errors", "_probing", "_gauge")
+
+    def __init__(self, endpoint: str, fails: int, cooldown: float) -> None:
+        self.endpoint = endpoint
+        self.fails, self.cooldown = fails, cooldown
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self._errors = 0
+        self._probing = False
+        self._gauge = CIRCUIT_STATE.labels(endpoint=endpoint)
+
+    def allow(self, now: float) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            if now - self.opened_at < self.cooldown:
+                return False
+            self._set(self.HALF_OPEN)
+        if self._probing:
+            return False  # пробная попытка уже в полёте
+        self._probing = True
+        return True
+
+    def success(self) -> None:
+        self._errors = 0
+        self._probing = False
+        if self.state != self.CLOSED:
+            self._set(self.CLOSED)
+
+    def failure(self, now: float) -> None:
+        self._errors += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self._errors >= self.fails:
+            self.opened_at = now
+            if self.state != self.OPEN:
+                self._set(self.OPEN)
+                logger.warning("Circuit open: %s after %s errors", self.endpoint, self._errors)
+
+    def release(self) -> None:
+        """Попытка прервана без ответа эндпоинта: не ошибка, но пробу нужно освободить."""
+        self._probing = False
+
+    def retry_in(self, now: float) -> float:
+        return max(0.0, self.opened_at + self.cooldown - now)
+
+    def _set(self, state: int) -> None:
+        self.state = state
+        self._gauge.set(state)
+
+
+class _Latency:
+    """Последние SIZE длительностей эндпоинта; p95 пересчитывается раз в EVERY замеров."""
+
+    SIZE, EVERY = 128, 16
+
+    __slots__ = ("_buf", "_i", "_n", "p95")
+
+    def __init__(self) -> None:
+        self._buf = [0.0] * self.SIZE
+        self._i = self._n = 0
+        self.p95: float | None = None
+
+    def add(self, sec: float) -> None:
+        self._buf[self._i] = sec
+        self._i = (self._i + 1) % self.SIZE
+        self._n += 1
+        if self._n % self.EVERY == 0:
+            s = sorted(self._buf[:min(self._n, self.SIZE)])
+            self.p95 = s[int(0.95 * (len(s) - 1))]
+
+
+class RetryPolicy:
+    """Повторы с экспоненциальной паузой, создаётся один раз и переиспользуется.
+
+    На каждый эндпоинт — свой circuit breaker и окно длительностей. С
+    budget (или deadline в call) попытка ограничена оставшимся временем,
+    а повтор не делается, если на паузу и типичную попытку времени уже
+    не хватает. hedge=True — для идемпотентных чтений: если ответа нет
+    дольше p95 эндпоинта, отправляется второй запрос и берётся первый
+    успешный.
+    """
+
+    def __init__(self, *, attempts: int = 4, wait: float = 0.5, backoff: float = 2.0,
+                 max_wait: float = 10.0, budget: float | None = None, hedge: bool = False,
+                 hedge_min: float | None = None, fails: int | None = None, cooldown: float | None = None,
+                 retry_on: Tuple[type, ...] = (Exception,)) -> None:
+        self.attempts, self.budget, self.hedge = attempts, budget, hedge
+        self._delays = [min(wait * backoff ** i, max_wait) for i in range(max(0, attempts - 1))]
+        self.hedge_min = config.HEDGE_MIN_MS / 1000 if hedge_min is None else hedge_min
+        self.fails = config.BREAKER_FAILS if fails is None else fails
+        self.cooldown = config.BREAKER_COOLDOWN_SEC if cooldown is None else cooldown
+        self.retry_on = retry_on
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latency: Dict[str, _Latency] = {}
+
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        br = self._breakers.get(endpoint)
+        if br is None:
+            br = self._breakers[endpoint] = CircuitBreaker(endpoint, self.fails, self.cooldown)
+        return br
+
+    async def call(self, func: Callable[[], Awaitable[_T]], endpoint: str | None = None,
+                   deadline: float | None = None) -> _T:
+        """func() с повторами; deadline — по time.monotonic()."""
+        ep = endpoint or getattr(func, "__qualname__", "call")
+        br = self.breaker(ep)
+        lat = self._latency.get(ep)
+        if lat is None:
+            lat = self._latency[ep] = _Latency()
+        if deadline is None and self.budget is not None:
+            deadline = time.monotonic() + self.budget
+        delays = self._delays
+        for attempt in range(self.attempts):
+            t0 = time.monotonic()
+            if not br.allow(t0):
+                RETRY_EVENTS.labels(endpoint=ep, kind="rejected").inc()
+                raise CircuitOpen(ep, br.retry_in(t0))
+            try:
+                if deadline is None:
+                    res = await (self._hedged(func, ep, lat) if self.hedge else func())
+                else:
+                    res = await asyncio.wait_for(
+                        self._hedged(func, ep, lat) if self.hedge else func(), max(0.0, deadline - t0))
+            except self.retry_on as exc:
+                now = time.monotonic()
+                br.failure(now)
+                if attempt == len(delays):
+                    RETRY_EVENTS.labels(endpoint=ep, kind="exhausted").inc()
+                    raise
+                delay = delays[attempt]
+                # пауза плюс типичная попытка не укладываются в бюджет — повтор бесполезен
+                if deadline is not None and now + delay + (lat.p95 or 0.0) >= deadline:
+                    RETRY_EVENTS.labels(endpoint=ep, kind="deadline").inc()
+                    raise
+                RETRY_EVENTS.labels(endpoint=ep, kind="retry").inc()
+                logger.warning("retry %s/%s %s: %r", attempt + 1, self.attempts, ep, exc)
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                br.release()  # отмена или чужое исключение: пробную попытку отдаём следующему вызову
+                raise
+            lat.add(time.monotonic() - t0)
+            br.success()
+            return res
+        raise AssertionError("unreachable")
+
+    async def _hedged(self, func: Callable[[], Awaitable[_T]], ep: str, lat: _Latency) -> _T:
+        if lat.p95 is None:
+            return await func()  # ещё нет статистики — без хеджа
+        first = asyncio.ensure_future(func())
+        pending = {first}
+        err: BaseException | None = None
+        try:
+            done, _ = await asyncio.wait(pending, timeout=max(lat.p95, self.hedge_min))
+            if done:
+                return first.result()
+            RETRY_EVENTS.labels(endpoint=ep, kind="hedge").inc()
+            pending.add(asyncio.ensure_future(func()))
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    if t.exception() is None:
+                        return t.result()
+                    err = t.exception()
+            raise err
+        finally:
+            for t in pending:
+                t.cancel()
+
+
+_policies: Dict[Tuple[int, float, float], RetryPolicy] = {}
+
+
 async def retry_async(
     func: Callable[[], Awaitable[_T]],
     *, attempts: int = 4, wait: float = 0.5, backoff: float = 2.0
 ) -> _T:
-    @tenacity.retry(
-        reraise=True,
-        stop=tenacity.stop_after_attempt(attempts),
-        wait=tenacity.wait_exponential(multiplier=wait, exp_base=backoff),
-        before_sleep=lambda rs: logger.warning(
-            "retry %s/%s: %s", rs.attempt_number, attempts, rs.outcome.exception()),
-    )
-    async def _wrapper() -> _T:
-        return await func()
-    return await _wrapper()
+    """Прежний интерфейс: общий RetryPolicy на набор параметров, эндпоинт — имя func."""
+    key = (attempts, wait, backoff)
+    policy = _policies.get(key)
+    if policy is None:
+        policy = _policies[key] = RetryPolicy(attempts=attempts, wait=wait, backoff=backoff)
+    return await policy.call(func)
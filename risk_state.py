@@ -0,0 +1,127 @@
+from __future__ import annotations
+import logging, threading
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List
+import numpy as np
+import config
+from fixed_point import instrument
+
+logger = logging.getLogger(__name__)
+
+
+class RiskState:
+    """Позиции (лоты) и экспозиция всех символов в одном буфере.
+
+    В режиме супервизора буфер — SharedMemory, общий для воркеров: каждый
+    символ пишет только его воркер, а проверка лимитов и изменение суммарной
+    экспозиции идут под межпроцессным lock. Без супервизора — обычный
+    bytearray в процессе.
+
+    Раскладка: gross float64 | pos int64[n] | exp float64[n] | px int64[n].
+    """
+
+    def __init__(self, symbols: List[str], buf=None, lock=None, shm: SharedMemory | None = None) -> None:
+        n = len(symbols)
+        self.symbols = list(symbols)
+        self.index: Dict[str, int] = {s: i for i, s in enumerate(symbols)}
+        self._bind(bytearray(self.nbytes(n)) if buf is None else buf, n)
+        self._f = [instrument(s).pnl_f for s in symbols]  # тики × лоты → валюта котировки
+        self._lock = lock or threading.Lock()
+        self._shm = shm
+        self.max_gross = config.MAX_GROSS_EXPOSURE
+        self.max_symbol = config.MAX_SYMBOL_EXPOSURE
+        self.rejected = 0
+
+    def _bind(self, buf, n: int) -> None:
+        self._gross = np.ndarray((1,), np.float64, buf, 0)
+        self.pos = np.ndarray((n,), np.int64, buf, 8)
+        self.exp = np.ndarray((n,), np.float64, buf, 8 + 8 * n)
+        self.px = np.ndarray((n,), np.int64, buf, 8 + 16 * n)  # цена последней записи, тики
+
+    @staticmethod
+    def nbytes(n: int) -> int:
+        return 8 + 24 * n
+
+    @classmethod
+    def create(cls, symbols: List[str], lock) -> "RiskState":
+        shm = SharedMemory(create=True, size=cls.nbytes(len(symbols)))
+        shm.buf[:cls.nbytes(len(symbols))] = bytes(cls.nbytes(len(symbols)))
+        return cls(symbols, shm.buf, lock, shm)
+
+    @classmethod
+    def attach(cls, name: str, symbols: List[str], lock) -> "RiskState":
+        # воркеры делят resource_tracker супервизора, сегмент удаляет только он
+        shm = SharedMemory(name=name)
+        return cls(symbols, shm.buf, lock, shm)
+
+    @property
+    def name(self) -> str | None:
+        return self._shm.name if self._shm is not None else None
+
+    def add_symbol(self, sym: str) -> bool:
+        """Горячее добавление символа. Общий буфер супервизора фиксирован — там False."""
+        if sym in self.index:
+            return True
+        if self._shm is not None:
+            return False
+        with self._lock:
+            n = len(self.symbols)
+            gross, pos, exp, px = self._gross[0], self.pos, self.exp, self.px
+            self._bind(bytearray(self.nbytes(n + 1)), n + 1)
+            self._gross[0] = gross
+            self.pos[:n], self.exp[:n], self.px[:n] = pos, exp, px
+            self.symbols.append(sym)
+            self._f.append(instrument(sym).pnl_f)
+            self.index[sym] = n
+        return True
+
+    # — чтение —
+    def position(self, sym: str) -> int:
+        i = self.index.get(sym)
+        return 0 if i is None else int(self.pos[i])
+
+    def price(self, sym: str) -> int:
+        i = self.index.get(sym)
+        return 0 if i is None else int(self.px[i])
+
+    def gross(self) -> float:
+        return float(self._gross[0])
+
+    # — запись —
+    def reserve(self, sym: str, pos: int, price: int) -> bool:
+        """Атомарно перевести позицию sym в pos лотов по цене price, если лимиты позволяют.
+
+        Сокращение позиции разрешено всегда.
+        """
+        i = self.index[sym]
+        with self._lock:
+            exp = abs(pos) * price * self._f[i]
+            if abs(pos) > abs(int(self.pos[i])):
+                if (self.max_symbol and exp > self.max_symbol) or (
+                        self.max_gross and self._gross[0] - self.exp[i] + exp > self.max_gross):
+                    self.rejected += 1
+                    return False
+            self._commit(i, pos, exp, price)
+        return True
+
+    def set(self, sym: str, pos: int, price: int) -> None:
+        """Безусловная запись (откат неисполненной заявки, ребалансировка)."""
+        i = self.index[sym]
+        with self._lock:
+            self._commit(i, pos, abs(pos) * price * self._f[i], price)
+
+    def _commit(self, i: int, pos: int, exp: float, price: int) -> None:
+        self._gross[0] += exp - self.exp[i]
+        self.exp[i] = exp
+        self.pos[i] = pos
+        self.px[i] = price
+
+    def close(self, unlink: bool = False) -> None:
+        if self._shm is None:
+            return
+        # numpy-представления держат ссылку на буфер — сначала отпускаем их
+        self._gross = self.pos = self.exp = self.px = None
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
+        self._shm = None
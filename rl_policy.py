@@ -0,0 +1,257 @@
+"""CPU-политика поверх стратегии: фильтр сигналов analyze → _trade.
+
+На сигнале стратегии цикл отдаёт текущее наблюдение (edge, bid, ask,
+позиция) в очередь потока rl-infer и ждёт ответа через
+asyncio.wrap_future, не блокируя loop. Поток за один прямой проход MLP
+отвечает на все накопившиеся запросы (пакетный режим шлёт их за проход
+сразу). Решение всегда посчитано по тому наблюдению, которое пишется в
+роллаут. Нет весов, поток не запущен или ответ не пришёл за RL_INFER_MS —
+сигнал проходит как раньше, без строки роллаута. Веса — .npz с W1, b1,
+W2, b2. Раз в RL_UPDATE_SEC поток перечитывает RL_MODEL_PATH, если файл
+изменился, и подменяет веса одной ссылкой, не останавливая торговлю.
+Роллауты (наблюдение, решение, награда — изменение PnL символа до
+следующего решения) пишутся в предвыделенное кольцо на RL_BUFFER_CAP
+строк. Накопив RL_MIN_ROLLOUT новых строк, поток выгружает кольцо в
+RL_ROLLOUT_PATH для обучения вне бота.
+"""
+from __future__ import annotations
+import asyncio, logging, os, threading, time
+from collections import deque
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Dict, List, Tuple
+import numpy as np
+import config
+from monitoring import STAGE_LATENCY_MS
+import state_snapshot
+
+logger = logging.getLogger(__name__)
+
+OBS_FIELDS = ("edge_bps", "spread_bps", "position")
+_RAW = 5  # edge.num, edge.den, bid, ask, лоты
+_ST_INFER = STAGE_LATENCY_MS.labels(stage="rl_infer")
+
+Weights = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+def features(raw: np.ndarray) -> np.ndarray:
+    """(n, 5) сырых наблюдений → (n, len(OBS_FIELDS)) float32; пустые строки — нули."""
+    num, den, bid, ask, lots = raw.T
+    side = ask + bid
+    out = np.zeros((len(raw), len(OBS_FIELDS)), np.float32)
+    np.divide(num * 1e4, den, out=out[:, 0], where=den > 0, casting="unsafe")
+    np.divide((ask - bid) * 2e4, side, out=out[:, 1], where=side > 0, casting="unsafe")
+    out[:, 2] = np.sign(lots)
+    return out
+
+
+def forward(w: Weights, obs: np.ndarray) -> np.ndarray:
+    """Логиты (n, 2): [hold, trade]."""
+    w1, b1, w2, b2 = w
+    return np.tanh(obs @ w1 + b1) @ w2 + b2
+
+
+def load_weights(path: str | os.PathLike) -> Weights:
+    with np.load(path, allow_pickle=False) as z:
+        w = tuple(np.asarray(z[k], np.float32) for k in ("W1", "b1", "W2", "b2"))
+    w1, b1, w2, b2 = w
+    if w1.shape[0] != len(OBS_FIELDS) or b1.shape != (w1.shape[1],) \
+            or w2.shape != (w1.shape[1], 2) or b2.shape != (2,):
+        raise ValueError(f"weight shapes {[a.shape for a in w]} do not match obs={len(OBS_FIELDS)}")
+    return w
+
+
+class RolloutBuffer:
+    """Предвыделенное кольцо (наблюдение, решение, награда, слот) на cap строк."""
+
+    def __init__(self, cap: int) -> None:
+        self.cap = cap
+        self.raw = np.zeros((cap, _RAW), np.float64)
+        self.action = np.zeros(cap, np.int8)
+        self.reward = np.full(cap, np.nan, np.float32)  # NaN — следующего решения ещё не было
+        self.slot = np.zeros(cap, np.int32)
+        self.n = 0  # всего записано
+        self._lock = threading.Lock()  # add на loop ↔ export в потоке: копия, без ожидания I/O
+
+    def add(self, slot: int, raw: tuple, action: int) -> int:
+        with self._lock:
+            i = self.n % self.cap
+            self.raw[i] = raw
+            self.action[i] = action
+            self.reward[i] = np.nan
+            self.slot[i] = slot
+            self.n += 1
+            return self.n - 1
+
+    def set_reward(self, idx: int, reward: float) -> None:
+        with self._lock:
+            if self.n - idx <= self.cap:  # строку ещё не перезаписали
+                self.reward[idx % self.cap] = reward
+
+    def export(self) -> Dict[str, np.ndarray]:
+        """Строки от старых к новым; наблюдения уже в признаках OBS_FIELDS."""
+        with self._lock:
+            k = min(self.n, self.cap)
+            idx = (self.n - k + np.arange(k)) % self.cap
+            raw, act, rew, slot = self.raw[idx], self.action[idx], self.reward[idx], self.slot[idx]
+        return {"obs": features(raw), "action": act, "reward": rew, "slot": slot}
+
+
+class RLPolicy:
+    def __init__(self, path: str | os.PathLike | None = None, *, cap: int | None = None,
+                 update_sec: float | None = None, min_rollout: int | None = None,
+                 rollout_path: str | os.PathLike | None = None, infer_ms: float | None = None) -> None:
+        self.path = Path(config.RL_MODEL_PATH if path is None else path)
+        self.update_sec = config.RL_UPDATE_SEC if update_sec is None else update_sec
+        self.min_rollout = config.RL_MIN_ROLLOUT if min_rollout is None else min_rollout
+        self.rollout_path = config.RL_ROLLOUT_PATH if rollout_path is None else str(rollout_path)
+        self.timeout = (config.RL_INFER_MS if infer_ms is None else infer_ms) / 1000
+        self.buffer = RolloutBuffer(config.RL_BUFFER_CAP if cap is None else cap)
+        self._slots: Dict[str, int] = {}
+        self._pending: deque = deque()       # (наблюдение, Future): пишет loop, забирает поток
+        self._last: List[tuple | None] = []  # (строка буфера, PnL) последнего решения символа
+        self._weights: Weights | None = None
+        self._mtime = 0.0
+        self._exported = 0
+        self.batches = 0
+        self.timeouts = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self._weights is not None
+
+    # — event loop —
+    def bind(self, sym: str) -> int:
+        slot = self._slots.get(sym)
+        if slot is None:
+            slot = self._slots[sym] = len(self._last)
+            self._last.append(None)
+        return slot
+
+    def request(self, raw: tuple) -> Future | None:
+        """Наблюдение в очередь потока; None — решения не будет (нет весов или потока)."""
+        if self._weights is None or self._thread is None:
+            return None
+        fut: Future = Future()
+        self._pending.append((raw, fut))
+        self._wake.set()
+        return fut
+
+    async def decide(self, slot: int, action: str, raw: tuple, pnl: float,
+                     fut: Future | None = None) -> str:
+        """Сигнал стратегии → действие для _trade по решению сети для этого же raw.
+
+        raw — (edge.num, edge.den, bid, ask, лоты); fut — уже отправленный request(raw).
+        """
+        if action == "hold":
+            return action
+        if fut is None:
+            fut = self.request(raw)
+            if fut is None:
+                return action
+        try:
+            take = await asyncio.wait_for(asyncio.wrap_future(fut), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return action
+        if take is None:  # поток остановлен или проход упал
+            return action
+        last = self._last[slot]
+        if last is not None:
+            self.buffer.set_reward(last[0], pnl - last[1])
+        self._last[slot] = (self.buffer.add(slot, raw, int(take)), pnl)
+        return action if take else "hold"
+
+    # — поток инференса —
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self.reload()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="rl-infer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for _, fut in self._drain():
+            fut.set_result(None)
+
+    def reload(self) -> bool:
+        """Подмена весов, если файл изменился; новые запросы считаются уже по ним."""
+        try:
+            mtime = self.path.stat().st_mtime
+        except OSError:
+            return False
+        if mtime == self._mtime:
+            return False
+        try:
+            w = load_weights(self.path)
+        except Exception as exc:
+            logger.warning("RL weights %s rejected: %s", self.path, exc)
+            self._mtime = mtime  # не перечитывать тот же файл каждый период
+            return False
+        self._weights, self._mtime = w, mtime
+        logger.info("RL weights loaded from %s (hidden=%s)", self.path, w[0].shape[1])
+        return True
+
+    def _drain(self) -> List[Tuple[tuple, Future]]:
+        """Забирает очередь; запросы, отменённые по таймауту, пропускаются."""
+        q = self._pending
+        batch = []
+        for _ in range(len(q)):
+            raw, fut = q.popleft()
+            if fut.set_running_or_notify_cancel():
+                batch.append((raw, fut))
+        return batch
+
+    def infer(self) -> int:
+        """Один проход по всем ожидающим запросам; возвращает их число."""
+        w = self._weights
+        batch = self._drain()
+        if w is None or not batch:
+            for _, fut in batch:
+                fut.set_result(None)
+            return 0
+        t0 = time.perf_counter()
+        try:
+            logits = forward(w, features(np.array([raw for raw, _ in batch], np.float64)))
+        except Exception:
+            for _, fut in batch:
+                fut.set_result(None)
+            raise
+        for (_, fut), ok in zip(batch, (logits[:, 1] > logits[:, 0]).tolist()):
+            fut.set_result(ok)
+        _ST_INFER.observe((time.perf_counter() - t0)*1000)
+        self.batches += 1
+        return len(batch)
+
+    def export(self) -> bool:
+        if not self.rollout_path or self.buffer.n - self._exported < self.min_rollout:
+            return False
+        n = self.buffer.n
+        state_snapshot.save(self.rollout_path, self.buffer.export())
+        self._exported = n
+        return True
+
+    def _run(self) -> None:
+        next_update = time.monotonic() + self.update_sec
+        while not self._stop.is_set():
+            self._wake.wait(max(0.0, next_update - time.monotonic()))
+            if self._stop.is_set():
+                break
+            self._wake.clear()
+            try:
+                self.infer()
+                if time.monotonic() >= next_update:
+                    next_update = time.monotonic() + self.update_sec
+                    self.reload()
+                    self.export()
+            except Exception as exc:
+                logger.warning("RL policy err: %s", exc)
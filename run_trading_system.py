@@ -4,6 +4,7 @@ from types import FrameType
 import config
 from logger import setup_logger
 from monitoring import heartbeat, start_metrics_server
+from supervisor import Supervisor
 from trading_multi import TradingBotMulti
 
 try:
@@ -23,6 +24,12 @@ for s in (signal.SIGINT, signal.SIGTERM): signal.signal(s, _graceful)
 async def main():
     asyncio.create_task(start_metrics_server())
     asyncio.create_task(heartbeat())
+    if config.WORKERS > 1:
+        # символы по процессам; /metrics этого процесса собирает метрики всех шардов
+        try:    await Supervisor(config.TRADE_PAIRS, config.WORKERS).run()
+        except asyncio.CancelledError:
+            pass
+        return
     bot = TradingBotMulti()
     try:    await bot.run()
     except asyncio.CancelledError:
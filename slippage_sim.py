@@ -1,17 +1,32 @@
 from __future__ import annotations
 import logging
 from decimal import Decimal
-from typing import Literal
-from retry_utils import retry_async
+from typing import Literal, Optional, Tuple
+from fixed_point import instrument
 
 logger = logging.getLogger(__name__)
 
 class SlippageSimulator:
+    """Оценка исполнения рыночной заявки по реальным уровням L2-стакана."""
+
     DEPTH = 25
     def __init__(self, client: "APIClient"):  # noqa: F821
         self.client = client
-    async def worst_price(self, sym: str, side: Literal["Buy", "Sell"], qty: Decimal) -> Decimal:
-        bid, ask = await self.client.get_best(sym)
-        base = ask if side == "Buy" else bid
-        slip = Decimal("0.01") * qty
-        return (base + slip) if side == "Buy" else (base - slip)
+
+    def walk(self, sym: str, side: Literal["Buy", "Sell"], lots: int) -> Optional[Tuple[int, int]]:
+        """(notional, worst) в тиках/лотах; None, если в DEPTH уровнях не хватает объёма."""
+        book = self.client.ws.book(sym)
+        if book is None or book.stale:
+            return None
+        return book.walk(side, lots, self.DEPTH)
+
+    async def worst_price(self, sym: str, side: Literal["Buy", "Sell"], qty: Decimal) -> Optional[Decimal]:
+        inst = instrument(sym)
+        res = self.walk(sym, side, inst.to_lots(qty))
+        return None if res is None else inst.price(res[1])
+
+    async def vwap(self, sym: str, side: Literal["Buy", "Sell"], qty: Decimal) -> Optional[Decimal]:
+        inst = instrument(sym)
+        lots = inst.to_lots(qty)
+        res = self.walk(sym, side, lots)
+        return None if res is None else inst.tick * Decimal(res[0]) / lots
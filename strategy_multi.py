@@ -1,24 +1,99 @@
 from __future__ import annotations
 import logging
 from decimal import Decimal
-from typing import Tuple
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
 import config
+from fixed_point import Ratio
 
 logger = logging.getLogger(__name__)
 
 class ArbitrageStrategyMulti:
     """Simplified strategy without external ML dependencies."""
 
-    def __init__(self, client: "APIClient") -> None:  # noqa: F821
+    def __init__(self, client: "APIClient", fee: Decimal | None = None,  # noqa: F821
+                 threshold: Decimal | None = None) -> None:
         self.client = client
+        # fee/threshold переопределяются в бэктесте (перебор параметров)
+        if fee is None:
+            fee = config.SPOT_FEE_RATE + config.FUTURES_FEE_TAKER
+        self._fee = Ratio.of(fee)
+        # edge >= thr  ⇔  (bid - ask) * _m >= _k * ask  (всё в int64)
+        thr = Ratio.of(config.MIN_FUNDING_THRESHOLD if threshold is None else threshold)
+        self._m = self._fee.den * thr.den
+        self._k = self._fee.num * thr.den + thr.num * self._fee.den
+        self._fee_f = float(self._fee)
+        # котировки всей вселенной в смежных массивах (тики)
+        self._index: Dict[str, int] = {}
+        self._syms: List[str] = []
+        self._book = np.zeros((4, 0), dtype=np.int64)  # spot_bid, spot_ask, perp_bid, perp_ask
+        for sym in config.TRADE_PAIRS:
+            self.add_symbol(sym)
 
     async def analyze(self, sym: str) -> Tuple[str, Decimal]:
-        bid, ask = await self.client.get_best(sym)
-        edge = (bid - ask) / ask - config.SPOT_FEE_RATE - config.FUTURES_FEE_TAKER
-        if edge > Decimal("0"):
+        bid, ask = await self.client.ws.get_best(sym)
+        action, edge = self.evaluate(bid, ask)
+        return action, edge.to_decimal()
+
+    def evaluate(self, bid: int, ask: int) -> Tuple[str, Ratio]:
+        """Оценка по котировке в тиках: edge = (bid - ask)/ask - комиссии, точной дробью."""
+        if ask <= 0:
+            return "hold", Ratio(0, 1)
+        fn, fd = self._fee
+        num = (bid - ask) * fd - fn * ask
+        if num > 0:
             action = "buy_spot"
-        elif edge < Decimal("0"):
+        elif num < 0:
             action = "sell_spot"
         else:
             action = "hold"
-        return action, edge
+        return action, Ratio(num, ask * fd)
+
+    # — пакетный режим —
+    def add_symbol(self, sym: str) -> None:
+        if sym in self._index:
+            return
+        n = len(self._syms)
+        if n == self._book.shape[1]:
+            grown = np.zeros((4, max(8, 2 * n)), dtype=np.int64)
+            grown[:, :n] = self._book[:, :n]
+            self._book = grown
+        self._index[sym] = n
+        self._syms.append(sym)
+
+    def update(self, sym: str, bid: int, ask: int,
+               perp_bid: int | None = None, perp_ask: int | None = None) -> None:
+        """O(1) запись котировки; без отдельного perp-фида ноги берутся из одного стакана."""
+        i = self._index[sym]
+        b = self._book
+        b[0, i] = bid; b[1, i] = ask
+        b[2, i] = bid if perp_bid is None else perp_bid
+        b[3, i] = ask if perp_ask is None else perp_ask
+
+    def analyze_batch(self, syms: Iterable[str] | None = None) -> List[Tuple[str, str, float]]:
+        """Один векторный проход по вселенной или только по символам syms.
+
+        Возвращает (sym, action, edge) только для символов, где edge за вычетом
+        SPOT_FEE_RATE и FUTURES_FEE_TAKER достигает MIN_FUNDING_THRESHOLD.
+        buy_spot: купить спот по ask, продать perp по bid; sell_spot — наоборот.
+        """
+        if syms is None:
+            rows = np.arange(len(self._syms))
+            sb, sa, pb, pa = self._book[:, :len(rows)]
+        else:  # изменившиеся за проход: старая пересечённая котировка не торгуется повторно
+            index = self._index
+            rows = np.fromiter((index[s] for s in syms if s in index), np.int64)
+            sb, sa, pb, pa = self._book[:, rows]
+        live = (sa > 0) & (pa > 0)
+        buy_ok = live & ((pb - sa) * self._m >= self._k * sa)
+        sell_ok = live & ((sb - pa) * self._m >= self._k * pa)
+        idx = np.flatnonzero(buy_ok | sell_ok)
+        if not idx.size:
+            return []
+        buy_edge = (pb[idx] - sa[idx]) / sa[idx] - self._fee_f
+        sell_edge = (sb[idx] - pa[idx]) / pa[idx] - self._fee_f
+        use_buy = buy_ok[idx] & (~sell_ok[idx] | (buy_edge >= sell_edge))
+        edge = np.where(use_buy, buy_edge, sell_edge)
+        syms = self._syms
+        return [(syms[i], "buy_spot" if b else "sell_spot", float(e))
+                for i, b, e in zip(rows[idx].tolist(), use_buy.tolist(), edge.tolist())]
@@ -0,0 +1,159 @@
+from __future__ import annotations
+import asyncio, logging, multiprocessing as mp, os, re, signal, time
+from pathlib import Path
+from typing import Callable, List, Optional
+import config
+from alert_utils import alerts
+from monitoring import GROSS_EXPOSURE, WORKER_RESTARTS
+from risk_state import RiskState
+
+logger = logging.getLogger(__name__)
+
+
+def shard(symbols: List[str], n: int) -> List[List[str]]:
+    """Символы по кругу в n шардов (пустые отбрасываются)."""
+    return [s for s in (symbols[i::n] for i in range(max(1, n))) if s]
+
+
+def worker_main(shard_id: int, symbols: List[str], universe: List[str], shm_name: str, lock) -> None:
+    """Точка входа воркера: TradingBotMulti на своём шарде символов."""
+    config.TRADE_PAIRS = symbols
+    config.CATEGORY_MAP = {s: config.CATEGORY_MAP.get(s, "linear") for s in symbols}
+    if config.ORDER_JOURNAL:  # журнал под flock — у каждого шарда свой
+        config.ORDER_JOURNAL = str(Path(config.ORDER_JOURNAL).with_suffix(f".{shard_id}.jnl"))
+    if config.STATE_SNAPSHOT:
+        config.STATE_SNAPSHOT = str(Path(config.STATE_SNAPSHOT).with_suffix(f".{shard_id}.npz"))
+    if config.MD_RECORD_DIR:
+        config.MD_RECORD_DIR = str(Path(config.MD_RECORD_DIR) / f"shard{shard_id}")
+    from logger import setup_logger
+    from trading_multi import TradingBotMulti
+    setup_logger()
+    risk = RiskState.attach(shm_name, universe, lock)
+
+    async def _main():
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        bot = TradingBotMulti(risk=risk)
+        try:
+            await bot.run()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            await bot.close()
+
+    try:
+        asyncio.run(_main())
+    finally:
+        risk.close()
+
+
+def _prom_dir() -> Path | None:
+    d = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    return Path(d) if d else None
+
+
+def _mark_dead(pid: int) -> None:
+    if _prom_dir() is not None:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid)
+
+
+class Supervisor:
+    """Шардирует символы по процессам и перезапускает упавшие воркеры.
+
+    Позиции и экспозиция живут в общем RiskState (SharedMemory) и
+    переживают рестарт воркера; метрики воркеров собирает /metrics
+    основного процесса через prometheus_client.multiprocess.
+    """
+
+    MONITOR_SEC = 1.0
+    BACKOFF_SEC = (1, 2, 5, 10, 30)
+    STABLE_SEC  = 60  # столько проработал — счётчик подряд идущих падений сбрасывается
+    STOP_SEC    = 10
+
+    def __init__(self, symbols: List[str], workers: int, target: Callable = worker_main) -> None:
+        self.universe = list(symbols)
+        self.shards = shard(self.universe, workers)
+        self._ctx = mp.get_context("spawn")
+        self._lock = self._ctx.Lock()
+        self.risk = RiskState.create(self.universe, self._lock)
+        self._target = target
+        n = len(self.shards)
+        self._procs: List[Optional[mp.process.BaseProcess]] = [None] * n
+        self._started = [0.0] * n
+        self._due = [0.0] * n
+        self._fails = [0] * n
+        self.restarts = [0] * n
+
+    def _clean_prom_dir(self) -> None:
+        d = _prom_dir()
+        if d is None:
+            return
+        d.mkdir(parents=True, exist_ok=True)
+        me = str(os.getpid())
+        for f in d.glob("*.db"):  # файлы прошлых запусков, кроме своих
+            m = re.search(r"_(\d+)\.db$", f.name)
+            if m and m.group(1) != me:
+                f.unlink(missing_ok=True)
+
+    def _spawn(self, i: int) -> None:
+        p = self._ctx.Process(target=self._target, name=f"shard-{i}",
+                              args=(i, self.shards[i], self.universe, self.risk.name, self._lock))
+        p.start()
+        self._procs[i] = p
+        self._started[i] = time.monotonic()
+        logger.info("Shard %s started (pid %s): %s symbols", i, p.pid, len(self.shards[i]))
+
+    def start(self) -> None:
+        self._clean_prom_dir()
+        for i in range(len(self.shards)):
+            self._spawn(i)
+
+    def check(self) -> None:
+        """Один проход наблюдения: упавший воркер перезапускается с нарастающей паузой."""
+        now = time.monotonic()
+        for i, p in enumerate(self._procs):
+            if p is not None:
+                if p.is_alive():
+                    if now - self._started[i] > self.STABLE_SEC:
+                        self._fails[i] = 0
+                    continue
+                p.join()
+                _mark_dead(p.pid)
+                delay = self.BACKOFF_SEC[min(self._fails[i], len(self.BACKOFF_SEC) - 1)]
+                self._fails[i] += 1
+                self._due[i] = now + delay
+                self._procs[i] = None
+                alerts().alert("❗ Воркер упал",
+                               f"Шард {i} (pid {p.pid}) завершился с кодом {p.exitcode}, рестарт через {delay} с.")
+            if now >= self._due[i]:
+                self.restarts[i] += 1
+                WORKER_RESTARTS.labels(shard=str(i)).inc()
+                self._spawn(i)
+        GROSS_EXPOSURE.set(self.risk.gross())
+
+    async def run(self) -> None:
+        self.start()
+        try:
+            while True:
+                await asyncio.sleep(self.MONITOR_SEC)
+                self.check()
+        finally:
+            await self.stop()
+
+    async def stop(self) -> None:
+        procs = [p for p in self._procs if p is not None]
+        self._procs = [None] * len(self.shards)
+        for p in procs:
+            if p.is_alive():
+                p.terminate()  # SIGTERM — воркер закрывает бота штатно
+        deadline = time.monotonic() + self.STOP_SEC
+        while any(p.is_alive() for p in procs) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        for p in procs:
+            if p.is_alive():
+                logger.warning("Shard %s did not stop, killing", p.name)
+                p.kill()
+            p.join()
+            _mark_dead(p.pid)
+        self.risk.close(unlink=True)
+        await alerts().close()
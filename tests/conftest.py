@@ -0,0 +1,14 @@
+import os
+
+import pytest
+
+# подпроцессы тестов (воркеры супервизора, проверки импорта) не пишут в logs/orders.jnl репозитория
+os.environ["ORDER_JOURNAL"] = ""
+
+@pytest.fixture(autouse=True)
+def _order_journal(tmp_path, monkeypatch):
+    """Журнал заявок — во временном каталоге теста, а не в общем logs/."""
+    import sys
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import config
+    monkeypatch.setattr(config, "ORDER_JOURNAL", str(tmp_path / "orders.jnl"))
@@ -0,0 +1,49 @@
+import asyncio
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from alert_utils import AlertCenter, ErrorWindow
+
+def test_error_window_expires_old_buckets():
+    win = ErrorWindow(60)
+    for t in (1000.0, 1000.5, 1030.0):
+        win.add(t)
+    assert win.count(1030.0) == 3
+    assert win.count(1060.2) == 1  # корзины 1000-й секунды вышли из окна
+    assert win.count(1200.0) == 0
+
+def test_alerts_are_queued_coalesced_and_deduplicated():
+    async def _run():
+        center = AlertCenter()
+        sent = []
+
+        async def deliver(title, body):
+            await asyncio.sleep(0.01)
+            sent.append((title, body))
+
+        center._deliver = deliver
+        center.alert("A", "one")
+        center.alert("A", "two")  # ещё в очереди — склеивается
+        center.alert("B", "x")
+        await asyncio.sleep(0.05)
+        assert sorted(sent) == [("A", "two (×2)"), ("B", "x")]
+        center.alert("A", "three")  # в окне DEDUP_SEC после отправки
+        await asyncio.sleep(0.02)
+        assert len(sent) == 2 and center._suppressed["A"] == 1
+        await center.close()
+
+    asyncio.run(_run())
+
+def test_alert_never_blocks_when_queue_is_full():
+    async def _run():
+        center = AlertCenter()
+        center.QUEUE_MAX = 2
+        center.WORKERS = 0
+        center._workers = [asyncio.create_task(asyncio.sleep(1))]  # доставка «зависла»
+        for i in range(5):
+            center.alert(f"T{i}", "x")
+        assert center.dropped == 3
+        await center.close()
+
+    asyncio.run(_run())
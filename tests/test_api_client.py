@@ -4,7 +4,7 @@ import sys
 from decimal import Decimal
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from api_client import APIClient
+from api_client import APIClient, OrderCoalescer
 
 def test_place_order_updates_position_and_history():
     async def _run():
@@ -16,3 +16,99 @@ def test_place_order_updates_position_and_history():
         await client.close()
 
     asyncio.run(_run())
+
+def test_failed_order_call_records_nothing_and_keeps_loop_running():
+    from trading_multi import TradingBotMulti
+
+    async def _run():
+        bot = TradingBotMulti(symbols=["BTCUSDT"])
+        client = bot.client
+        bot.rl = None
+
+        async def _down(m, path, params=None, private=False, weight=None):
+            if path.startswith("/v5/order/"):
+                raise RuntimeError("HTTP 503")
+            return {}
+        client._call = _down
+        try:
+            await client.place_order("BTCUSDT", "Buy", Decimal("1"))
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("place_order must propagate the transport error")
+        task = asyncio.create_task(bot._loop("BTCUSDT"))
+        await asyncio.sleep(0)
+        client.ws.on_snapshot("BTCUSDT", [(10200, 50000)], [(10000, 50000)], 1)
+        for _ in range(10):
+            await asyncio.sleep(0)
+        assert not task.done()  # ошибка заявки не роняет цикл символа
+        assert client.ledger.position("BTCUSDT") == 0 and bot.risk.position("BTCUSDT") == 0
+        assert len(client.orders) == 0
+        co = OrderCoalescer(client, 0.001)  # create-batch тоже не исполняет до ответа биржи
+        res = await asyncio.gather(co.submit("BTCUSDT", "Buy", Decimal("1")),
+                                   co.submit("ETHUSDT", "Sell", Decimal("1")))
+        assert [r["status"] for r in res] == ["error"] * 2 and "503" in res[0]["msg"]
+        assert len(client.orders) == 0
+        task.cancel()
+        await client.close()
+
+    asyncio.run(_run())
+
+def test_rejected_order_is_not_filled():
+    async def _run():
+        client = APIClient()
+
+        async def _reject(m, path, params=None, private=False, weight=None):
+            return {"retCode": 110007, "retMsg": "insufficient balance"}
+        client._call = _reject
+        res = await client.place_order("BTCUSDT", "Buy", Decimal("1"))
+        assert res["status"] == "error" and res["code"] == 110007
+        assert client.ledger.position("BTCUSDT") == 0 and len(client.orders) == 0
+
+    asyncio.run(_run())
+
+class _StandInExchange:
+    """Локальная замена v5 API: пишет запросы и отклоняет заявки по BADUSDT."""
+
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, m, path, params=None, private=False, weight=None):
+        self.calls.append((path, params))
+        if path == "/v5/order/create-batch":
+            ext = [{"code": 10001 if r["symbol"] == "BADUSDT" else 0, "msg": ""} for r in params["request"]]
+            return {"retCode": 0, "retExtInfo": {"list": ext}}
+        return {"retCode": 0}
+
+def test_place_orders_batch_chunks_and_reports_per_order():
+    async def _run():
+        client = APIClient()
+        client._call = ex = _StandInExchange()
+        orders = [("BTCUSDT", "Buy", Decimal("0.1"))] * 11 + [("BADUSDT", "Sell", Decimal("1"))]
+        res = await client.place_orders_batch(orders)
+        assert [len(p["request"]) for _, p in ex.calls] == [10, 2]
+        assert [r["status"] for r in res] == ["ok"] * 11 + ["error"]
+        assert client.position["BTCUSDT"] == Decimal("1.1")
+        assert "BADUSDT" not in client.position
+
+    asyncio.run(_run())
+
+def test_coalescer_merges_orders_from_one_window():
+    from api_client import OrderCoalescer
+
+    async def _run():
+        client = APIClient()
+        client._call = ex = _StandInExchange()
+        client.coalescer = OrderCoalescer(client, window=0.002)
+        res = await asyncio.gather(
+            client.submit_order("BTCUSDT", "Buy", Decimal("1")),
+            client.submit_order("ETHUSDT", "Sell", Decimal("2")),
+            client.submit_order("BADUSDT", "Buy", Decimal("1")),
+        )
+        assert [path for path, _ in ex.calls] == ["/v5/order/create-batch"]
+        assert [r["status"] for r in res] == ["ok", "ok", "error"]
+        await client.submit_order("BTCUSDT", "Buy", Decimal("1"))
+        assert ex.calls[-1][0] == "/v5/order/create"
+        await client.close()
+
+    asyncio.run(_run())
@@ -0,0 +1,45 @@
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from decimal import Decimal
+from backtest import Backtester, shard_symbols, sweep
+from md_recorder import KIND_DELTA, KIND_SNAPSHOT, MDRecorder, MDTape
+
+def _record(path):
+    rec = MDRecorder(path)
+    for sym in ("BTCUSDT", "ETHUSDT"):
+        seq = 1
+        for i in range(5):
+            # пересечённый снапшот (сделка), затем дельта, снимающая пересечение
+            bids, asks = [(10100, 1000), (10090, 1000)], [(10000, 1000), (10010, 1000)]
+            rec.record(sym, KIND_SNAPSHOT, seq, bids, asks, (10100, 10000))
+            rec.record(sym, KIND_DELTA, seq + 1, [(10100, 0), (10090, 0), (9990, 1000)], [],
+                       (9990, 10000))
+            seq += 2
+    rec.close()
+
+def test_replay_trades_crossed_books_and_marks_positions(tmp_path):
+    _record(tmp_path / "t")
+    tape = MDTape(tmp_path / "t")
+    res = Backtester(tape, ["BTCUSDT"]).run()
+    assert res["events"] == 10
+    btc = res["by_symbol"]["BTCUSDT"]
+    assert btc["trades"] == 5
+    pos = btc["position"]
+    assert pos > 0
+    assert abs(btc["volume"] - pos * 100) < 1e-9
+    # покупки по 100.00, закрытие по bid 99.90, минус комиссии 0.155 %
+    assert abs(btc["pnl"] - (-pos * 0.1 - btc["volume"] * 0.00155)) < 1e-9
+
+    res = Backtester(tape, ["BTCUSDT"], threshold=Decimal("0.05")).run()
+    assert res["trades"] == 0
+
+def test_sweep_spreads_combos_and_shards_over_processes(tmp_path):
+    _record(tmp_path / "t")
+    assert shard_symbols({"A": 10, "B": 6, "C": 5}, 2) == [["A"], ["B", "C"]]
+    results = sweep(tmp_path / "t", {"threshold": [Decimal("0.0001"), Decimal("0.05")]}, workers=2)
+    assert results[0]["pnl"] >= results[1]["pnl"]
+    by_thr = {r["params"]["threshold"]: r for r in results}
+    assert by_thr["0.0001"]["trades"] == 10 and by_thr["0.05"]["trades"] == 0
+    assert set(by_thr["0.0001"]["by_symbol"]) == {"BTCUSDT", "ETHUSDT"}
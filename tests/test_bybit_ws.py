@@ -0,0 +1,118 @@
+import asyncio
+import json
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from aiohttp import WSMsgType, web
+from aiohttp.test_utils import TestServer
+
+from bybit_ws import BybitWS
+from ws_manager import WSManager
+
+SYMS = ["BTCUSDT", "ETHUSDT"]
+
+def _dump(obj):
+    return json.dumps(obj, separators=(",", ":"))  # как у биржи
+
+def _book(sym, kind, u, bids, asks):
+    return _dump({"topic": f"orderbook.50.{sym}", "type": kind, "ts": 1,
+                       "data": {"s": sym, "b": bids, "a": asks, "u": u, "seq": u * 10}, "cts": 1})
+
+def _frames(sym):
+    """Записанная сессия: снапшот, дельты, тикер и кадр чужого топика."""
+    return [
+        _book(sym, "snapshot", 1, [["100.00", "1.5"], ["99.90", "2"]], [["100.10", "1"], ["100.20", "3"]]),
+        _book(sym, "delta", 2, [["100.00", "0"]], []),
+        _book(sym, "delta", 3, [["100.05", "0.5"]], [["100.10", "0"]]),
+        _dump({"topic": f"tickers.{sym}", "type": "snapshot",
+                    "data": {"symbol": sym, "fundingRate": "0.0001", "markPrice": "100.1", "bid1Price": "1"}}),
+        _dump({"topic": f"publicTrade.{sym}", "type": "snapshot", "data": []}),
+    ]
+
+async def _replay_server(close_first=False):
+    """Локальная замена публичного WS: на subscribe проигрывает кадры подписанных символов."""
+    subs, conns = [], []
+
+    async def handler(req):
+        ws = web.WebSocketResponse()
+        await ws.prepare(req)
+        conns.append(req.path)
+        first = len(conns) == 1
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                break
+            m = json.loads(msg.data)
+            if m["op"] == "ping":
+                await ws.send_str(json.dumps({"success": True, "ret_msg": "pong", "op": "ping"}))
+                continue
+            subs.append(m["args"])
+            await ws.send_str(json.dumps({"success": True, "ret_msg": "", "op": m["op"]}))
+            for topic in m["args"]:
+                if topic.startswith("orderbook.") and m["op"] == "subscribe":
+                    for f in _frames(topic.rsplit(".", 1)[1]):
+                        await ws.send_str(f)
+            if close_first and first:
+                await ws.close()
+        return ws
+
+    app = web.Application()
+    app.add_routes([web.get("/v5/public/linear", handler)])
+    server = TestServer(app)
+    await server.start_server()
+    return server, subs, conns
+
+async def _until(cond, timeout=5.0):
+    loop = asyncio.get_running_loop()
+    end = loop.time() + timeout
+    while not cond():
+        assert loop.time() < end, "timeout"
+        await asyncio.sleep(0.01)
+
+def test_replayed_frames_build_books_over_multiple_connections():
+    async def _run():
+        server, subs, conns = await _replay_server()
+        ws = WSManager(None)
+        feed = BybitWS(ws, SYMS, base_url=str(server.make_url("/v5/public")), depth=50, per_conn=1)
+        await feed.start()
+        await _until(lambda: all(ws._prices.get(s) == (10005, 10020) for s in SYMS))
+        assert len(conns) == 2 and sorted(subs) == [[f"orderbook.50.{s}", f"tickers.{s}"] for s in SYMS]
+        assert ws.tickers["BTCUSDT"] == {"fundingRate": "0.0001", "markPrice": "100.1"}
+        book = ws.book("ETHUSDT")
+        assert book.bids.prices().tolist() == [10005, 9990] and book.asks.sizes().tolist() == [30000]
+        await feed.close()
+        await server.close()
+
+    asyncio.run(_run())
+
+def test_reconnect_resubscribes_and_resyncs_from_snapshot():
+    async def _run():
+        server, subs, conns = await _replay_server(close_first=True)
+        ws = WSManager(None)
+        feed = BybitWS(ws, SYMS[:1], base_url=str(server.make_url("/v5/public")), depth=50)
+        feed.BACKOFF_SEC = (0,)
+        await feed.start()
+        await _until(lambda: len(conns) == 2 and ws._prices.get("BTCUSDT") == (10005, 10020))
+        assert feed.reconnects >= 1 and subs[0] == subs[1]
+        await feed.close()
+        await server.close()
+
+    asyncio.run(_run())
+
+def test_slow_apply_conflates_per_symbol_and_gap_resubscribes():
+    ws = WSManager(None)
+    feed = BybitWS(ws, SYMS, base_url="ws://unused", depth=50)
+    frames = _frames("BTCUSDT")
+    for f in frames:
+        feed.on_frame(f)
+    for u in range(4, 104):  # применитель отстал на сотню дельт
+        feed.on_frame(_book("BTCUSDT", "delta", u, [[f"{99 + u / 100:.2f}", "1"]], []))
+    assert len(feed._pending) == 1 and feed.dropped["BTCUSDT"] == 102
+    assert feed.flush() == 2
+    book = ws.book("BTCUSDT")
+    assert book.best() == (10005, 10020) and book.bids.n == ws.depth  # слитые уровни обрезаны по глубине
+    resynced = []
+    feed.resync = resynced.append
+    feed.on_frame(_book("BTCUSDT", "delta", 105, [], []))  # пропущен u=104
+    feed.on_frame(_book("BTCUSDT", "delta", 106, [], []))
+    assert resynced == ["BTCUSDT"] and feed.gaps == 1 and not feed._pending
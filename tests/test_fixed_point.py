@@ -0,0 +1,33 @@
+import os
+import random
+import sys
+from decimal import Decimal
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import config
+from fixed_point import Instrument, Ratio
+from strategy_multi import ArbitrageStrategyMulti
+
+def test_integer_path_matches_decimal_math():
+    rng = random.Random(7)
+    inst = Instrument("BTCUSDT", Decimal("0.01"), Decimal("0.0001"))
+    strat = ArbitrageStrategyMulti(None)
+    thr = Ratio.of(config.MIN_FUNDING_THRESHOLD)
+    trade_val = Decimal("1") * config.MAX_POSITION_PERCENT * config.LEVERAGE
+    notional = Ratio.of(trade_val)
+    for _ in range(5000):
+        ask_t = rng.randint(1, 10_000_000)
+        bid_t = ask_t + rng.randint(-500, 500)
+        bid, ask = inst.price(bid_t), inst.price(ask_t)
+        edge = (bid - ask) / ask - config.SPOT_FEE_RATE - config.FUTURES_FEE_TAKER
+        action, r = strat.evaluate(bid_t, ask_t)
+        assert action == ("buy_spot" if edge > 0 else "sell_spot" if edge < 0 else "hold")
+        assert r.ge(thr) == (edge >= config.MIN_FUNDING_THRESHOLD)
+        assert inst.qty(inst.lots_for(notional, ask_t)) == (trade_val / ask).quantize(Decimal("0.0001"))
+
+def test_feed_and_boundary_conversions_round_trip():
+    inst = Instrument("ETHUSDT", Decimal("0.05"), Decimal("0.001"))
+    assert inst.ticks_of("3000.15") == inst.to_ticks(Decimal("3000.15")) == 60003
+    assert inst.lots_of(0.123) == 123
+    assert inst.price(60003) == Decimal("3000.15")
+    assert inst.qty(123) == Decimal("0.123")
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import random
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from funding_scanner import FundingScanner
+
+def _brute(rates, k, floor):
+    return sorted((abs(r) for r in rates.values() if abs(r) >= floor), reverse=True)[:k]
+
+def _scores(sc, k, rates):
+    return [abs(rates[s]) for s, _ in sc.top(k)]  # при равных ставках порядок символов не важен
+
+def test_incremental_top_k_matches_full_sort_and_heap_stays_bounded():
+    rnd = random.Random(7)
+    sc = FundingScanner(min_rate=0.0001, interval_h=8)
+    rates = {}
+    for step in range(20000):
+        sym = f"S{rnd.randrange(300)}USDT"
+        rates[sym] = round(rnd.uniform(-0.003, 0.003), 6)
+        sc.update(sym, rates[sym])
+        if step % 997 == 0:
+            assert _scores(sc, 10, rates) == _brute(rates, 10, 0.0001)
+    assert len(sc._heap) <= 2 * len(sc) + 64
+    top = sc.top(3)
+    assert [abs(rates[s]) for s, _ in top] == _brute(rates, 3, 0.0001)
+    assert abs(top[0][1] - abs(rates[top[0][0]]) / 8) < 1e-12
+    sc.update(top[0][0], 0.0)  # ниже порога — выпадает из рейтинга
+    assert top[0][0] not in [s for s, _ in sc.top(3)]
+
+def test_ticker_rows_feed_cache_and_basis():
+    sc = FundingScanner(min_rate=0.0001, interval_h=8)
+    n = sc.load([
+        {"symbol": "BTCUSDT", "fundingRate": "0.0001", "nextFundingTime": "1700000000000",
+         "markPrice": "101", "indexPrice": "100", "lastPrice": "101"},
+        {"symbol": "ETHUSDT", "fundingRate": "-0.0004", "fundingIntervalHour": "4"},
+        {"symbol": "BTC-27DEC24", "fundingRate": ""},
+    ])
+    assert n == 3 and set(sc.rates) == {"BTCUSDT", "ETHUSDT"}
+    assert sc.next_ts["BTCUSDT"] == 1700000000000 and abs(sc.basis["BTCUSDT"] - 0.01) < 1e-12
+    assert sc.top(5) == [("ETHUSDT", 0.0001), ("BTCUSDT", 0.0001 / 8)]
+
+def test_bot_rotates_symbol_loops_by_ranking(monkeypatch):
+    import config
+    from fixed_point import Ratio, instrument
+    from trading_multi import TradingBotMulti
+    monkeypatch.setattr(config, "BATCH_ANALYZE", False)
+
+    async def _run():
+        bot = TradingBotMulti(symbols=["BTCUSDT"])
+        bot._running = True
+        bot.scanner.load([{"symbol": s, "fundingRate": r} for s, r in
+                          (("BTCUSDT", "0.0002"), ("AAAUSDT", "0.002"), ("BBBUSDT", "-0.001"),
+                           ("NOSPECUSDT", "0.003"))])
+        bot.scanner.load_specs([{"symbol": s, "priceFilter": {"tickSize": t}, "lotSizeFilter": {"qtyStep": q}}
+                                for s, t, q in (("AAAUSDT", "0.0001", "10"), ("BBBUSDT", "0.001", "1"))])
+        assert not bot.add_symbol("NOSPECUSDT")  # без tickSize/qtyStep символ не торгуется
+        bot.ledger.fill("BTCUSDT", 10, 10000)
+        added, retired = bot.rotate(3)
+        assert added == ["AAAUSDT", "BBBUSDT"] and retired == []  # BTCUSDT ждёт закрытия позиции
+        assert str(instrument("AAAUSDT").tick) == "0.0001" and str(instrument("BBBUSDT").lot) == "1"
+        # снимаемый символ торгует только на сокращение позиции
+        sent = []
+
+        async def _submit(sym, side, qty):
+            sent.append((sym, side, qty))
+            return {"status": "error"}
+        bot.client.submit_order = _submit
+        bot.client.ws.on_snapshot("BTCUSDT", [(10000, 10**9)], [(10001, 10**9)], 1)
+        await bot._trade("BTCUSDT", "buy_spot", Ratio(1, 1), 10000, 10001)
+        await bot._trade("BTCUSDT", "sell_spot", Ratio(1, 1), 10000, 10001)
+        assert sent == [("BTCUSDT", "Sell", instrument("BTCUSDT").qty(10))]
+        assert set(bot._loops) == {"AAAUSDT", "BBBUSDT"} and bot.risk.position("AAAUSDT") == 0
+        assert "BBBUSDT" in bot.client.ws._prices and "BBBUSDT" in bot.ledger
+        bot.ledger.fill("BTCUSDT", -10, 10000)
+        task = bot._loops["AAAUSDT"]
+        bot.scanner.update("AAAUSDT", 0.0)
+        bot.scanner.update("BTCUSDT", 0.00005)
+        bot.scanner.update("NOSPECUSDT", 0.0)
+        assert bot.rotate(2) == ([], ["BTCUSDT", "AAAUSDT"])
+        await asyncio.sleep(0)
+        assert task.cancelled() and bot.active == {"BBBUSDT"}
+        for t in bot._loops.values():
+            t.cancel()
+        await bot.client.close()
+
+    asyncio.run(_run())
+
+def test_instrument_specs_are_paged_by_cursor():
+    class _Client:
+        def __init__(self):
+            self.cursors = []
+
+        async def _call(self, m, path, params=None):
+            assert path == "/v5/market/instruments-info"
+            self.cursors.append(params.get("cursor"))
+            if "cursor" not in params:
+                return {"result": {"list": [{"symbol": "AUSDT", "priceFilter": {"tickSize": "0.01"},
+                                             "lotSizeFilter": {"qtyStep": "0.1"}}], "nextPageCursor": "p2"}}
+            return {"result": {"list": [{"symbol": "BUSDT", "priceFilter": {"tickSize": "0.5"},
+                                         "lotSizeFilter": {"qtyStep": "1"}}, {"symbol": "CUSDT"}]}}
+
+    sc = FundingScanner()
+    client = _Client()
+    assert asyncio.run(sc.refresh_specs(client)) == 2 and client.cursors == [None, "p2"]
+    assert {s: tuple(map(str, v)) for s, v in sc.specs.items()} == {"AUSDT": ("0.01", "0.1"), "BUSDT": ("0.5", "1")}
@@ -0,0 +1,112 @@
+import asyncio
+import hashlib
+import hmac
+import os
+import sys
+import time
+from decimal import Decimal
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from api_client import APIClient
+from http_transport import BybitAPIError, HttpTransport
+
+KEY, SECRET = "k", "s"
+SKEW_MS = 1500
+
+async def _mock_v5():
+    peers, orders = set(), []
+
+    async def server_time(req):
+        peers.add(req.transport.get_extra_info("peername"))
+        ns = (int(time.time() * 1000) + SKEW_MS) * 1_000_000
+        return web.json_response({"retCode": 0, "result": {"timeNano": str(ns)}})
+
+    async def _signed(req):
+        peers.add(req.transport.get_extra_info("peername"))
+        body = await req.text()
+        h = req.headers
+        expect = hmac.new(SECRET.encode(), f"{h['X-BAPI-TIMESTAMP']}{KEY}{h['X-BAPI-RECV-WINDOW']}{body}".encode(),
+                          hashlib.sha256).hexdigest()
+        if h.get("X-BAPI-SIGN") != expect:
+            return None
+        orders.append((int(h["X-BAPI-TIMESTAMP"]), await req.json()))
+        return orders[-1][1]
+
+    async def create(req):
+        if await _signed(req) is None:
+            return web.json_response({"retCode": 10004, "retMsg": "error sign"})
+        return web.json_response({"retCode": 0, "result": {"orderId": "1"}})
+
+    async def create_batch(req):
+        body = await _signed(req)
+        if body is None:
+            return web.json_response({"retCode": 10004, "retMsg": "error sign"})
+        syms = [r["symbol"] for r in body["request"]]
+        if "HALTUSDT" in syms:  # отказ всей пачки — retCode верхнего уровня
+            return web.json_response({"retCode": 10006, "retMsg": "too many visits"})
+        ext = [{"code": 170131 if s == "REJUSDT" else 0, "msg": "Insufficient balance" if s == "REJUSDT" else "OK"}
+               for s in syms]
+        return web.json_response({"retCode": 0, "result": {"list": [{"symbol": s} for s in syms]},
+                                  "retExtInfo": {"list": ext}})
+
+    app = web.Application()
+    app.add_routes([web.get("/v5/market/time", server_time), web.post("/v5/order/create", create),
+                    web.post("/v5/order/create-batch", create_batch)])
+    server = TestServer(app)
+    await server.start_server()
+    return server, peers, orders
+
+def test_signed_requests_reuse_one_connection_and_cache_time_offset():
+    async def _run():
+        server, peers, orders = await _mock_v5()
+        client = APIClient()
+        client.transport = HttpTransport(str(server.make_url("")), KEY, SECRET)
+        await client.start()
+        assert abs(client.transport.time_offset_ms - SKEW_MS) < 200
+        for _ in range(3):
+            await client.place_order("BTCUSDT", "Buy", Decimal("0.1"))
+        assert len(orders) == 3 and orders[0][1]["qty"] == "0.1"
+        assert abs(orders[0][0] - (time.time() * 1000 + SKEW_MS)) < 1000
+        assert len(peers) == 1  # keep-alive: одно TCP-соединение на все запросы
+        client.transport.api_key = "other"
+        with pytest.raises(BybitAPIError):
+            await client.place_order("BTCUSDT", "Buy", Decimal("0.1"))
+        await client.close()
+        await server.close()
+
+    asyncio.run(_run())
+
+def test_create_batch_against_stand_in_server_isolates_failed_chunk():
+    async def _run():
+        server, _, orders = await _mock_v5()
+        client = APIClient()
+        client.transport = HttpTransport(str(server.make_url("")), KEY, SECRET)
+        await client.start()
+        weights = []
+        bucket = client.limiter.buckets["order"]
+        acquire = bucket.acquire
+
+        async def _acquire(weight=1, priority=0):
+            weights.append(weight)
+            await acquire(weight, priority)
+        bucket.acquire = _acquire
+        bucket._tokens = bucket.burst = 100  # лимит не тормозит тест
+        batch = [("BTCUSDT", "Buy", Decimal("0.1"))] * 9 + [("REJUSDT", "Buy", Decimal("1")),
+                                                            ("BTCUSDT", "Buy", Decimal("0.1")),
+                                                            ("HALTUSDT", "Sell", Decimal("1"))]
+        res = await client.place_orders_batch(batch)
+        assert weights == [10, 2] and [len(b["request"]) for _, b in orders] == [10, 2]
+        assert orders[0][1]["category"] == "linear" and "category" not in orders[0][1]["request"][0]
+        assert [r["status"] for r in res] == ["ok"] * 9 + ["error"] * 3
+        assert res[9]["code"] == 170131 and res[10]["code"] == res[11]["code"] == 10006
+        # первая пачка исполнена и учтена, вторая — нет
+        assert client.ledger.qty("BTCUSDT") == Decimal("0.9")
+        assert len(list(client.get_orders())) == 9
+        await client.close()
+        await server.close()
+
+    asyncio.run(_run())
@@ -0,0 +1,56 @@
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from decimal import Decimal
+from ledger import Ledger
+
+def test_average_cost_partial_close_and_flip():
+    led = Ledger(["BTCUSDT"], include_fees=False, metrics=False)
+    led.fill("BTCUSDT", 100, 10000)   # 0.01 @ 100.00
+    led.fill("BTCUSDT", 200, 10300)   # 0.02 @ 103.00 → средняя 102.00
+    assert led.avg_price("BTCUSDT") == Decimal("102")
+    assert led.fill("BTCUSDT", -150, 10400) == 150 * 200  # закрыли половину по 104.00
+    assert led.position("BTCUSDT") == 150 and led.avg_price("BTCUSDT") == Decimal("102")
+    led.fill("BTCUSDT", -250, 10100)  # закрытие остатка и шорт 100 лотов @ 101.00
+    assert led.position("BTCUSDT") == -100 and led.avg_price("BTCUSDT") == Decimal("101")
+    assert abs(led.realized("BTCUSDT") - (0.03 - 0.015)) < 1e-12
+    led.mark("BTCUSDT", 10040, 10050)  # шорт переоценивается по ask
+    assert abs(led.unrealized("BTCUSDT") - 0.005) < 1e-12
+
+def test_round_trip_is_exact_despite_uneven_partials():
+    led = Ledger(["BTCUSDT"], include_fees=False, metrics=False)
+    for lots, px in ((7, 10001), (5, 10002), (-3, 10010), (-4, 10011), (-5, 10013)):
+        led.fill("BTCUSDT", lots, px)
+    assert led.position("BTCUSDT") == 0 and led.unrealized("BTCUSDT") == 0
+    # выручка минус затраты — без ошибок округления на частичных закрытиях
+    cash = -(7 * 10001 + 5 * 10002) + 3 * 10010 + 4 * 10011 + 5 * 10013
+    assert abs(led.realized("BTCUSDT") - cash * 1e-6) < 1e-15
+
+def test_fees_and_metrics_pushed_only_on_change():
+    ops = []  # отложенные (gauge.set, значение) — применяет поток сброса метрик
+    led = Ledger(["BTCUSDT"], fee=Decimal("0.001"), include_fees=True, defer=ops.append)
+    p = led._pos["BTCUSDT"]
+    sets = []
+
+    class _Gauge:
+        def set(self, v):
+            sets.append(v)
+    p._g_unreal = p._g_real = p._g_size = _Gauge()
+
+    def _flush():
+        while ops:
+            fn, v = ops.pop(0)
+            fn(v)
+    led.fill("BTCUSDT", 10000, 10000)  # 1 @ 100.00, комиссия 0.1
+    assert abs(led.realized("BTCUSDT") + 0.1) < 1e-12
+    assert sets == [] and ops  # на loop gauge не трогаются
+    _flush()
+    n = len(sets)
+    led.mark("BTCUSDT", 10000, 10010)  # цена закрытия та же — ничего не отправляется
+    led.mark("BTCUSDT", 10000, 10020)
+    _flush()
+    assert len(sets) == n
+    led.mark("BTCUSDT", 10005, 10020)
+    _flush()
+    assert len(sets) == n + 1 and abs(sets[-1] - 0.05) < 1e-12
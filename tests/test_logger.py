@@ -0,0 +1,27 @@
+import json
+import logging
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from logger import JsonFormatter, SamplingFilter
+
+def test_json_formatter_output_is_valid_json():
+    fmt = JsonFormatter()
+    rec = logging.LogRecord("api_client", logging.INFO, __file__, 1,
+                            'Executed %s "%s" %.2f', ("BTCUSDT", "Buy\n", 1.5), None)
+    rec.created = 1_700_000_000.1234
+    out = json.loads(fmt.format(rec))
+    assert out == {"ts": "2023-11-14T22:13:20.123Z", "lvl": "info",
+                   "msg": 'Executed BTCUSDT "Buy\n" 1.50', "mod": "api_client"}
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        rec.exc_info = sys.exc_info()
+    assert "ValueError: boom" in json.loads(fmt.format(rec))["exc"]
+
+def test_sampling_filter_keeps_warnings():
+    f = SamplingFilter(3)
+    mk = lambda lvl: logging.LogRecord("x", lvl, __file__, 1, "m", None, None)
+    assert [f.filter(mk(logging.INFO)) for _ in range(6)] == [True, False, False, True, False, False]
+    assert f.filter(mk(logging.WARNING))
@@ -0,0 +1,39 @@
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+from md_recorder import KIND_DELTA, KIND_SNAPSHOT, MDRecorder, MDTape
+from orderbook import OrderBook
+
+def test_ws_updates_round_trip_through_tape(tmp_path, monkeypatch):
+    from api_client import APIClient
+
+    monkeypatch.setattr(MDRecorder, "CHUNK", 4)  # несколько переразмещений файлов
+    client = APIClient()
+    ws = client.ws
+    ws.recorder = MDRecorder(tmp_path / "s1")
+    ws.on_snapshot("BTCUSDT", {990: 5, 980: 7}.items(), [(1010, 3), (1020, 4)], seq=1)
+    for i in range(20):
+        ws.on_delta("BTCUSDT", [(991 + i, 2)], [(1010, 3 + i)], seq=2 + i)
+    ws.on_delta("BTCUSDT", [], [(1000, 1)], seq=99)  # разрыв не записывается
+    ws.recorder.close()
+
+    tape = MDTape(tmp_path / "s1")
+    assert len(tape) == 21  # снапшот и 20 дельт, разрыв отброшен
+    assert tape.symbols == ["BTCUSDT"] and tape.specs["BTCUSDT"]["tick"] == "0.01"
+    assert tape.kind[:2].tolist() == [KIND_SNAPSHOT, KIND_DELTA]
+    assert (tape.bid[20], tape.ask[20]) == (1010, 1010)
+    # стакан, восстановленный из колонок, совпадает с живым
+    book = OrderBook("BTCUSDT")
+    lo, nb, na = int(tape.offsets[0]), int(tape.nb[0]), int(tape.na[0])
+    book.load(tape.px[lo:lo + nb], tape.qty[lo:lo + nb],
+              tape.px[lo + nb:lo + nb + na], tape.qty[lo + nb:lo + nb + na], int(tape.seq[0]))
+    for i in range(1, 21):
+        lo, nb, na = int(tape.offsets[i]), int(tape.nb[i]), int(tape.na[i])
+        p, q = tape.px[lo:lo + nb + na].tolist(), tape.qty[lo:lo + nb + na].tolist()
+        book.apply_delta(zip(p[:nb], q[:nb]), zip(p[nb:], q[nb:]), int(tape.seq[i]))
+    live = ws.book("BTCUSDT")
+    assert np.array_equal(book.asks.sizes(), live.asks.sizes())
+    assert book.best() == (1010, 1010)
+    assert tape.select(["ETHUSDT"]).size == 0
@@ -0,0 +1,127 @@
+import asyncio
+import json
+import math
+import os
+import socket
+import sys
+import time
+import urllib.request
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from fixed_point import Ratio
+from metrics_pipeline import FIELDS, MetricsPipeline, pipeline
+from monitoring import CYCLE_LATENCY_MS, TRADING_EDGE
+
+def _gauge(metric, sym):
+    return next(s.value for m in metric.collect() for s in m.samples if s.labels.get("sym") == sym)
+
+def test_flush_fills_ring_and_prebound_gauges():
+    pipe = MetricsPipeline(cap=4)
+    a, b = pipe.bind("MPAUSDT"), pipe.bind("MPBUSDT")
+    assert pipe.bind("MPAUSDT") == a
+    for i in range(6):
+        pipe.record(a, Ratio(i, 1000), 9990, 10010, float(i))
+    pipe.record(b, None, 0, 0, 2.5)
+    pipe.record(b, 0.25, 100, 101)
+    assert _gauge(TRADING_EDGE, "MPAUSDT") != 0.005  # до сброса горячий путь гейджи не трогает
+    assert pipe.flush() == 8 and pipe.flush() == 0
+    assert _gauge(TRADING_EDGE, "MPAUSDT") == 0.005 and _gauge(CYCLE_LATENCY_MS, "MPAUSDT") == 5.0
+    assert _gauge(TRADING_EDGE, "MPBUSDT") == 0.25 and _gauge(CYCLE_LATENCY_MS, "MPBUSDT") == 2.5
+    s = pipe.series("MPAUSDT")
+    assert list(s) == list(FIELDS)
+    assert s["latency_ms"] == [2.0, 3.0, 4.0, 5.0]  # кольцо на 4, старые вытеснены
+    assert s["edge"] == [0.002, 0.003, 0.004, 0.005] and s["ts"] == sorted(s["ts"])
+    assert math.isclose(s["spread_bps"][0], 20.0)
+    s = pipe.series("MPBUSDT", 5)
+    assert s["edge"] == [None, 0.25] and s["spread_bps"][0] is None and s["latency_ms"][1] is None
+    pipe.record(a, 0.1, latency_ms=9.0)
+    pipe.flush()
+    assert pipe.series("MPAUSDT", 2)["latency_ms"] == [5.0, 9.0] and pipe.series("nope") is None
+
+def test_background_thread_flushes_bot_samples():
+    from trading_multi import TradingBotMulti
+
+    async def _run():
+        bot = TradingBotMulti(symbols=["BTCUSDT"])
+        pipe = bot.metrics
+        assert pipe is pipeline() and "BTCUSDT" in pipe.symbols()
+        pipe.flush_sec = 0.01
+        pipe.start()
+        before = len(pipe.series("BTCUSDT")["ts"])
+        task = asyncio.create_task(bot._loop("BTCUSDT"))
+        await asyncio.sleep(0)
+        bot.client.ws.on_snapshot("BTCUSDT", [(10000, 50000)], [(10010, 50000)], 1)
+        for _ in range(5):
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.05)  # поток сброса успевает забрать замер
+        s = pipe.series("BTCUSDT")
+        assert len(s["ts"]) > before and s["latency_ms"][-1] > 0
+        task.cancel()
+        await bot.close()
+        assert pipe._thread is None
+
+    asyncio.run(_run())
+
+def test_loop_defers_stage_histograms_and_ledger_gauges(monkeypatch):
+    import threading
+    import trading_multi
+    from trading_multi import TradingBotMulti
+    calls = []
+
+    def _rec(name):
+        return lambda v: calls.append((name, threading.current_thread()))
+
+    class _Hist:
+        observe = staticmethod(_rec("tick_to_order"))
+
+    class _Gauge:
+        set = staticmethod(_rec("ledger"))
+    for st in ("ANALYZE", "SLIPPAGE", "SUBMIT", "PNL", "CYCLE"):
+        monkeypatch.setattr(trading_multi, "_ST_" + st, _rec(st.lower()))
+    monkeypatch.setattr(trading_multi, "TICK_TO_ORDER_MS", _Hist())
+
+    async def _run():
+        bot = TradingBotMulti(symbols=["BTCUSDT"])
+        pipe = bot.metrics
+        pipe.flush()
+        p = bot.ledger._pos["BTCUSDT"]
+        p._g_unreal = p._g_real = p._g_size = _Gauge()
+        task = asyncio.create_task(bot._loop("BTCUSDT"))
+        await asyncio.sleep(0)
+        bot.client.ws.on_snapshot("BTCUSDT", [(10200, 50000)], [(10000, 50000)], 1)  # сделка
+        for _ in range(10):
+            await asyncio.sleep(0)
+        assert bot.client.ledger.position("BTCUSDT") and calls == []  # loop ничего не выставил
+        t = threading.Thread(target=pipe.flush, name="flush-test")
+        t.start()
+        t.join()
+        names = {n for n, _ in calls}
+        assert {"analyze", "slippage", "submit", "pnl", "cycle", "tick_to_order", "ledger"} <= names
+        assert all(th is t for _, th in calls)
+        task.cancel()
+        await bot.close()
+
+    asyncio.run(_run())
+
+def test_exposition_served_from_own_thread(monkeypatch):
+    import config
+    import monitoring
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    monkeypatch.setattr(config, "PROM_HOST", "127.0.0.1")
+    monkeypatch.setattr(config, "PROM_PORT", port)
+    pipe = pipeline()
+    pipe.record(pipe.bind("MPCUSDT"), 0.5, 100, 102, 1.0)
+    pipe.flush()
+    asyncio.run(monitoring.start_metrics_server())  # loop завершён — отвечает только поток сервера
+    base = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            body = urllib.request.urlopen(base + "/metrics", timeout=1).read().decode()
+            break
+        except OSError:
+            time.sleep(0.02)
+    assert "trading_edge" in body
+    ts = json.loads(urllib.request.urlopen(base + "/timeseries?sym=MPCUSDT&n=10", timeout=1).read())
+    assert list(ts) == ["MPCUSDT"] and ts["MPCUSDT"]["edge"] == [0.5]
@@ -0,0 +1,65 @@
+import asyncio
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from monitoring import TICK_TO_ORDER_MS, make_app
+
+def _busy_spin(until):
+    while time.monotonic() < until:
+        pass
+
+def test_debug_profile_samples_event_loop():
+    async def _run():
+        client = TestClient(TestServer(make_app()))
+        await client.start_server()
+
+        async def busy():
+            for _ in range(20):
+                _busy_spin(time.monotonic() + 0.01)
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(busy())
+        resp = await client.get("/debug/profile", params={"seconds": "0.3", "interval": "0.002"})
+        assert resp.status == 200
+        assert "_busy_spin" in await resp.text()
+        await task
+        await client.close()
+
+    asyncio.run(_run())
+
+def test_tick_to_order_latency_is_observed():
+    from trading_multi import TradingBotMulti
+
+    def _count():
+        return next(s.value for m in TICK_TO_ORDER_MS.collect() for s in m.samples if s.name.endswith("_count"))
+
+    async def _run():
+        bot = TradingBotMulti()
+        before = _count()
+        task = asyncio.create_task(bot._loop("BTCUSDT"))
+        await asyncio.sleep(0)
+        bot.client.ws.on_snapshot("BTCUSDT", [(10200, 50000)], [(10000, 50000)], 1)
+        for _ in range(5):
+            await asyncio.sleep(0)
+        assert _count() == before  # на loop гистограмма не трогается
+        bot.metrics.flush()
+        assert _count() == before + 1
+        task.cancel()
+        await bot.close()
+
+    asyncio.run(_run())
+
+def test_metrics_endpoint_serves_exposition():
+    async def _run():
+        client = TestClient(TestServer(make_app()))
+        await client.start_server()
+        resp = await client.get("/metrics")
+        assert resp.status == 200
+        assert "tick_to_order_ms_bucket" in await resp.text()
+        await client.close()
+
+    asyncio.run(_run())
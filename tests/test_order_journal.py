@@ -0,0 +1,55 @@
+import os
+import sys
+import uuid
+from decimal import Decimal
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from order_journal import Order, OrderHistory, OrderJournal
+
+def _order(i, sym="BTCUSDT"):
+    return Order(str(uuid.uuid4()), sym, "Buy" if i % 2 else "Sell",
+                 Decimal("0.0010") * (i + 1), Decimal("100.25") + i, 1000.0 + i)
+
+def test_journal_survives_torn_write(tmp_path):
+    path = tmp_path / "orders.jnl"
+    j = OrderJournal(path)
+    orders = [_order(i) for i in range(50)]
+    for o in orders:
+        j.append(o)
+    off = j._off(j.count)
+    j._mm[off:off + 10] = b"\xff" * 10  # запись оборвана посреди append
+    j.close()
+
+    j = OrderJournal(path)
+    assert j.count == 50
+    assert [j.read(i) for i in range(50)] == orders
+    j.append(_order(99))
+    assert j.read(50).price == Decimal("199.25")
+    j.close()
+
+def test_history_is_bounded_and_pages_through_ring_and_journal(tmp_path):
+    hist = OrderHistory(cap=4, journal_path=tmp_path / "orders.jnl")
+    hist.open_journal()
+    orders = [_order(i, "ETHUSDT" if i % 3 == 0 else "BTCUSDT") for i in range(10)]
+    for o in orders:
+        hist.append(o)
+    assert len(hist) == 4
+    assert list(hist.iter()) == orders[::-1]
+    eth = [o for o in orders[::-1] if o.symbol == "ETHUSDT"]
+    assert list(hist.iter(sym="ETHUSDT", offset=1, limit=2)) == eth[1:3]
+    assert list(hist.iter(since=1007.0)) == orders[:6:-1]
+    hist.close()
+
+def test_clear_hides_journalled_orders(tmp_path):
+    hist = OrderHistory(cap=4, journal_path=tmp_path / "orders.jnl")
+    hist.open_journal()
+    for i in range(10):
+        hist.append(_order(i))
+    hist.clear()
+    assert list(hist.iter()) == []
+    fresh = [_order(i) for i in range(20, 26)]
+    for o in fresh:
+        hist.append(o)
+    assert list(hist.iter()) == fresh[::-1]  # кольцо и журнал — только после clear
+    assert hist.journal.count == 16
+    hist.close()
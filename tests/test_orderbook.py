@@ -0,0 +1,27 @@
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import pytest
+from orderbook import BookGap, OrderBook
+
+def test_deltas_keep_levels_sorted_and_detect_gaps():
+    book = OrderBook("BTCUSDT", depth=3)
+    book.apply_snapshot([(990, 1), (980, 2)], [(1010, 1), (1030, 3)], seq=10)
+    book.apply_delta([(995, 4), (980, 0)], [(1020, 2), (1005, 1)], seq=11)
+    assert book.best() == (995, 1005)
+    assert list(book.bids.prices()) == [995, 990]
+    assert list(book.asks.prices()) == [1005, 1010, 1020]  # 1030 вытеснен глубиной
+    with pytest.raises(BookGap):
+        book.apply_delta([], [(1010, 0)], seq=13)
+    assert book.stale
+    with pytest.raises(BookGap):
+        book.apply_delta([], [], seq=12)  # до нового снапшота всё отбрасывается
+
+def test_walk_returns_notional_and_worst_level():
+    book = OrderBook("BTCUSDT")
+    book.apply_snapshot([(99, 10), (98, 10)], [(100, 10), (101, 20), (102, 50)], seq=1)
+    assert book.walk("Buy", 20) == (100 * 10 + 101 * 10, 101)
+    assert book.walk("Sell", 15) == (99 * 10 + 98 * 5, 98)
+    assert book.walk("Buy", 100) is None
+    assert book.walk("Buy", 30, depth=1) is None
@@ -0,0 +1,68 @@
+import asyncio
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from rate_limiter import PRIO_ORDER, PRIO_POSITION, RateLimiter, TokenBucket
+
+def test_bucket_never_exceeds_rate_under_burst():
+    async def _run():
+        bucket = TokenBucket(rate=100, burst=5)
+        t0 = time.monotonic()
+        await asyncio.gather(*(bucket.acquire() for _ in range(25)))
+        elapsed = time.monotonic() - t0
+        assert elapsed >= (25 - 5) / 100 * 0.9
+        assert bucket.throttled == 20 and bucket.throttled_sec > 0
+
+    asyncio.run(_run())
+
+def test_orders_jump_ahead_of_position_polling():
+    async def _run():
+        bucket = TokenBucket(rate=200, burst=1)
+        done = []
+
+        async def call(tag, prio):
+            await bucket.acquire(priority=prio)
+            done.append(tag)
+
+        await bucket.acquire()  # опустошаем bucket
+        polls = [asyncio.create_task(call(f"pos{i}", PRIO_POSITION)) for i in range(3)]
+        await asyncio.sleep(0)
+        order = asyncio.create_task(call("order", PRIO_ORDER))
+        await asyncio.gather(order, *polls)
+        assert done[0] == "order"
+
+    asyncio.run(_run())
+
+def test_limiter_routes_paths_to_groups():
+    async def _run():
+        lim = RateLimiter()
+        await lim.acquire("/v5/order/create")
+        await lim.acquire("/v5/position/list")
+        await lim.acquire("/v5/market/time")
+        stats = lim.stats()
+        assert stats["order"]["acquired"] == stats["position"]["acquired"] == 1
+        assert "public" not in stats and stats["ip"]["acquired"] == 3  # public — только лимит IP
+
+    asyncio.run(_run())
+
+def test_orders_outrank_polling_and_queries_on_shared_ip_limit():
+    async def _run():
+        lim = RateLimiter(ip=(200, 1))
+        done = []
+
+        async def call(path):
+            await lim.acquire(path)
+            done.append(path)
+
+        await lim.acquire("/v5/market/time")  # опустошаем bucket IP
+        waiting = [asyncio.create_task(call(p)) for p in
+                   ("/v5/position/list", "/v5/order/realtime", "/v5/market/tickers")]
+        await asyncio.sleep(0)
+        order = asyncio.create_task(call("/v5/order/create"))
+        await asyncio.gather(order, *waiting)
+        assert done[0] == "/v5/order/create" and done[1] == "/v5/position/list"
+        assert lim.stats()["ip"]["throttled"] == 4
+
+    asyncio.run(_run())
@@ -0,0 +1,118 @@
+import asyncio
+import os
+import sys
+from decimal import Decimal
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from api_client import APIClient
+from exec_stream import ExecutionStream
+from fixed_point import instrument
+from rebalancer import Reconciler
+
+SYMS = ["BTCUSDT", "ETHUSDT"]
+
+def _setup():
+    from trading_multi import TradingBotMulti
+    client = APIClient()
+    for s in SYMS:
+        client.ws._prices[s] = (10000, 10050)
+    calls = []
+    orig = client._call
+
+    async def _call(m, path, *a, **kw):
+        calls.append(path)
+        return await orig(m, path, *a, **kw)
+
+    client._call = _call
+    bot = TradingBotMulti(client, SYMS)
+    return client, bot, Reconciler(client, bot, poll_sec=3600, delay=0.001), calls
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0.005)
+
+class _Exchange:
+    """Стенд биржи со своими позициями (не из ledger): исполнения публикует в поток."""
+
+    def __init__(self, client, calls):
+        self.client, self.calls = client, calls
+        self.pos = {}
+
+    def set(self, sym, lots):
+        self.pos[sym] = lots
+        self.client.stream.publish(sym, lots)
+
+    async def __call__(self, m, path, params=None, private=False, weight=None):
+        self.calls.append(path)
+        if path.startswith("/v5/order/create"):
+            for r in params.get("request", [params]):
+                lots = instrument(r["symbol"]).to_lots(Decimal(r["qty"]))
+                self.set(r["symbol"], self.pos.get(r["symbol"], 0) + (lots if r["side"] == "Buy" else -lots))
+        return {"retCode": 0}
+
+def test_stream_divergence_fixed_in_one_batch_without_polling():
+    async def _run():
+        client, bot, rec, calls = _setup()
+        client._call = ex = _Exchange(client, calls)
+        task = asyncio.create_task(rec.run())
+        await _settle()
+        assert calls.count("/v5/position/list") == 1  # стартовая полная сверка
+        await client.place_order("BTCUSDT", "Buy", instrument("BTCUSDT").qty(20))
+        await _settle()
+        assert ex.pos["BTCUSDT"] == bot.ledger.position("BTCUSDT") == 20 and len(calls) == 2
+        # биржа разошлась с ledger сама по себе (пропущенное исполнение, ликвидация)
+        ex.set("BTCUSDT", 50)
+        ex.set("ETHUSDT", -30)
+        await _settle()
+        assert calls.count("/v5/order/create-batch") == 1
+        assert calls.count("/v5/position/list") == 1
+        # заявки вернули биржу к ledger, ledger и риск не тронуты
+        assert ex.pos == {"BTCUSDT": 20, "ETHUSDT": 0}
+        assert bot.ledger.position("BTCUSDT") == 20 and bot.ledger.position("ETHUSDT") == 0
+        assert bot.risk.position("ETHUSDT") == 0
+        assert (rec.exch["BTCUSDT"], rec.exch["ETHUSDT"]) == (20, 0)
+        await _settle()
+        assert len(calls) == 3  # подтверждения потока не порождают новых заявок
+        task.cancel()
+
+    asyncio.run(_run())
+
+def test_correction_without_stream_echo_is_sent_once():
+    async def _run():
+        client, bot, rec, calls = _setup()
+        task = asyncio.create_task(rec.run())
+        await _settle()
+        client.stream.publish("BTCUSDT", -40)  # офлайн-_call ничего не публикует в ответ
+        await _settle()
+        client.stream.publish("ETHUSDT", 0)  # другой символ будит сверку снова
+        await _settle()
+        assert calls.count("/v5/order/create-batch") == 1
+        assert rec.exch["BTCUSDT"] == 0 and bot.ledger.position("BTCUSDT") == 0
+        assert [(o.symbol, o.side) for o in client.orders] == [("BTCUSDT", "Buy")]
+        task.cancel()
+
+    asyncio.run(_run())
+
+def test_seq_gap_triggers_full_poll():
+    async def _run():
+        client, bot, rec, calls = _setup()
+        task = asyncio.create_task(rec.run())
+        await _settle()
+        client.stream.publish("BTCUSDT", 0, seq=1)
+        client.stream.publish("BTCUSDT", 0, seq=1)  # повтор игнорируется
+        await _settle()
+        assert rec.gaps == 0 and rec.polls == 1
+        client.stream.publish("BTCUSDT", 0, seq=3)
+        await _settle()
+        assert rec.gaps == 1 and rec.polls == 2
+        task.cancel()
+
+    asyncio.run(_run())
+
+def test_feed_parses_bybit_position_topic():
+    stream, got = ExecutionStream(), []
+    stream.subscribe(got.append)
+    stream.feed({"topic": "position", "data": [
+        {"symbol": "BTCUSDT", "side": "Sell", "size": "0.0150", "seq": 7},
+        {"symbol": "ETHUSDT", "side": "", "size": "0", "seq": 2}]})
+    assert [tuple(u) for u in got] == [("BTCUSDT", 7, -150), ("ETHUSDT", 2, 0)]
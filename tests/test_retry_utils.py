@@ -0,0 +1,143 @@
+import asyncio
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import pytest
+
+from retry_utils import CircuitBreaker, CircuitOpen, RetryPolicy, retry_async
+
+def test_breaker_opens_rejects_probes_and_closes():
+    async def _run():
+        pol = RetryPolicy(attempts=1, fails=2, cooldown=0.05)
+        calls = []
+
+        async def bad():
+            calls.append(1)
+            raise ConnectionError("down")
+
+        async def ok():
+            calls.append(1)
+            return 42
+
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                await pol.call(bad, "ep")
+        br = pol.breaker("ep")
+        assert br.state == CircuitBreaker.OPEN
+        with pytest.raises(CircuitOpen):
+            await pol.call(ok, "ep")  # в open запрос не уходит
+        assert len(calls) == 2
+        await asyncio.sleep(0.06)
+        with pytest.raises(ConnectionError):
+            await pol.call(bad, "ep")  # неудачная проба снова открывает цепь
+        assert br.state == CircuitBreaker.OPEN and len(calls) == 3
+        await asyncio.sleep(0.06)
+        assert await pol.call(ok, "ep") == 42
+        assert br.state == CircuitBreaker.CLOSED
+        assert await pol.call(ok, "other") == 42  # у каждого эндпоинта свой breaker
+
+    asyncio.run(_run())
+
+def test_deadline_stops_retries_when_budget_is_short():
+    async def _run():
+        pol = RetryPolicy(attempts=10, wait=0.05, backoff=1.0, budget=0.12, fails=100)
+        calls = []
+
+        async def slow_fail():
+            calls.append(1)
+            await asyncio.sleep(0.02)
+            raise ConnectionError
+
+        t0 = time.monotonic()
+        with pytest.raises(ConnectionError):
+            await pol.call(slow_fail, "ep")
+        assert time.monotonic() - t0 < 0.15 and 1 < len(calls) < 10
+
+        async def hang():
+            await asyncio.sleep(1)
+
+        t0 = time.monotonic()
+        with pytest.raises(asyncio.TimeoutError):
+            await pol.call(hang, "hang", deadline=time.monotonic() + 0.05)
+        assert time.monotonic() - t0 < 0.2
+
+    asyncio.run(_run())
+
+def test_hedged_read_beats_slow_first_request():
+    async def _run():
+        pol = RetryPolicy(attempts=1, hedge=True, hedge_min=0.005)
+        n = 0
+
+        async def read():
+            nonlocal n
+            n += 1
+            await asyncio.sleep(0.001)
+            return n
+
+        for _ in range(16):  # набираем статистику p95
+            await pol.call(read, "ep")
+        assert pol._latency["ep"].p95 is not None
+        n, started = 0, []
+
+        async def tail():
+            nonlocal n
+            n += 1
+            i = n
+            started.append(i)
+            await asyncio.sleep(0.5 if i == 1 else 0.001)
+            return i
+
+        t0 = time.monotonic()
+        assert await pol.call(tail, "ep") == 2
+        assert time.monotonic() - t0 < 0.1 and started == [1, 2]
+
+    asyncio.run(_run())
+
+def test_retry_async_keeps_old_interface():
+    async def _run():
+        calls = []
+
+        async def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise ConnectionError
+            return "ok"
+
+        assert await retry_async(flaky, attempts=3, wait=0.001) == "ok"
+        assert len(calls) == 3
+
+    asyncio.run(_run())
+
+def test_cancelled_half_open_probe_does_not_wedge_breaker():
+    async def _run():
+        pol = RetryPolicy(attempts=1, fails=1, cooldown=0.01, retry_on=(ConnectionError,))
+
+        async def bad():
+            raise ConnectionError
+
+        async def odd():
+            raise KeyError("x")
+
+        async def hang():
+            await asyncio.sleep(1)
+
+        async def ok():
+            return 1
+
+        with pytest.raises(ConnectionError):
+            await pol.call(bad, "ep")
+        await asyncio.sleep(0.02)
+        probe = asyncio.create_task(pol.call(hang, "ep"))
+        await asyncio.sleep(0)
+        assert pol.breaker("ep").state == CircuitBreaker.HALF_OPEN
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        with pytest.raises(KeyError):
+            await pol.call(odd, "ep")  # исключение вне retry_on тоже освобождает пробу
+        assert await pol.call(ok, "ep") == 1
+        assert pol.breaker("ep").state == CircuitBreaker.CLOSED
+
+    asyncio.run(_run())
@@ -0,0 +1,149 @@
+import asyncio
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+
+from rl_policy import OBS_FIELDS, RLPolicy, RolloutBuffer, features
+
+def _weights(path, trade: bool, hidden=4):
+    # нулевые веса слоёв: решение задаёт смещение выхода
+    np.savez(path, W1=np.zeros((len(OBS_FIELDS), hidden)), b1=np.zeros(hidden),
+             W2=np.zeros((hidden, 2)), b2=np.array([-1.0, 1.0] if trade else [1.0, -1.0]))
+
+def test_features_and_rollout_ring():
+    obs = features(np.array([(25, 10000, 9990, 10010, -3), (0, 0, 0, 0, 0)], np.float64))
+    assert obs.dtype == np.float32 and obs.shape == (2, len(OBS_FIELDS))
+    assert np.allclose(obs[0], (25.0, 20.0, -1.0)) and not obs[1].any()
+    buf = RolloutBuffer(3)
+    rows = [buf.add(i % 2, (i, 1, 100, 101, 0), i % 2) for i in range(5)]
+    buf.set_reward(rows[0], 9.0)  # строка уже вытеснена — награда не пишется
+    buf.set_reward(rows[3], 1.5)
+    out = buf.export()
+    assert out["obs"][:, 0].tolist() == [2e4, 3e4, 4e4] and out["action"].tolist() == [0, 1, 0]
+    assert out["slot"].tolist() == [0, 1, 0] and out["reward"][1] == 1.5 and np.isnan(out["reward"][0])
+
+def test_policy_decides_on_signal_tick_and_hot_swaps_weights(tmp_path):
+    from trading_multi import TradingBotMulti
+    path, rollout = tmp_path / "policy.npz", tmp_path / "rollout.npz"
+    _weights(path, trade=False)
+
+    async def _run():
+        bot = TradingBotMulti(symbols=["BTCUSDT"])
+        bot.rl = rl = RLPolicy(path, update_sec=0.05, min_rollout=2, rollout_path=rollout, infer_ms=1000)
+        rl.bind("BTCUSDT")
+        sent = []
+        submit = bot.client.submit_order
+
+        async def _submit(*a, **kw):
+            sent.append(a)
+            return await submit(*a, **kw)
+        bot.client.submit_order = _submit
+        rl.start()
+        assert rl.ready
+        ws = bot.client.ws
+        task = asyncio.create_task(bot._loop("BTCUSDT"))
+        await asyncio.sleep(0)
+        ws.on_snapshot("BTCUSDT", [(9990, 50000)], [(10010, 50000)], 1)  # без сигнала — сеть не спрашивают
+        await asyncio.sleep(0.01)
+        assert rl.batches == 0
+        ws.on_snapshot("BTCUSDT", [(10200, 50000)], [(10000, 50000)], 2)
+        for _ in range(50):
+            await asyncio.sleep(0.005)
+            if rl.buffer.n:
+                break
+        assert sent == [] and rl.batches == 1  # политика держит сигнал стратегии
+        # строка роллаута — то самое наблюдение сигнального тика
+        assert rl.buffer.raw[0, 2:].tolist() == [10200, 10000, 0] and rl.buffer.action[0] == 0
+
+        _weights(path, trade=True)
+        os.utime(path, (time.time() + 5, time.time() + 5))
+        w = rl._weights
+        for _ in range(50):
+            await asyncio.sleep(0.01)
+            if rl._weights is not w:
+                break
+        assert rl._weights is not w  # новые веса без остановки цикла
+        ws.on_snapshot("BTCUSDT", [(10201, 50000)], [(10000, 50000)], 3)
+        for _ in range(50):
+            await asyncio.sleep(0.005)
+            if sent:
+                break
+        assert len(sent) == 1 and rl.buffer.raw[1, 2:].tolist() == [10201, 10000, 0]
+        for _ in range(20):
+            await asyncio.sleep(0.01)
+            if rollout.exists():
+                break
+        with np.load(rollout) as z:
+            assert z["action"].tolist() == [0, 1] and np.isfinite(z["reward"][0])
+        task.cancel()
+        await bot.close()
+        assert rl._thread is None
+
+    asyncio.run(_run())
+
+def test_policy_without_weights_is_a_no_op(tmp_path):
+    from trading_multi import TradingBotMulti
+
+    async def _run():
+        bot = TradingBotMulti(symbols=["BTCUSDT"])
+        bot.rl = rl = RLPolicy(tmp_path / "missing.npz", rollout_path="")
+        rl.bind("BTCUSDT")
+        rl.start()
+        assert not rl.ready and rl.request((1, 1, 100, 101, 0)) is None
+        assert await rl.decide(0, "buy_spot", (1, 1, 100, 101, 0), 0.0) == "buy_spot"
+        task = asyncio.create_task(bot._loop("BTCUSDT"))
+        await asyncio.sleep(0)
+        bot.client.ws.on_snapshot("BTCUSDT", [(10200, 50000)], [(10000, 50000)], 1)
+        for _ in range(10):
+            await asyncio.sleep(0)
+        assert len(bot.client.orders) == 1  # сигнал прошёл как без политики
+        assert rl.buffer.n == 0 and rl.batches == 0
+        task.cancel()
+        await bot.close()
+
+    asyncio.run(_run())
+
+def test_pending_requests_answered_in_one_pass(tmp_path):
+    from concurrent.futures import Future
+    path = tmp_path / "policy.npz"
+    _weights(path, trade=True)
+    rl = RLPolicy(path, rollout_path="")
+    rl.reload()
+    futs = [Future() for _ in range(3)]
+    for i, f in enumerate(futs):
+        rl._pending.append(((i, 100, 9990, 10010, 0), f))
+    futs[1].cancel()  # запрос, отменённый по таймауту, не считается
+    assert rl.infer() == 2 and rl.batches == 1
+    assert futs[0].result() is True and futs[2].result() is True and futs[1].cancelled()
+    late = Future()
+    rl._pending.append(((0, 1, 1, 2, 0), late))
+    rl.stop()  # ожидающие получают «нет решения»
+    assert not rl._pending and late.result() is None
+
+def test_batch_loop_sends_pass_requests_before_awaiting(tmp_path):
+    from trading_multi import TradingBotMulti
+    path = tmp_path / "policy.npz"
+    _weights(path, trade=True)
+
+    async def _run():
+        bot = TradingBotMulti(symbols=["BTCUSDT", "ETHUSDT"])
+        bot.rl = rl = RLPolicy(path, rollout_path="", infer_ms=1000)
+        rl.start()
+        ws = bot.client.ws
+        task = asyncio.create_task(bot._batch_loop())
+        await asyncio.sleep(0)
+        ws.on_snapshot("BTCUSDT", [(10200, 50000)], [(10000, 50000)], 1)
+        ws.on_snapshot("ETHUSDT", [(10300, 50000)], [(10000, 50000)], 1)
+        for _ in range(50):
+            await asyncio.sleep(0.005)
+            if len(bot.client.orders) == 2:
+                break
+        assert sorted(o.symbol for o in bot.client.orders) == ["BTCUSDT", "ETHUSDT"]
+        assert sorted(rl.buffer.raw[:2, 2].tolist()) == [10200, 10300] and rl.batches <= 2
+        task.cancel()
+        await bot.close()
+
+    asyncio.run(_run())
@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+import state_snapshot
+
+def _bot():
+    from api_client import APIClient
+    from trading_multi import TradingBotMulti
+    return TradingBotMulti(APIClient(), ["BTCUSDT", "ETHUSDT"])
+
+def test_snapshot_round_trip_restores_ledger_books_and_risk(tmp_path):
+    path = str(tmp_path / "state.npz")
+    bot = _bot()
+    led = bot.ledger
+    led.fill("BTCUSDT", 300, 10000)
+    led.fill("BTCUSDT", 100, 10300)
+    led.fill("BTCUSDT", -150, 10200)
+    led.fill("ETHUSDT", -70, 5000)
+    bot.client.ws.on_snapshot("ETHUSDT", [(4990, 7), (4980, 9)], [(5010, 3)], 1)
+    bot.save_state(path)
+
+    warm = _bot()
+    assert warm.restore_state(path)
+    for sym in ("BTCUSDT", "ETHUSDT"):
+        assert warm.ledger.summary(sym) == led.summary(sym)
+        assert warm.ledger.avg_price(sym) == led.avg_price(sym)
+        assert warm.risk.position(sym) == led.position(sym)
+    book = warm.client.ws.book("ETHUSDT")
+    assert book.best() == (4990, 5010) and book.bids.sizes().tolist() == [7, 9] and book.seq == 1
+    assert warm.client.ws._prices["ETHUSDT"] == (4990, 5010)
+    # закрытие после рестарта даёт тот же PnL, что и без него
+    assert warm.ledger.fill("BTCUSDT", -250, 10100) == led.fill("BTCUSDT", -250, 10100)
+
+    state = state_snapshot.load(path)
+    state["ts"] = np.array([0.0])  # устаревший снапшот: стаканы не берём
+    cold = _bot()
+    assert state_snapshot.restore(state, cold.ledger, cold.client.ws, 60) == (2, 0)
+    assert cold.client.ws.book("ETHUSDT").stale
+    assert not _bot().restore_state(str(tmp_path / "missing.npz"))
+
+def test_import_defers_aiohttp_tenacity_alerts_and_logging():
+    code = ("import sys, logging, trading_multi, alert_utils; "
+            "print(sorted(m for m in ('aiohttp', 'tenacity') if m in sys.modules), "
+            "alert_utils._alerts is None, bool(logging.getLogger().handlers))")
+    env = dict(os.environ, HTTP_ENABLED="false", BYBIT_WS_ENABLED="false", WORKERS="1")
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout.split()
+    assert out == ["[]", "True", "False"]
@@ -12,14 +12,41 @@ def test_strategy_detects_buy_sell():
     async def _run():
         client = APIClient()
         await client.start()
-        client.ws._prices["BTCUSDT"] = (Decimal("102"), Decimal("100"))
+        client.ws._prices["BTCUSDT"] = (10200, 10000)  # тики 0.01
         strat = ArbitrageStrategyMulti(client)
         action, edge = await strat.analyze("BTCUSDT")
         assert action == "buy_spot"
         assert edge > 0
-        client.ws._prices["BTCUSDT"] = (Decimal("100"), Decimal("102"))
+        client.ws._prices["BTCUSDT"] = (10000, 10200)
         action, edge = await strat.analyze("BTCUSDT")
         assert action == "sell_spot"
         await client.close()
 
     asyncio.run(_run())
+
+def test_analyze_batch_matches_scalar_threshold():
+    import random
+    import config
+    from fixed_point import Ratio
+
+    strat = ArbitrageStrategyMulti(None)
+    thr = Ratio.of(config.MIN_FUNDING_THRESHOLD)
+    rng = random.Random(3)
+    expected = set()
+    for i in range(300):
+        sym = f"S{i}USDT"
+        strat.add_symbol(sym)
+        ask = rng.randint(1_000, 5_000_000)
+        bid = ask + rng.randint(-ask // 50, ask // 50)
+        strat.update(sym, bid, ask)
+        action, edge = strat.evaluate(bid, ask)
+        if edge.ge(thr):
+            expected.add((sym, action))
+    strat.update("BTCUSDT", 10000, 10000, perp_bid=10100, perp_ask=10100)
+    res = strat.analyze_batch()
+    assert {(s, a) for s, a, _ in res} == expected | {("BTCUSDT", "buy_spot")}
+    assert all(e >= float(config.MIN_FUNDING_THRESHOLD) for _, _, e in res)
+    some = [f"S{i}USDT" for i in range(0, 300, 7)] + ["BTCUSDT", "UNKNOWN"]
+    sub = strat.analyze_batch(some)
+    assert sorted(sub) == sorted(r for r in res if r[0] in some)  # только переданные символы
+    assert strat.analyze_batch(()) == []
@@ -0,0 +1,93 @@
+import asyncio
+import functools
+import multiprocessing as mp
+import os
+import subprocess
+import sys
+import time
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from risk_state import RiskState
+from supervisor import Supervisor, shard
+
+SYMS = ["AAAUSDT", "BBBUSDT", "CCCUSDT"]
+
+def _grab(name, lock, sym, out):
+    risk = RiskState.attach(name, SYMS, lock)
+    risk.max_gross = 10.0
+    # по 100 лотов × 100.00 = 1.0 экспозиции за шаг, пока общий лимит пускает
+    out.put(sum(risk.reserve(sym, 100 * (k + 1), 10000) for k in range(20)))
+    risk.close()
+
+def test_gross_limit_holds_across_processes():
+    ctx = mp.get_context("spawn")
+    lock = ctx.Lock()
+    risk = RiskState.create(SYMS, lock)
+    out = ctx.Queue()
+    procs = [ctx.Process(target=_grab, args=(risk.name, lock, s, out)) for s in SYMS[:2]]
+    for p in procs:
+        p.start()
+    granted = out.get(timeout=30) + out.get(timeout=30)
+    for p in procs:
+        p.join()
+    assert granted == 10
+    assert abs(risk.gross() - 10.0) < 1e-9 and abs(risk.exp.sum() - risk.gross()) < 1e-9
+    assert risk.reserve("AAAUSDT", 0, 10000)  # сокращение позиции разрешено всегда
+    risk.close(unlink=True)
+
+def _crash_once(marker, shard_id, symbols, universe, shm_name, lock):
+    risk = RiskState.attach(shm_name, universe, lock)
+    if not os.path.exists(marker):
+        risk.set(symbols[0], 7, 10000)
+        open(marker, "w").close()
+        os._exit(3)
+    time.sleep(60)
+
+def test_supervisor_restarts_crashed_worker_and_keeps_shared_positions(tmp_path, monkeypatch):
+    assert shard(SYMS, 2) == [["AAAUSDT", "CCCUSDT"], ["BBBUSDT"]]
+    monkeypatch.setattr(Supervisor, "BACKOFF_SEC", (0,))
+
+    async def _run():
+        sup = Supervisor(SYMS[:1], 1, target=functools.partial(_crash_once, str(tmp_path / "m")))
+        sup.start()
+        try:
+            deadline = time.monotonic() + 30
+            while not (sup.restarts[0] and sup._procs[0] is not None and sup._procs[0].is_alive()):
+                assert time.monotonic() < deadline
+                await asyncio.sleep(0.05)
+                sup.check()
+            assert sup.restarts == [1]
+            assert sup.risk.position("AAAUSDT") == 7  # позиция пережила рестарт
+        finally:
+            await sup.stop()
+
+    asyncio.run(_run())
+
+_AGG = """
+import multiprocessing as mp, sys
+sys.path.insert(0, {root!r})
+import monitoring
+from prometheus_client import generate_latest
+
+def work(sym):
+    monitoring.ERROR_COUNTER.labels(type="x").inc()
+    monitoring.POSITION_SIZE.labels(sym=sym).set(2)
+
+if __name__ == "__main__":
+    ctx = mp.get_context("spawn")
+    ps = [ctx.Process(target=work, args=(s,)) for s in ("AAA", "BBB")]
+    for p in ps: p.start()
+    for p in ps: p.join()
+    print(generate_latest(monitoring._registry()).decode())
+"""
+
+def test_metrics_aggregate_over_worker_processes(tmp_path):
+    script = tmp_path / "agg.py"
+    script.write_text(_AGG.format(root=ROOT))
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path))
+    out = subprocess.run([sys.executable, str(script)], env=env, capture_output=True,
+                         text=True, timeout=60, check=True).stdout
+    assert 'error_total{type="x"} 2.0' in out
+    # livesum: процессы уже завершились, но не помечены мёртвыми
+    assert 'position_size{sym="AAA"} 2.0' in out and 'position_size{sym="BBB"} 2.0' in out
@@ -0,0 +1,82 @@
+import asyncio
+import os
+import sys
+from decimal import Decimal
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from api_client import APIClient
+
+def test_subscription_conflates_to_latest_quote():
+    async def _run():
+        client = APIClient()
+        sub = client.ws.subscribe("BTCUSDT")
+        first = await sub.__anext__()  # начальный снимок
+        assert (first.bid, first.ask) == (10000, 10050)
+        client.ws._publish("BTCUSDT", 10100, 10150)
+        client.ws._publish("BTCUSDT", 10200, 10250)
+        quote = await sub.__anext__()
+        assert (quote.bid, quote.ask) == (10200, 10250)
+        assert await client.get_best("BTCUSDT") == (Decimal("102"), Decimal("102.5"))
+        assert sub.dropped == 1
+        client.ws.unsubscribe(sub)
+        async for _ in sub:
+            raise AssertionError("closed subscription must not yield")
+
+    asyncio.run(_run())
+
+def test_loop_runs_once_per_tick():
+    from trading_multi import TradingBotMulti
+
+    async def _run():
+        bot = TradingBotMulti()
+        task = asyncio.create_task(bot._loop("BTCUSDT"))
+        await asyncio.sleep(0)
+        assert not bot.client.orders
+        bot.client.ws.on_snapshot("BTCUSDT", [(10200, 50000)], [(10000, 50000)], 1)
+        for _ in range(5):
+            await asyncio.sleep(0)
+        assert len(bot.client.orders) == 1
+        assert bot.ledger.position("BTCUSDT") > 0
+        task.cancel()
+        await bot.close()
+
+    asyncio.run(_run())
+
+def test_batch_loop_trades_only_crossing_symbols():
+    from trading_multi import TradingBotMulti
+
+    async def _run():
+        bot = TradingBotMulti()
+        task = asyncio.create_task(bot._batch_loop())
+        await asyncio.sleep(0)
+        bot.client.ws.on_snapshot("ETHUSDT", [(10200, 50000)], [(10000, 50000)], 1)
+        bot.client.ws.on_snapshot("BTCUSDT", [(9990, 50000)], [(10000, 50000)], 1)
+        for _ in range(5):
+            await asyncio.sleep(0)
+        assert [o.symbol for o in bot.client.orders] == ["ETHUSDT"]
+        task.cancel()
+        await bot.close()
+
+    asyncio.run(_run())
+
+def test_batch_loop_trades_stale_crossed_quote_once():
+    from trading_multi import TradingBotMulti
+
+    async def _run():
+        bot = TradingBotMulti()
+        ws = bot.client.ws
+        task = asyncio.create_task(bot._batch_loop())
+        await asyncio.sleep(0)
+        ws.on_snapshot("ETHUSDT", [(10200, 50000)], [(10000, 50000)], 1)  # единственный кросс
+        for _ in range(5):
+            await asyncio.sleep(0)
+        for seq in range(1, 5):  # тикает только BTC, котировка ETH остаётся пересечённой
+            ws.on_snapshot("BTCUSDT", [(9990 - seq, 50000)], [(10000, 50000)], seq)
+            for _ in range(5):
+                await asyncio.sleep(0)
+        assert [o.symbol for o in bot.client.orders] == ["ETHUSDT"]
+        assert ws.quote("ETHUSDT")[:2] == (10200, 10000) and ws.quote("nope") == (0, 0, None)
+        task.cancel()
+        await bot.close()
+
+    asyncio.run(_run())
@@ -1,75 +1,345 @@
 from __future__ import annotations
 import asyncio, logging, time
 from decimal import Decimal
-from typing import Dict
+from typing import Dict, List, Set, Tuple
 import config
 from api_client import APIClient
-from alert_utils import ALERTS
-from monitoring import (CYCLE_LATENCY_MS, ORDERS_ACTIVE, PNL_TOTAL, PNL_UNREAL,
-                        POSITION_SIZE, TRADING_EDGE)
+from alert_utils import alerts
+from fixed_point import Ratio, instrument, register_instrument
+from funding_scanner import FundingScanner
+from metrics_pipeline import pipeline
+from monitoring import STAGE_LATENCY_MS, TICK_TO_ORDER_MS
 from rebalancer import smart_rebalance
+from risk_state import RiskState
+from rl_policy import RLPolicy
 from slippage_sim import SlippageSimulator
+import state_snapshot
 from strategy_multi import ArbitrageStrategyMulti
 
 logger = logging.getLogger(__name__)
 
+# observe привязан заранее; на loop только defer((observe, ms)), гистограмма — в потоке metrics-flush
+_ST_ANALYZE  = STAGE_LATENCY_MS.labels(stage="analyze").observe
+_ST_SLIPPAGE = STAGE_LATENCY_MS.labels(stage="slippage").observe
+_ST_SUBMIT   = STAGE_LATENCY_MS.labels(stage="submit").observe
+_ST_PNL      = STAGE_LATENCY_MS.labels(stage="pnl").observe
+_ST_CYCLE    = STAGE_LATENCY_MS.labels(stage="cycle").observe
+
 class TradingBotMulti:
     SLIP_TOL = Decimal("0.60")
-    def __init__(self):
-        self.client = APIClient()
+    def __init__(self, client: APIClient | None = None, symbols: List[str] | None = None, *,
+                 slip_tol: Decimal | None = None, threshold: Decimal | None = None,
+                 fee: Decimal | None = None, risk: RiskState | None = None):
+        # client/symbols и параметры задаёт бэктест; по умолчанию — из config
+        symbols = config.TRADE_PAIRS if symbols is None else symbols
+        threshold = config.MIN_FUNDING_THRESHOLD if threshold is None else threshold
+        self.client = client or APIClient()
         self.sim = SlippageSimulator(self.client)
-        self.strategy = ArbitrageStrategyMulti(self.client)
-        self.position: Dict[str, Decimal] = {s: Decimal() for s in config.TRADE_PAIRS}
-        self.entry: Dict[str, Decimal | None] = {s: None for s in config.TRADE_PAIRS}
-        self.real: Dict[str, Decimal] = {s: Decimal() for s in config.TRADE_PAIRS}
+        self.strategy = ArbitrageStrategyMulti(self.client, fee, threshold)
+        # лимиты экспозиции; у воркера супервизора — общий для всех шардов буфер
+        self.risk = risk or RiskState(symbols)
+        # позиции и PnL — в ledger клиента, куда пишет каждое исполнение
+        self.ledger = self.client.ledger
+        for s in symbols:
+            self.ledger.add_symbol(s)
+            lots = self.risk.position(s)
+            if lots and not self.ledger.position(s):  # рестарт воркера
+                self.ledger.restore(s, lots, self.risk.price(s))
+        self._tol = Ratio.of(self.SLIP_TOL if slip_tol is None else slip_tol)
+        self._thr = Ratio.of(threshold)
+        self._notional = Ratio.of(Decimal("1")*config.MAX_POSITION_PERCENT*config.LEVERAGE)
+        # торгуемые символы; с FUNDING_TOP_K состав меняет ротация по рейтингу funding
+        self.active: Set[str] = set(symbols)
+        self._order = list(symbols)
+        self._draining: Set[str] = set()  # сняты ротацией, ждут закрытия позиции: только сокращение
+        self._loops: Dict[str, asyncio.Task] = {}
+        self._running = False
+        self._crash: asyncio.Future | None = None
+        self._snap_task: asyncio.Task | None = None
+        self.scanner = FundingScanner()
+        # gauge-потомки и кольца замеров привязываются здесь, на тике — только append
+        self.metrics = pipeline()
+        for s in symbols:
+            self.metrics.bind(s)
+        self._batch_slot = self.metrics.bind("batch")
+        # фильтр сигналов политикой; инференс в своём потоке, сигнал ждёт ответа без блокировки loop
+        self.rl = RLPolicy() if config.USE_RL_MODEL else None
+        if self.rl is not None:
+            for s in symbols:
+                self.rl.bind(s)
 
     async def run(self):
+        if config.STATE_SNAPSHOT:
+            # тёплый старт: позиции и стаканы из снапшота, сверка с биржей — фоном в ребалансере
+            self.restore_state(config.STATE_SNAPSHOT)
         await self.client.start()
-        asyncio.create_task(ALERTS.watch_errors())
-        asyncio.create_task(ALERTS.watch_inactivity())
+        if config.STATE_SNAPSHOT:
+            self._snap_task = asyncio.create_task(self._snapshot_loop(config.STATE_SNAPSHOT))
+        asyncio.create_task(alerts().watch_errors())
+        asyncio.create_task(alerts().watch_inactivity())
         asyncio.create_task(smart_rebalance(self.client, self))
-        tasks = [asyncio.create_task(self._loop(s)) for s in config.TRADE_PAIRS]
-        await asyncio.gather(*tasks)
+        if config.FUNDING_TOP_K > 0:
+            self.client.ws.subscribe_tickers(self.scanner.on_ticker)
+            asyncio.create_task(self._rotate_loop())
+        self.metrics.start()
+        if self.rl is not None:
+            self.rl.start()
+        self._running = True
+        self._crash = asyncio.get_running_loop().create_future()
+        if config.BATCH_ANALYZE:
+            self._spawn("*", self._batch_loop())
+        else:
+            for s in self._order:
+                self._spawn(s, self._loop(s))
+        await self._crash  # упавший цикл останавливает бота, как раньше gather
 
-    async def _loop(self, sym: str):
+    def _spawn(self, key: str, coro) -> None:
+        task = self._loops[key] = asyncio.create_task(coro)
+        task.add_done_callback(self._loop_done)
+
+    def _loop_done(self, task: asyncio.Task) -> None:
+        if task.cancelled() or self._crash is None or self._crash.done():
+            return
+        if task.exception() is not None:
+            self._crash.set_exception(task.exception())
+
+    # — снапшот состояния —
+    def restore_state(self, path: str) -> bool:
+        t0 = time.perf_counter()
+        state = state_snapshot.load(path)
+        if state is None:
+            return False
+        positions, books = state_snapshot.restore(state, self.ledger, self.client.ws,
+                                                  config.STATE_BOOK_MAX_AGE_SEC)
+        for sym in self._order:
+            lots = self.risk.position(sym)
+            if lots and lots != self.ledger.position(sym):
+                # общий буфер супервизора пережил рестарт воркера — он свежее снапшота
+                self.ledger.restore(sym, lots, self.risk.price(sym))
+            elif self.ledger.position(sym):
+                self.risk.set(sym, self.ledger.position(sym), self.ledger.last_price(sym))
+        logger.info("State restored from %s in %.1f ms: %s positions, %s books",
+                    path, (time.perf_counter() - t0)*1000, positions, books)
+        return True
+
+    def save_state(self, path: str) -> None:
+        state_snapshot.save(path, state_snapshot.capture(self.ledger, self.client.ws))
+
+    async def _snapshot_loop(self, path: str):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(config.STATE_SNAPSHOT_SEC)
+            state = state_snapshot.capture(self.ledger, self.client.ws)  # согласованно, на loop
+            try:
+                await loop.run_in_executor(None, state_snapshot.save, path, state)
+            except Exception as exc:
+                logger.warning("State snapshot err: %s", exc)
+
+    # — состав символов —
+    def add_symbol(self, sym: str) -> bool:
+        """Горячее добавление символа: учёт, стратегия, стакан и свой торговый цикл.
+
+        Нужны шаги цены и лота: из instruments-info (scanner.specs) или
+        INSTRUMENT_SPECS/TRADE_PAIRS конфига; без них символ не добавляется.
+        """
+        if sym in self.active:
+            self._draining.discard(sym)  # вернулся в рейтинг до закрытия позиции
+            return True
+        spec = self.scanner.specs.get(sym)
+        if spec is None and sym not in config.INSTRUMENT_SPECS and sym not in config.TRADE_PAIRS:
+            logger.warning("Cannot add %s: no tickSize/qtyStep from instruments-info", sym)
+            return False
+        if not self.risk.add_symbol(sym):
+            logger.warning("Cannot add %s: shared risk state has a fixed universe", sym)
+            return False
+        if spec is not None:
+            register_instrument(sym, *spec)
+        self.ledger.add_symbol(sym)
+        self.metrics.bind(sym)
+        if self.rl is not None:
+            self.rl.bind(sym)
+        self.strategy.add_symbol(sym)
+        self.client.ws.add_symbol(sym)
+        self.active.add(sym)
+        self._order.append(sym)
+        if self._running and not config.BATCH_ANALYZE:
+            self._spawn(sym, self._loop(sym))
+        logger.info("Symbol added: %s", sym)
+        return True
+
+    def retire_symbol(self, sym: str) -> bool:
+        """Остановка цикла символа; с открытой позицией он торгует только на сокращение до её закрытия."""
+        if sym not in self.active:
+            return True
+        if self.ledger.position(sym):
+            self._draining.add(sym)
+            return False
+        self._draining.discard(sym)
+        self.active.discard(sym)
+        self._order.remove(sym)
+        task = self._loops.pop(sym, None)
+        if task is not None:
+            task.cancel()
+        logger.info("Symbol retired: %s", sym)
+        return True
+
+    def rotate(self, k: int | None = None) -> Tuple[List[str], List[str]]:
+        """Привести состав к top-K по funding; возвращает (добавленные, снятые)."""
+        want = [s for s, _ in self.scanner.top(k or config.FUNDING_TOP_K)]
+        if not want:
+            return [], []  # рейтинга ещё нет — состав не трогаем
+        keep = set(want)
+        added = [s for s in want if s not in self.active and self.add_symbol(s)]
+        retired = [s for s in list(self._order) if s not in keep and self.retire_symbol(s)]
+        return added, retired
+
+    async def _rotate_loop(self):
         while True:
-            t0 = time.perf_counter()
-            action, edge = await self.strategy.analyze(sym)
-            TRADING_EDGE.labels(sym=sym).set(float(edge))
-            if edge >= config.MIN_FUNDING_THRESHOLD:
-                await self._trade(sym, action, edge)
-            await self._update_pnl(sym)
-            latency = (time.perf_counter() - t0)*1000
-            CYCLE_LATENCY_MS.labels(sym=sym).set(latency)
-            await asyncio.sleep(max(0, 0.05 - latency/1000))  # 50 мс такт
-
-    async def _trade(self, sym: str, action: str, edge: Decimal):
+            sc = self.scanner
+            try:
+                await sc.refresh(self.client)
+                # спецификации — один раз и когда в рейтинг попадает новый инструмент
+                if any(s not in sc.specs and s not in self.active for s, _ in sc.top(config.FUNDING_TOP_K)):
+                    await sc.refresh_specs(self.client)
+            except Exception as exc:
+                logger.warning("Funding scan err: %s", exc)
+            self.rotate()
+            await asyncio.sleep(config.FUNDING_SCAN_SEC)
+
+    async def _loop(self, sym: str):
+        # один цикл на реальный тик: WSManager будит только этот символ,
+        # а вся итерация работает с одним снимком котировки
+        sub = self.client.ws.subscribe(sym)
+        record, defer, slot = self.metrics.record, self.metrics.defer, self.metrics.bind(sym)
+        rl = self.rl
+        rslot = 0 if rl is None else rl.bind(sym)
+        try:
+            async for bid, ask, recv_ts in sub:
+                t0 = time.perf_counter()
+                action, edge = self.strategy.evaluate(bid, ask)
+                defer((_ST_ANALYZE, (time.perf_counter() - t0)*1000))
+                if edge.ge(self._thr):
+                    if rl is not None:
+                        action = await self._policy(sym, rslot, action, edge, bid, ask)
+                    await self._trade(sym, action, edge, bid, ask, recv_ts)
+                t1 = time.perf_counter()
+                self.ledger.mark(sym, bid, ask)
+                t2 = time.perf_counter()
+                defer((_ST_PNL, (t2 - t1)*1000))
+                defer((_ST_CYCLE, (t2 - t0)*1000))
+                record(slot, edge, bid, ask, (t2 - t0)*1000)
+        finally:
+            self.client.ws.unsubscribe(sub)
+
+    async def _batch_loop(self):
+        # одна корутина на всю вселенную: обновляем только изменившиеся символы,
+        # затем один векторный проход analyze_batch
+        ws, strat = self.client.ws, self.strategy
+        usub = ws.subscribe_all()
+        metrics = self.metrics
+        record, defer, bind = metrics.record, metrics.defer, metrics.bind
+        rl = self.rl
+        try:
+            async for dirty in usub:
+                t0 = time.perf_counter()
+                quotes = {sym: ws.quote(sym) for sym in dirty}
+                for sym, q in quotes.items():
+                    strat.update(sym, q.bid, q.ask)
+                hits = strat.analyze_batch(dirty)  # только изменившиеся за проход
+                defer((_ST_ANALYZE, (time.perf_counter() - t0)*1000))
+                active = self.active
+                todo = []
+                for sym, _, edge in hits:
+                    if sym not in active:
+                        continue  # снят ротацией
+                    bid, ask, recv_ts = quotes[sym]
+                    action, exact = strat.evaluate(bid, ask)
+                    record(bind(sym), edge, bid, ask)
+                    # запросы политике — все сразу, поток отвечает одним проходом
+                    raw = None if rl is None else self._obs(sym, exact, bid, ask)
+                    todo.append((sym, action, exact, bid, ask, recv_ts, raw,
+                                 None if raw is None else rl.request(raw)))
+                for sym, action, exact, bid, ask, recv_ts, raw, fut in todo:
+                    if fut is not None:
+                        led = self.ledger
+                        action = await rl.decide(rl.bind(sym), action, raw,
+                                                 led.realized(sym) + led.unrealized(sym), fut)
+                    await self._trade(sym, action, exact, bid, ask, recv_ts)
+                t1 = time.perf_counter()
+                mark = self.ledger.mark
+                for sym, q in quotes.items():
+                    mark(sym, q.bid, q.ask)
+                t2 = time.perf_counter()
+                defer((_ST_PNL, (t2 - t1)*1000))
+                defer((_ST_CYCLE, (t2 - t0)*1000))
+                record(self._batch_slot, None, latency_ms=(t2 - t0)*1000)
+        finally:
+            ws.unsubscribe(usub)
+
+    def _obs(self, sym: str, edge: Ratio, bid: int, ask: int) -> tuple:
+        return edge.num, edge.den, bid, ask, self.ledger.position(sym)
+
+    async def _policy(self, sym: str, slot: int, action: str, edge: Ratio, bid: int, ask: int) -> str:
+        """Сигнал стратегии через политику; награда прошлого решения — изменение PnL символа."""
+        led = self.ledger
+        return await self.rl.decide(slot, action, self._obs(sym, edge, bid, ask),
+                                    led.realized(sym) + led.unrealized(sym))
+
+    async def _trade(self, sym: str, action: str, edge: Ratio, bid: int, ask: int,
+                     recv_ts: float | None = None):
         if action == "hold": return
-        bid, ask = await self.client.get_best(sym)
+        defer = self.metrics.defer
+        t0    = time.perf_counter()
+        inst  = instrument(sym)
         price = ask if action == "buy_spot" else bid
         side  = "Buy" if action == "buy_spot" else "Sell"
-        qty   = self._calc_qty(price)
-        worst = await self.sim.worst_price(sym, side, qty)
-        slip  = abs((worst-price)/price)
-        if slip > self.SLIP_TOL * edge: return  # проскальзывание велико
-        await self.client.place_order(sym, side, qty)
-        ORDERS_ACTIVE.labels(sym=sym).set(1)
-        delta = qty if side == "Buy" else -qty
-        if not self.entry[sym]: self.entry[sym] = price
-        self.position[sym] += delta
-        POSITION_SIZE.labels(sym=sym).set(float(self.position[sym]))
-        ALERTS.trade_executed()
-
-    def _calc_qty(self, price: Decimal) -> Decimal:
-        trade_val = Decimal("1")*config.MAX_POSITION_PERCENT*config.LEVERAGE
-        return (trade_val/price).quantize(Decimal("0.0001"))
-
-    async def _update_pnl(self, sym: str):
-        bid, ask = await self.client.get_best(sym)
-        mark = bid if self.position[sym] < 0 else ask
-        if self.position[sym] and self.entry[sym]:
-            unreal = (mark - self.entry[sym]) * self.position[sym]
-            PNL_UNREAL.labels(sym=sym).set(float(unreal))
-        PNL_TOTAL.labels(sym=sym).set(float(self.real[sym]))
-
-    async def close(self): await self.client.close()
\ No newline at end of file
+        lots  = self._calc_qty(sym, price)
+        held  = self.ledger.position(sym)
+        if sym in self._draining:
+            # снимаемый символ: только reduce-only, без переворота позиции
+            if not held or (side == "Buy") == (held > 0):
+                return
+            lots = min(lots, abs(held))
+        walk  = self.sim.walk(sym, side, lots)
+        # |worst - price| / price > SLIP_TOL * edge, без деления
+        tol = self._tol
+        ok = walk is not None and not (  # None — глубины стакана не хватает
+            abs(walk[1] - price) * tol.den * edge.den > tol.num * edge.num * price)
+        t1 = time.perf_counter()
+        defer((_ST_SLIPPAGE, (t1 - t0)*1000))
+        if not ok: return  # проскальзывание велико
+        if not self.risk.reserve(sym, held + (lots if side == "Buy" else -lots), price):
+            return  # лимит экспозиции
+        if recv_ts is not None:
+            defer((TICK_TO_ORDER_MS.observe, (t1 - recv_ts)*1000))
+        try:
+            res = await self.client.submit_order(sym, side, inst.qty(lots))
+        except Exception as exc:
+            # ошибка транспорта или биржи: снимаем резерв, цикл символа продолжает работу
+            self.risk.set(sym, held, price)
+            logger.warning("Order err %s %s: %s", sym, side, exc)
+            return
+        defer((_ST_SUBMIT, (time.perf_counter() - t1)*1000))
+        if res.get("status") != "ok":
+            self.risk.set(sym, held, price)  # резерв не исполнен
+            return
+        self.metrics.order_active(self.metrics.bind(sym))
+        alerts().trade_executed()
+
+    def _calc_qty(self, sym: str, price: int) -> int:
+        """Объём в лотах: (trade_val / price).quantize(lot) в целых числах."""
+        return instrument(sym).lots_for(self._notional, price)
+
+    async def close(self):
+        if self._snap_task is not None:
+            self._snap_task.cancel()
+            self._snap_task = None
+            try:
+                self.save_state(config.STATE_SNAPSHOT)
+            except Exception as exc:
+                logger.warning("State snapshot err: %s", exc)
+        self.metrics.stop()
+        if self.rl is not None:
+            self.rl.stop()
+        await self.client.close()
+        await alerts().close()
\ No newline at end of file
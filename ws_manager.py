@@ -1,43 +1,287 @@
 from __future__ import annotations
-import asyncio, logging, random
+import asyncio, logging, random, time
 from decimal import Decimal
-from typing import Dict, Tuple
+from typing import Callable, Dict, List, NamedTuple, Set, Tuple
 import config
+from fixed_point import Instrument, instrument
+from md_recorder import KIND_DELTA, KIND_SNAPSHOT, MDRecorder
+from orderbook import BookGap, Levels, OrderBook
 
 logger = logging.getLogger(__name__)
 
+
+class Quote(NamedTuple):
+    bid: int  # тики
+    ask: int
+    ts: float  # perf_counter() в момент приёма
+
+
+class QuoteSubscription:
+    """Conflated per-symbol slot: a slow consumer only ever sees the latest quote."""
+
+    __slots__ = ("sym", "dropped", "_quote", "_event", "_closed")
+
+    def __init__(self, sym: str) -> None:
+        self.sym = sym
+        self.dropped = 0
+        self._quote: Quote | None = None
+        self._event = asyncio.Event()
+        self._closed = False
+
+    def _push(self, quote: Quote) -> None:
+        if self._event.is_set():
+            self.dropped += 1  # предыдущая котировка не была прочитана
+        self._quote = quote
+        self._event.set()
+
+    def close(self) -> None:
+        self._closed = True
+        self._event.set()
+
+    def __aiter__(self) -> "QuoteSubscription":
+        return self
+
+    async def __anext__(self) -> Quote:
+        await self._event.wait()
+        self._event.clear()
+        if self._closed:
+            raise StopAsyncIteration
+        return self._quote
+
+
+class UniverseSubscription:
+    """Conflated set of symbols whose quotes changed since the last read."""
+
+    __slots__ = ("_dirty", "_event", "_closed")
+
+    def __init__(self) -> None:
+        self._dirty: Set[str] = set()
+        self._event = asyncio.Event()
+        self._closed = False
+
+    def _push(self, sym: str) -> None:
+        self._dirty.add(sym)
+        self._event.set()
+
+    def close(self) -> None:
+        self._closed = True
+        self._event.set()
+
+    def __aiter__(self) -> "UniverseSubscription":
+        return self
+
+    async def __anext__(self) -> Set[str]:
+        await self._event.wait()
+        self._event.clear()
+        if self._closed:
+            raise StopAsyncIteration
+        dirty, self._dirty = self._dirty, set()
+        return dirty
+
+
 class WSManager:
-    """Simple in-memory price simulator replacing real WebSocket connection."""
+    """Стаканы и котировки: симулятор цен или публичный WS Bybit (BYBIT_WS_ENABLED)."""
+
+    DEPTH = 50
+    SPREAD = Decimal("0.5")
+    LEVEL_STEP = Decimal("0.05")
 
     def __init__(self, client: "APIClient") -> None:  # noqa: F821
         self.client = client
-        self._prices: Dict[str, Tuple[Decimal, Decimal]] = {
-            sym: (Decimal("100"), Decimal("100.5")) for sym in config.TRADE_PAIRS
+        # глубина стакана совпадает с глубиной подписки WS
+        self.depth = config.BYBIT_WS_DEPTH if config.BYBIT_WS_ENABLED else self.DEPTH
+        # верх стакана в тиках инструмента
+        self._prices: Dict[str, Tuple[int, int]] = {
+            sym: (instrument(sym).to_ticks(Decimal("100")), instrument(sym).to_ticks(Decimal("100.5")))
+            for sym in config.TRADE_PAIRS
+        }
+        self._books: Dict[str, OrderBook] = {
+            sym: OrderBook(sym, self.depth) for sym in config.TRADE_PAIRS
         }
+        self._ladders: Dict[str, Tuple[dict, dict]] = {}
+        self._subs: Dict[str, List[QuoteSubscription]] = {}
+        self._all_subs: List[UniverseSubscription] = []
+        self._recv_ts: Dict[str, float] = {}
+        self.tickers: Dict[str, dict] = {}
+        self._ticker_subs: List[Callable[[str, dict], None]] = []
         self._task: asyncio.Task | None = None
+        self.feed = None
         self._running = False
+        self.recorder: MDRecorder | None = None
 
     async def start(self) -> None:
+        if config.MD_RECORD_DIR and self.recorder is None:
+            self.recorder = MDRecorder.session(config.MD_RECORD_DIR)
         self._running = True
-        self._task = asyncio.create_task(self._simulate())
+        if config.BYBIT_WS_ENABLED:
+            from bybit_ws import BybitWS
+            for sym, book in self._books.items():
+                if book.stale:  # заглушки симулятора; восстановленные из снапшота стаканы остаются
+                    self._prices.pop(sym, None)
+            self.feed = BybitWS(self, list(self._books))
+            await self.feed.start()
+        else:
+            self._task = asyncio.create_task(self._simulate())
 
     async def _simulate(self) -> None:
         while self._running:
-            for sym, (bid, ask) in self._prices.items():
-                delta = Decimal(str(random.uniform(-0.5, 0.5)))
-                bid = (bid + delta).quantize(Decimal("0.01"))
-                ask = (bid + Decimal("0.5")).quantize(Decimal("0.01"))
-                self._prices[sym] = (bid, ask)
+            for sym, (bid, _) in list(self._prices.items()):
+                inst = instrument(sym)
+                bid += round(random.uniform(-0.5, 0.5) * inst.inv_tick)
+                ask = bid + inst.to_ticks(self.SPREAD)
+                step = inst.to_ticks(self.LEVEL_STEP)
+                bids, asks = self._ladder(inst, bid, -step), self._ladder(inst, ask, step)
+                prev = self._ladders.get(sym)
+                self._ladders[sym] = (bids, asks)
+                if prev is None:
+                    self._resync(sym)
+                else:
+                    self.on_delta(sym, self._diff(prev[0], bids), self._diff(prev[1], asks),
+                                  self._books[sym].seq + 1)
             await asyncio.sleep(0.5)
 
-    async def get_best(self, sym: str) -> Tuple[Decimal, Decimal]:
-        return self._prices.get(sym, (Decimal("0"), Decimal("0")))
+    def _ladder(self, inst: Instrument, top: int, step: int) -> Dict[int, int]:
+        return {top + step * i: inst.lots_of(random.uniform(0.5, 5.0)) for i in range(self.DEPTH)}
+
+    @staticmethod
+    def _diff(old: Dict[int, int], new: Dict[int, int]) -> List[Tuple[int, int]]:
+        return [(p, 0) for p in old if p not in new] + list(new.items())
+
+    def _resync(self, sym: str) -> None:
+        """Запрос полного снапшота (в симуляторе — текущая лестница уровней)."""
+        if self.feed is not None:
+            self.feed.resync(sym)
+            return
+        ladder = self._ladders.get(sym)
+        if ladder:
+            self.on_snapshot(sym, ladder[0].items(), ladder[1].items(), self._books[sym].seq + 1)
+
+    def add_symbol(self, sym: str) -> None:
+        """Горячее добавление символа: стакан и подписка WS или стартовая цена симулятора."""
+        if sym in self._books:
+            return
+        self._books[sym] = OrderBook(sym, self.depth)
+        if self.feed is not None:
+            self.feed.add_symbol(sym)
+        else:
+            inst = instrument(sym)
+            self._prices[sym] = (inst.to_ticks(Decimal("100")), inst.to_ticks(Decimal("100.5")))
+
+    # — приём данных стакана —
+    def on_snapshot(self, sym: str, bids: Levels, asks: Levels, seq: int,
+                    recv_ts: float | None = None) -> None:
+        recv_ts = recv_ts or time.perf_counter()
+        book = self._books.get(sym)
+        if book is None:
+            book = self._books[sym] = OrderBook(sym, self.depth)
+        rec = self.recorder
+        if rec is not None:
+            bids, asks = list(bids), list(asks)
+        book.apply_snapshot(bids, asks, seq)
+        if rec is not None:
+            rec.record(sym, KIND_SNAPSHOT, seq, bids, asks, book.best())
+        self._publish_book(book, recv_ts)
+
+    def on_delta(self, sym: str, bids: Levels, asks: Levels, seq: int,
+                 recv_ts: float | None = None) -> None:
+        recv_ts = recv_ts or time.perf_counter()
+        book = self._books.get(sym)
+        if book is None:
+            return
+        rec = self.recorder
+        if rec is not None:
+            bids, asks = list(bids), list(asks)
+        try:
+            book.apply_delta(bids, asks, seq)
+        except BookGap as exc:
+            logger.warning("Order book gap, resync: %s", exc)
+            self._resync(sym)
+            return
+        if rec is not None:
+            rec.record(sym, KIND_DELTA, seq, bids, asks, book.best())
+        self._publish_book(book, recv_ts)
+
+    def on_ticker(self, sym: str, fields: dict) -> None:
+        """Поля тикера биржи (funding, mark/index) как строки из фида."""
+        self.tickers[sym] = fields
+        for cb in self._ticker_subs:
+            cb(sym, fields)
+
+    def subscribe_tickers(self, cb: Callable[[str, dict], None]) -> None:
+        self._ticker_subs.append(cb)
+
+    def _publish_book(self, book: OrderBook, recv_ts: float) -> None:
+        best = book.best()
+        if best is not None:
+            self._publish(book.sym, *best, recv_ts)
+
+    def book(self, sym: str) -> OrderBook | None:
+        return self._books.get(sym)
+
+    def _publish(self, sym: str, bid: int, ask: int, recv_ts: float | None = None) -> None:
+        recv_ts = recv_ts or time.perf_counter()
+        self._prices[sym] = (bid, ask)
+        self._recv_ts[sym] = recv_ts
+        subs = self._subs.get(sym)
+        if subs:
+            quote = Quote(bid, ask, recv_ts)
+            for sub in subs:
+                sub._push(quote)
+        for usub in self._all_subs:
+            usub._push(sym)
+
+    def subscribe(self, sym: str) -> QuoteSubscription:
+        """Подписка на изменения стакана; будит только потребителя этого символа."""
+        sub = QuoteSubscription(sym)
+        self._subs.setdefault(sym, []).append(sub)
+        if sym in self._prices:
+            sub._push(Quote(*self._prices[sym], time.perf_counter()))
+        return sub
+
+    def subscribe_all(self) -> UniverseSubscription:
+        """Подписка на все символы сразу (пакетный режим стратегии)."""
+        usub = UniverseSubscription()
+        self._all_subs.append(usub)
+        for sym in self._prices:
+            usub._push(sym)
+        return usub
+
+    def unsubscribe(self, sub: QuoteSubscription | UniverseSubscription) -> None:
+        if isinstance(sub, UniverseSubscription):
+            if sub in self._all_subs:
+                self._all_subs.remove(sub)
+        else:
+            subs = self._subs.get(sub.sym)
+            if subs and sub in subs:
+                subs.remove(sub)
+        sub.close()
+
+    def quote(self, sym: str) -> Quote:
+        """Последняя опубликованная котировка без ожидания; ts — None, если её не было."""
+        bid, ask = self._prices.get(sym, (0, 0))
+        return Quote(bid, ask, self._recv_ts.get(sym))
+
+    async def get_best(self, sym: str) -> Tuple[int, int]:
+        return self._prices.get(sym, (0, 0))
 
     async def close(self) -> None:
         self._running = False
+        for subs in self._subs.values():
+            for sub in subs:
+                sub.close()
+        self._subs.clear()
+        for usub in self._all_subs:
+            usub.close()
+        self._all_subs.clear()
+        if self.feed is not None:
+            await self.feed.close()
+            self.feed = None
         if self._task:
             self._task.cancel()
             try:
                 await self._task
             except asyncio.CancelledError:
                 pass
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None